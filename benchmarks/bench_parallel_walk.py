@@ -0,0 +1,72 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: benchmarks
+# File: bench_parallel_walk.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 6:20 PM
+
+# FileProvider walk with/without walk_workers on a synthetic deep/wide tree,
+# each directory listing is delayed (like NFS/CIFS round trip).
+#
+# $ python benchmarks/bench_parallel_walk.py [latency_ms] [depth] [width]
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'lib'))
+
+from file_provider import FileProvider, ResultPathType  # noqa: E402
+
+
+class SlowFileProvider(FileProvider):
+    latency: float = 0.005
+
+    def _scandir(self, path: str):
+        time.sleep(self.latency)
+        return super()._scandir(path)
+
+
+def make_tree(root: Path, depth: int, width: int, files: int = 3) -> int:
+    count = 0
+    dirs = [root]
+    for level in range(depth):
+        next_dirs = []
+        for d in dirs:
+            for i in range(width):
+                sub = d / f'd{i}'
+                sub.mkdir()
+                for j in range(files):
+                    (sub / f'f{j}.odt').touch()
+                count += 1
+                next_dirs.append(sub)
+        dirs = next_dirs
+    return count
+
+
+def main(latency: float, depth: int, width: int):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dirs = make_tree(Path(tmpdir), depth, width)
+        provider = SlowFileProvider(tmpdir, ResultPathType.RELATIVE_TO_HOME)
+        provider.latency = latency
+        expected = None
+        for workers in (0, 4, 16, 32):
+            provider.walk_workers = workers
+            stime = time.perf_counter()
+            result = list(provider)
+            elapsed = time.perf_counter() - stime
+            if expected is None:
+                expected = result
+            print(
+                f'workers [{workers:>2}]: directories [{dirs}] files [{len(result)}] time [{elapsed:.3f}s]'
+                f' same order [{result == expected}]'
+            )
+
+
+if __name__ == '__main__':
+    main(
+        float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.005,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 6,
+    )
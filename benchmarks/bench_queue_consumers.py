@@ -0,0 +1,82 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: benchmarks
+# File: bench_queue_consumers.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 10:05 AM
+
+# CPU usage of idle consumers while the provider is slow (for example, walking over NFS).
+# "spin" - previous consumer loop (get_nowait() + asyncio.sleep(0) on QueueEmpty until provider is done)
+# "event" - current consumer loop (queue_get() until QUEUE_END)
+#
+# $ python benchmarks/bench_queue_consumers.py
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'lib'))
+
+from definitions import FileInfo, QUEUE_END, queue_get  # noqa: E402
+
+
+FILES_NUMBER = 20
+PROVIDER_DELAY = 0.1  # seconds per file
+WORKERS_NUMBER = 3
+
+
+async def slow_provider(queue: asyncio.Queue):
+    try:
+        for i in range(FILES_NUMBER):
+            await asyncio.sleep(PROVIDER_DELAY)
+            await queue.put(FileInfo(Path('.'), Path(f'file_{i}.odt')))
+    finally:
+        await queue.put(QUEUE_END)
+
+
+async def spin_consumer(queue: asyncio.Queue, provider_task: asyncio.Task) -> int:
+    cnt = 0
+    while not provider_task.done() or not queue.empty():
+        try:
+            file_info = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            await asyncio.sleep(0)
+            continue
+        if file_info is QUEUE_END:
+            queue.task_done()
+            continue
+        cnt += 1
+        queue.task_done()
+    return cnt
+
+
+async def event_consumer(queue: asyncio.Queue, provider_task: asyncio.Task) -> int:
+    cnt = 0
+    while True:
+        file_info = await queue_get(queue)
+        if file_info is QUEUE_END:
+            break
+        cnt += 1
+        queue.task_done()
+    return cnt
+
+
+async def run(consumer) -> tuple[float, float, int]:
+    queue = asyncio.Queue(maxsize=12)
+    loop = asyncio.get_running_loop()
+
+    wtime, ptime = time.perf_counter(), time.process_time()
+    provider_task = loop.create_task(slow_provider(queue))
+    consumers = [loop.create_task(consumer(queue, provider_task)) for i in range(WORKERS_NUMBER)]
+    await provider_task
+    processed = sum(await asyncio.gather(*consumers))
+
+    return time.perf_counter() - wtime, time.process_time() - ptime, processed
+
+
+if __name__ == '__main__':
+    print(f'files: {FILES_NUMBER}, provider delay: {PROVIDER_DELAY}s/file, workers: {WORKERS_NUMBER}')
+    for name, consumer in (('spin', spin_consumer), ('event', event_consumer)):
+        wall, cpu, processed = asyncio.run(run(consumer))
+        print(f'{name:>6}: processed [{processed}] wall [{wall:.2f}s] cpu [{cpu:.2f}s] cpu usage [{cpu / wall:.0%}]')
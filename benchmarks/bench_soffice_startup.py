@@ -0,0 +1,72 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: benchmarks
+# File: bench_soffice_startup.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 3:10 PM
+
+# soffice server startup time (until effective port) and time of the first conversion:
+# "cold" - empty user profile directory (previous behaviour)
+# "template" - user profile is cloned from UserProfileTemplate
+# "template+warm-up" - the same + warm-up conversion before the server is ready
+#
+# It needs soffice and python with uno (unoserver).
+# $ python benchmarks/bench_soffice_startup.py [rounds]
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'lib'))
+
+from aio_uno_converter import WARM_UP_DOCUMENT, warm_up_server  # noqa: E402
+from soffice_server import SofficeAsyncServer, UserProfileTemplate  # noqa: E402
+from uno_bridge import UnoBridgeConverter  # noqa: E402
+
+
+async def measure(template, warm_up: bool) -> tuple[float, float]:
+    server = SofficeAsyncServer(profile_template=template)
+    stime = time.perf_counter()
+    task = server.process_background()
+    await server.get_effective_port()
+    if warm_up:
+        await warm_up_server(server)
+    start_time = time.perf_counter() - stime
+
+    def convert():
+        UnoBridgeConverter(**server.connection).convert_bytes(WARM_UP_DOCUMENT, 'pdf')
+
+    stime = time.perf_counter()
+    await asyncio.to_thread(convert)
+    first_time = time.perf_counter() - stime
+
+    server.terminate()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return start_time, first_time
+
+
+async def main(rounds: int):
+    template = UserProfileTemplate()
+    stime = time.perf_counter()
+    await template.build()
+    print(f'template is built once in [{time.perf_counter() - stime:.2f}s]')
+
+    try:
+        for name, tmpl, warm_up in (('cold', None, False), ('template', template, False),
+                                    ('template+warm-up', template, True)):
+            results = [await measure(tmpl, warm_up) for i in range(rounds)]
+            start = sum(res[0] for res in results) / rounds
+            first = sum(res[1] for res in results) / rounds
+            print(f'{name:>18}: startup [{start:.2f}s] first conversion [{first:.2f}s] total [{start + first:.2f}s]')
+    finally:
+        template.cleanup()
+
+
+if __name__ == '__main__':
+    logging.getLogger('soffice_server').setLevel(logging.WARNING)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
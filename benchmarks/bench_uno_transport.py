@@ -0,0 +1,76 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: benchmarks
+# File: bench_uno_transport.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 4:05 PM
+
+# UNO transport: loopback TCP vs named pipe (unix domain socket).
+# Server readiness (start until port/pipe is resolved) and per-call latency of many small in-memory conversions.
+#
+# It needs soffice and python with uno (unoserver).
+# $ python benchmarks/bench_uno_transport.py [documents] [convert_to]
+
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'lib'))
+
+from aio_uno_converter import WARM_UP_DOCUMENT, warm_up_server  # noqa: E402
+from soffice_server import SofficeAsyncServer, UserProfileTemplate  # noqa: E402
+from uno_bridge import UnoBridgeConverter  # noqa: E402
+
+
+def convert_many(server: SofficeAsyncServer, documents: int, convert_to: str) -> list[float]:
+    converter = UnoBridgeConverter(**server.connection)
+    latencies = []
+    for i in range(documents):
+        stime = time.perf_counter()
+        converter.convert_bytes(WARM_UP_DOCUMENT, convert_to)
+        latencies.append(time.perf_counter() - stime)
+    return latencies
+
+
+async def measure(template: UserProfileTemplate, use_pipe: bool, documents: int, convert_to: str):
+    server = SofficeAsyncServer(profile_template=template, use_pipe=use_pipe)
+    stime = time.perf_counter()
+    task = server.process_background()
+    await server.get_effective_port()
+    ready_time = time.perf_counter() - stime
+    try:
+        await warm_up_server(server, convert_to)
+        latencies = await asyncio.to_thread(convert_many, server, documents, convert_to)
+    finally:
+        server.terminate()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    return ready_time, latencies
+
+
+async def main(documents: int, convert_to: str):
+    template = UserProfileTemplate()
+    await template.build()
+    try:
+        for name, use_pipe in (('tcp', False), ('pipe', True)):
+            ready_time, latencies = await measure(template, use_pipe, documents, convert_to)
+            latencies.sort()
+            print(
+                f'{name:>4}: ready [{ready_time:.3f}s]'
+                f' documents [{documents}] total [{sum(latencies):.2f}s]'
+                f' mean [{statistics.mean(latencies) * 1000:.2f}ms]'
+                f' p50 [{latencies[len(latencies) // 2] * 1000:.2f}ms]'
+                f' p95 [{latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms]'
+            )
+    finally:
+        template.cleanup()
+
+
+if __name__ == '__main__':
+    logging.getLogger('soffice_server').setLevel(logging.WARNING)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500, sys.argv[2] if len(sys.argv) > 2 else 'html'))
@@ -5,16 +5,26 @@
 # Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
 # Created by ox23 at 2022-08-12 (y-m-d) 12:27 PM
 import abc
-import fnmatch
+import argparse
 import asyncio
 import time
 from pathlib import Path
-from typing import Union, Optional, Type
+from typing import Union, Optional, Type, Iterable
 import logging
 
 from aio_uno_converter import AsyncSOUnoConverter
+from conversion_cache import ConversionCache, CachedFileProvider
 from file_provider import ResultPathType, AsyncFileProvider
-from definitions import AsyncQueuePutProcessable, AsyncQueueGetProcessable
+from dead_letter import DeadLetterSink
+from incremental import ConversionState, IncrementalFileProvider
+from job_journal import JobJournal, JournalFileProvider, JournalReplayProvider
+from run_summary import RunSummary, shard_path
+from scheduler import LongestJobFirstProvider
+from file_filter import FilterSpec, parse_shard
+from definitions import AsyncQueuePutProcessable, AsyncQueueGetProcessable, FileInfo, ConversionObserver
+from definitions import ConvertTarget, parse_targets
+from soffice_endpoints import EndpointRegistry
+from soffice_pool import SofficeServerPool
 from soffice_process import AsyncSOSubprocessConverter
 
 
@@ -46,14 +56,74 @@ class SOFileConverterBase(abc.ABC):
     converter_class: Type[AsyncQueueGetProcessable] = None
 
     def __init__(self, home: Union[str, Path], dest: Union[str, Path], pattern: str = '*.odt', *,
-                 queue_maxsize: int = 12, workers_number: int = 3, convert_to='html') -> None:
+                 queue_maxsize: int = 12, workers_number: int = 3, convert_to: Union[str, Iterable] = 'html',
+                 observers: Optional[list[ConversionObserver]] = None,
+                 dead_letter: Optional[Union[str, Path]] = None,
+                 filter_spec: Optional[FilterSpec] = None,
+                 state: Optional[Union[str, Path, ConversionState]] = None,
+                 cache: Optional[ConversionCache] = None,
+                 journal: Optional[Union[str, Path, JobJournal]] = None,
+                 schedule_window: Optional[int] = None,
+                 shard: Optional[Union[str, tuple[int, int]]] = None,
+                 summary: Optional[Union[str, Path]] = None) -> None:
+        """
+            convert_to - one target or list of them (look at parse_targets), outputs are placed side by side in dest,
+            output of the first target is the one that observers get (look at get_outpath),
+            state and cache support one target only
+            observers - are notified about result of each file (if converter supports it)
+            dead_letter - path of JSONL file, files that failed all attempts are appended into it (DeadLetterSink)
+            filter_spec - is used instead of pattern, FilterSpec(include=(pattern, )) by default
+            state - path of JSON file (or ConversionState), if it is set then conversion is incremental:
+            files with fresh output are not converted, outputs of deleted files are removed (IncrementalFileProvider)
+            cache - outputs of files with the same content are taken from it instead of conversion (CachedFileProvider)
+            journal - path of SQLite file (or JobJournal), status of each file is recorded, look at process(resume=True)
+            schedule_window - if it is set, files are converted the most expensive first inside of lookahead window
+            of this size (LongestJobFirstProvider)
+            shard - "i/n", only files of i-th of n shards are converted (look at FileProvider.shard),
+            paths of state, journal, summary and dead_letter get suffix of shard (look at shard_path())
+            summary - path of JSON report of run (RunSummary), reports of shards are combined by RunSummary.merge()
+        """
         self.home = home
         self.dest = dest
         self.pattern: str = pattern
-        self.convert_to = convert_to
+        self.filter_spec: FilterSpec = filter_spec or FilterSpec(include=(pattern, ))
+        self.targets: tuple[ConvertTarget, ...] = parse_targets(convert_to)
+        self.convert_to = self.targets[0].convert_to
         self.queue_maxsize = int(queue_maxsize)
         self.workers_number = workers_number
 
+        self.shard: Optional[tuple[int, int]] = None if shard is None else parse_shard(shard)
+
+        self.observers: list[ConversionObserver] = list(observers or [])
+        if dead_letter is not None:
+            self.observers.append(DeadLetterSink(shard_path(dead_letter, self.shard)))
+
+        self.state: Optional[ConversionState] = None
+        if state is not None:
+            if len(self.targets) > 1:
+                # output of other targets would not be checked, they would never be made for "fresh" files
+                raise ValueError('state supports one target only')
+            self.state = state if isinstance(state, ConversionState) else ConversionState(shard_path(state, self.shard))
+            self.observers.append(self.state)
+
+        self.cache: Optional[ConversionCache] = cache
+        if cache is not None:
+            if len(self.targets) > 1:
+                raise ValueError('cache supports one target only')
+            self.observers.append(cache)
+
+        self.schedule_window = schedule_window
+
+        self.journal: Optional[JobJournal] = None
+        if journal is not None:
+            self.journal = journal if isinstance(journal, JobJournal) else JobJournal(shard_path(journal, self.shard))
+            self.observers.append(self.journal)
+
+        self.summary: Optional[RunSummary] = None
+        if summary is not None:
+            self.summary = RunSummary(shard_path(summary, self.shard), self.shard)
+            self.observers.append(self.summary)
+
         self._file_provider: Optional[AsyncFileProvider] = None
         self._converters: list[AsyncQueueGetProcessable] = []
 
@@ -97,32 +167,85 @@ class SOFileConverterBase(abc.ABC):
     def workers_number(self, value: int):
         self._workers_number = self._calc_workers_number(value)
 
-    def __set_file_provider_filters(self):
-
-        def odt_filter(file: Path):  # Callback will invoked inside FileProvider
-            if file.is_file():
-                return fnmatch.fnmatch(file.name, self.pattern)
-
-        if odt_filter not in self._file_provider.filters:
-            self._file_provider.filters.append(odt_filter)
+    @property
+    def failed(self) -> list[tuple[FileInfo, str]]:
+        """
+            Files that were not converted (file, reason), collected from all converters.
+        """
+        return [item for converter in self._converters for item in getattr(converter, 'failed', [])]
 
     def get_file_provider(self) -> AsyncFileProvider:
         if self._file_provider is None:
             self._file_provider = self.file_provider_class(self.home)
             self._file_provider.result_path_type = ResultPathType.RELATIVE_TO_HOME
-            self.__set_file_provider_filters()
+            # it is checked by walker itself, without Path objects and stat() per file
+            self._file_provider.filter_spec = self.filter_spec
+            self._file_provider.shard = self.shard
 
         return self._file_provider
 
+    def get_outpath(self, file_info: FileInfo) -> Path:
+        """
+            Output of the first target, convert_to can be like "html:XHTML Writer File:UTF8"
+        """
+        return (self.dest / file_info.file).with_suffix(f'.{self.targets[0].ext}')
+
     @abc.abstractmethod
     def get_converter(self) -> AsyncQueueGetProcessable:
         raise NotImplementedError
 
-    async def process(self):
-        queue = asyncio.Queue(maxsize=self.queue_maxsize)
+    async def process(self, file_provider: Optional[AsyncQueuePutProcessable] = None, resume: bool = False):
+        """
+            file_provider - is used instead of get_file_provider(),
+            for example DeadLetterFileProvider to replay the failed files.
+            resume - continues the run that is recorded in journal: done and failed files are not converted again,
+            if walk of home was finished then files are taken from journal (JournalReplayProvider) without walk.
+            Otherwise, records of previous run are deleted from journal (but not if file_provider is passed,
+            it provides some files of run only).
+        """
+        if resume and self.journal is None:
+            raise ValueError('resume needs journal')
+
+        is_walk = file_provider is None
+        skip = []
+        if self.journal is not None:
+            if resume:
+                if is_walk and await asyncio.to_thread(self.journal.is_walk_done, self.home):
+                    file_provider = JournalReplayProvider(self.journal, self.home)
+                skip = await asyncio.to_thread(
+                    self.journal.get_files, self.home, (JobJournal.DONE, JobJournal.FAILED)
+                )
+            elif is_walk:
+                await asyncio.to_thread(self.journal.reset, self.home)
+
+        if file_provider is None:
+            file_provider = self.get_file_provider()
+        incremental_provider = cached_provider = None
+        if self.state is not None:
+            file_provider = incremental_provider = IncrementalFileProvider(file_provider, self.state, self.get_outpath)
+        if self.cache is not None:
+            # after incremental check, fresh files are not hashed
+            file_provider = cached_provider = CachedFileProvider(
+                file_provider, self.cache, self.get_outpath, self.convert_to, self.targets[0].filter_options,
+                observers=self.observers
+            )
+        queue_maxsize = self.queue_maxsize
+        if self.schedule_window:
+            file_provider = LongestJobFirstProvider(file_provider, self.schedule_window)
+            # files wait in window of scheduler, the queue just passes them to the free workers
+            queue_maxsize = min(queue_maxsize, self.workers_number)
+        if self.journal is not None:
+            file_provider = JournalFileProvider(file_provider, self.journal, self.home, skip, is_walk)
+            self.journal.start()
+
+        if self.summary is not None:
+            convert_to = ','.join(target.convert_to for target in self.targets)
+            self.summary.start(home=str(self.home), dest=str(self.dest), convert_to=convert_to, resume=resume)
+
+        queue = asyncio.Queue(maxsize=queue_maxsize)
         loop = asyncio.get_running_loop()
 
-        provider_task = loop.create_task(self.get_file_provider().process(queue), name='FileProvider')
+        provider_task = loop.create_task(file_provider.process(queue), name='FileProvider')
 
         converter_tasks: list[asyncio.Task] = []
         for i in range(self.workers_number):
@@ -130,13 +253,30 @@ class SOFileConverterBase(abc.ABC):
                 loop.create_task(self.get_converter().process(queue, provider_task), name=f'Converter_{i}')
             )
 
-        # to ensure the provider is exhausted and queue is empty
-        await provider_task
-        await queue.join()
-
-        results = []
-        for converter in converter_tasks:
-            results.extend(await converter)
+        # to ensure the provider is exhausted
+        # queue.join() is not used because QUEUE_END stays in queue.
+        # Each converter stops on QUEUE_END, so awaiting of converters means all provided files are processed
+        try:
+            await provider_task
+
+            results = []
+            for converter in converter_tasks:
+                results.extend(await converter)
+        finally:
+            if self.cache is not None:
+                await self.cache.join()
+            if self.state is not None:
+                # records of converted files are kept even if process is failed
+                self.state.save()
+            if self.journal is not None:
+                await self.journal.stop()
+            if self.summary is not None:
+                counters = {}
+                if incremental_provider is not None:
+                    counters.update(fresh=incremental_provider.skipped, removed=len(incremental_provider.removed))
+                if cached_provider is not None:
+                    counters.update(from_cache=cached_provider.hits)
+                self.summary.save(**counters)
 
         return results
 
@@ -146,10 +286,25 @@ class SOSubprocessFileConverter(SOFileConverterBase):
     file_provider_class: Type[AsyncQueuePutProcessable] = AsyncFileProvider
     converter_class: Type[AsyncQueueGetProcessable] = AsyncSOSubprocessConverter
 
+    def __init__(self, home: Union[str, Path], dest: Union[str, Path], pattern: str = '*.odt', *,
+                 max_processes: Optional[int] = None, **kwargs) -> None:
+        """
+            max_processes - limit of simultaneously running soffice processes of all workers, None - workers_number
+        """
+        super().__init__(home, dest, pattern, **kwargs)
+        self.max_processes = max_processes
+        self._process_semaphore: Optional[asyncio.Semaphore] = None
+
     def get_converter(self) -> AsyncSOSubprocessConverter:
-        if not self._converters:
-            self._converters.append(self.converter_class(outdir=self.dest, convert_to=self.convert_to))
-        return self._converters[0]
+        if self._process_semaphore is None:
+            self._process_semaphore = asyncio.Semaphore(self.max_processes or self.workers_number)
+
+        converter = self.converter_class(
+            outdir=self.dest, convert_to=self.targets, observers=self.observers,
+            process_semaphore=self._process_semaphore
+        )
+        self._converters.append(converter)
+        return converter
 
 
 class SOUnoFileConverter(SOFileConverterBase):
@@ -157,26 +312,70 @@ class SOUnoFileConverter(SOFileConverterBase):
     file_provider_class: Type[AsyncQueuePutProcessable] = AsyncFileProvider
     converter_class: Type[AsyncSOUnoConverter] = AsyncSOUnoConverter
 
+    def __init__(self, home: Union[str, Path], dest: Union[str, Path], pattern: str = '*.odt', *,
+                 pool: Optional[Union[SofficeServerPool, EndpointRegistry]] = None, **kwargs) -> None:
+        """
+            pool - servers are leased from it (pool outlives process() call and pays the startup once),
+            otherwise each converter starts and stops own server on each process() call.
+            EndpointRegistry leases remote servers too, workers_number should cover its capacity.
+        """
+        super().__init__(home, dest, pattern, **kwargs)
+        self.pool = pool
+
     def get_converter(self) -> AsyncSOUnoConverter:
-        converter = self.converter_class(outdir=self.dest, convert_to=self.convert_to)
+        converter = self.converter_class(
+            outdir=self.dest, convert_to=self.targets, pool=self.pool, observers=self.observers
+        )
         self._converters.append(converter)
         return converter
 
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description='Converts documents of home into dest by soffice')
+    parser.add_argument('home')
+    parser.add_argument('dest')
+    parser.add_argument('--pattern', default='*.odt')
+    parser.add_argument('--convert-to', action='append', help='target, it can be repeated (html by default),'
+                                                             ' each document is loaded once for all targets')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--engine', choices=('uno', 'subprocess'), default='uno')
+    parser.add_argument('--shard', help='"i/n", converts only i-th of n shards of files (numbered from 0)')
+    parser.add_argument('--state', help='state file, conversion is incremental (one target only)')
+    parser.add_argument('--journal', help='journal file, look at --resume')
+    parser.add_argument('--resume', action='store_true', help='continues the run recorded in journal')
+    parser.add_argument('--summary', help='report file of run, reports of shards are combined by run_summary.py')
+    parser.add_argument('--endpoints', help='file of remote soffice endpoints ("host:port[:slots]" per line),'
+                                            ' servers are leased from them (uno engine)')
+    parser.add_argument('--local-servers', type=int, default=0, help='local servers next to --endpoints')
+    args = parser.parse_args()
+
     logging.getLogger().setLevel(logging.INFO)
 
-    doc_base = Path(__file__).parent.parent
-    # doc_home = doc_base / 'work/Docs.Partial.from_flash'
-    doc_home = '/home/ox23/Desktop/Docs/'
-    doc_target = doc_base / 'work/Docs.Results'
+    converter_class = SOUnoFileConverter if args.engine == 'uno' else SOSubprocessFileConverter
+    kwargs = {}
+    registry = None
+    if args.endpoints and args.engine == 'uno':
+        local_pool = SofficeServerPool(args.local_servers) if args.local_servers > 0 else None
+        registry = EndpointRegistry.from_file(args.endpoints, local_pool=local_pool)
+        kwargs['pool'] = registry
 
     ct = time.perf_counter()
-    office_converter = SOUnoFileConverter(doc_home, doc_target, queue_maxsize=20, workers_number=3)
-    results = asyncio.run(
-        office_converter.process(),
-        debug=False
+    office_converter = converter_class(
+        args.home, args.dest, args.pattern, queue_maxsize=20, workers_number=args.workers,
+        convert_to=args.convert_to or 'html', shard=args.shard, state=args.state, journal=args.journal, summary=args.summary,
+        **kwargs
+    )
+
+    async def main():
+        if registry is None:
+            return await office_converter.process(resume=args.resume)
+        async with registry:
+            return await office_converter.process(resume=args.resume)
+
+    results = asyncio.run(main(), debug=False)
+    print(
+        f'##### Result: source: "{args.home}" -> destination: "{args.dest}"', '\n\t', '\n\t'.join(map(str, results)),
+        sep=''
     )
-    print(f'##### Result: source: "{doc_home}" -> destination: "{doc_target}"', '\n\t', '\n\t'.join(results), sep='')
     print(f'Result time: [{(time.perf_counter()-ct):.2f}]')
@@ -5,20 +5,75 @@
 # Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
 # Created by ox23 at 2022-08-30 (y-m-d) 3:17 PM
 import asyncio
+import concurrent.futures
+import logging
 import time
 from pathlib import Path
-from typing import Optional, Union
+from typing import Optional, Union, Callable, Any, Iterable
 
-from definitions import AsyncQueueGetProcessable, FileInfo
+from definitions import AsyncQueueGetProcessable, FileInfo, QUEUE_END, queue_get, ConversionObserver, BytesFileInfo
+from definitions import ConvertTarget, parse_targets
+from soffice_pool import SofficeServerPool
 from soffice_server import SofficeAsyncServer
-from unoserver.converter import UnoConverter
+from uno_bridge import UnoBridgeConverter
+
+
+logger = logging.getLogger(__name__)
+
+
+# the smallest flat ODT document, it is used to load the filters and components before the first real conversion
+WARM_UP_DOCUMENT = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<office:document xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+    b' xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"'
+    b' office:version="1.2" office:mimetype="application/vnd.oasis.opendocument.text">'
+    b'<office:body><office:text><text:p>warm-up</text:p></office:text></office:body>'
+    b'</office:document>'
+)
+
+
+async def warm_up_server(server: SofficeAsyncServer, convert_to: str = 'html'):
+    """
+        Converts WARM_UP_DOCUMENT by server (in memory, through own short-lived UNO connection).
+        It can be passed as SofficeServerPool(warm_up=warm_up_server).
+    """
+    stime = time.perf_counter()
+
+    def convert():
+        converter = UnoBridgeConverter(**server.connection)
+        converter.convert_bytes(WARM_UP_DOCUMENT, convert_to)
+
+    await asyncio.to_thread(convert)
+    server._log_server(f'warmed up in [{time.perf_counter() - stime:.2f}s]')
 
 
 class AsyncSOUnoConverter(AsyncQueueGetProcessable):
 
+    # deadline of one document conversion (seconds), None - without deadline
     timeout = 20
 
-    def __init__(self, outdir: Union[str, Path], convert_to: str = 'html') -> None:
+    # failed file is converted again up to retries times, n-th retry is made after retry_delay * 2 ** (n - 1) seconds
+    retries = 2
+    retry_delay = 0.5
+
+    # If True, each soffice server gets its own single thread executor that owns the UNO connection.
+    # Blocking UnoConverter calls are made inside that thread and the coroutine only awaits completion,
+    # thus the event loop (other converters, file provider, pipe readers of server) is not stalled.
+    # If False, UnoConverter is called straight from the coroutine (blocks the event loop).
+    use_executor: bool = True
+
+    # own server converts WARM_UP_DOCUMENT before the first real document (for pool look at warm_up argument)
+    warm_up: bool = False
+
+    def __init__(self, outdir: Union[str, Path], convert_to: Union[str, Iterable] = 'html',
+                 pool: Optional[SofficeServerPool] = None, observers: Optional[list[ConversionObserver]] = None) -> None:
+        """
+            convert_to - one target or list of them (look at parse_targets), each document is loaded once
+            and stored into all targets, outputs are placed side by side. Output of the first target is reported
+            to observers. In-memory documents (convert_bytes) are converted into the first target.
+            If pool is passed, server is leased from it for each process() call instead of own server starting.
+            observers are notified about result of each file (look at ConversionObserver)
+        """
         self._queue: Optional[asyncio.Queue] = None
         self.outdir: Path = outdir if isinstance(outdir, Path) else Path(outdir)
         if not self.outdir.exists():
@@ -26,73 +81,298 @@ class AsyncSOUnoConverter(AsyncQueueGetProcessable):
         self._soffice_server: Optional[SofficeAsyncServer] = None
         self._soffice_server_task: Optional[asyncio.Task] = None
         self._converter = None
-        self.convert_to = convert_to
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.targets: tuple[ConvertTarget, ...] = parse_targets(convert_to)
+        self.convert_to = self.targets[0].convert_to
+        self.pool = pool
+        self.failed: list[tuple[FileInfo, str]] = []  # (file, reason)
+        self.observers: list[ConversionObserver] = list(observers or [])
+        # one server converts one document at a time, it serializes process() and convert_bytes() callers
+        self._convert_lock = asyncio.Lock()
+        # concurrent callers must not lease (or start) more than one server
+        self._server_lock = asyncio.Lock()
 
-    def get_converter(self) -> UnoConverter:
+    def get_converter(self) -> UnoBridgeConverter:
+        """
+            If use_executor is True it is invoked inside the server's thread only.
+            Thus, UNO connection is created and used by the same thread.
+        """
         if self._converter is None:
-            self._converter = UnoConverter(
-                interface=self._soffice_server.host,
-                port=self._soffice_server.effective_port
-            )
+            self._converter = UnoBridgeConverter(**self._soffice_server.connection)
         return self._converter
 
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f'aioSOUno_{self._soffice_server.effective_port}'
+            )
+        return self._executor
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            # thread can be blocked inside UNO call, it will be released when server goes down
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._converter = None
+
+    async def _run_in_server_thread(self, func: Callable, *args, **kwargs) -> Any:
+        """
+            Runs func(*args, **kwargs) inside the thread dedicated to current soffice server
+            or inside the loop if use_executor is False.
+        """
+        if not self.use_executor:
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), lambda: func(*args, **kwargs))
+
+    def get_outpaths(self, file_info: FileInfo) -> list[Path]:
+        """
+            Outputs of targets, the first one is reported to observers
+        """
+        return [(self.outdir / file_info.file).with_suffix(f'.{target.ext}') for target in self.targets]
+
+    def _convert(self, inpath: Path, outpaths: list[Path]) -> None:
+        target = self.targets[0]
+        shared = self._soffice_server.shared_filesystem
+        if shared and len(self.targets) == 1 and target.convert_to == target.ext and not target.filter_options:
+            self.get_converter().convert(inpath=str(inpath), outpath=str(outpaths[0]), convert_to=self.convert_to)
+            return
+
+        # document is loaded once for all targets, if server does not see our files (remote endpoint)
+        # then document and outputs are sent through UNO bridge
+        results = self.get_converter().convert_many(
+            [(target.convert_to, target.filter_options, str(outpath) if shared else None)
+             for target, outpath in zip(self.targets, outpaths)],
+            inpath=str(inpath) if shared else None, data=None if shared else inpath.read_bytes()
+        )
+        if not shared:
+            for outpath, data in zip(outpaths, results):
+                outpath.write_bytes(data)
+
+    def _convert_bytes(self, file_info: BytesFileInfo) -> bytes:
+        return self.get_converter().convert_bytes(
+            file_info.data, file_info.convert_to or self.convert_to, file_info.filter_options
+        )
+
+    async def convert_bytes(self, data: bytes, convert_to: Optional[str] = None, filter_options: Iterable[str] = (),
+                            name: str = 'document') -> bytes:
+        """
+            Converts in-memory document through the UNO bridge and returns the converted document.
+            Timeout, retries and observers work the same way as for files.
+            If it is used outside of process(), server must be released via close().
+
+            filter_options - list of "OptionName=Value" or "Value" (look at UnoConverter.convert)
+        """
+        loop = asyncio.get_running_loop()
+        file_info = BytesFileInfo(
+            Path(), Path(name), data=data, convert_to=convert_to, filter_options=tuple(filter_options),
+            output=loop.create_future()
+        )
+        await self._convert_file(file_info, None)
+        return await file_info.output
+
+    async def close(self):
+        await self._finalize_server()
+
+    async def __aenter__(self) -> 'AsyncSOUnoConverter':
+        await self._get_server()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
     async def _get_server(self):
-        if self._soffice_server is None:
-            self._soffice_server = SofficeAsyncServer()
-            self._soffice_server_task = self._soffice_server.process_background()
-            port = await self._soffice_server.get_effective_port()
+        async with self._server_lock:
+            if self._soffice_server is None:
+                if self.pool is not None:
+                    self._soffice_server = await self.pool.acquire()
+                else:
+                    self._soffice_server = SofficeAsyncServer()
+                    self._soffice_server_task = self._soffice_server.process_background()
+                    port = await self._soffice_server.get_effective_port()
+                    if self.warm_up:
+                        await warm_up_server(self._soffice_server, self.convert_to)
 
         return self._soffice_server
 
-    async def _finalize_server(self, ):
-        self._soffice_server.proc.terminate()
+    async def _finalize_server(self, discard: bool = False):
+        """
+            Own server is terminated. Leased server is returned to pool,
+            if discard is True then pool will replace it with new one.
+        """
+        self._shutdown_executor()
+        server, self._soffice_server = self._soffice_server, None
+        if server is None:
+            return
+
+        if self.pool is not None:
+            self.pool.release(server, discard=discard)
+            return
+
+        server.terminate()
         try:
             await self._soffice_server_task
         except asyncio.CancelledError as exc:
             pass
 
+    async def _respawn_server(self, kill: bool = False):
+        """
+            Replaces current server with new one (own server is restarted, leased one is replaced by pool).
+            kill=True - server is hung, SIGKILL is used. It also releases the thread blocked inside UNO call.
+        """
+        server = self._soffice_server
+        if kill and server is not None and server.is_running():
+            server._log_server('killed')
+            server.kill()
+        await self._finalize_server(discard=True)
+        await self._get_server()
+
+    def _is_server_alive(self) -> bool:
+        server = self._soffice_server
+        return server is not None and server.is_running()
+
+    async def _recycle_server_if_needed(self, latency: float):
+        """
+            Called between documents, thus server is drained already and it can be replaced without lost documents.
+        """
+        self._soffice_server.record_conversion(latency)
+        if self._soffice_server.should_recycle():
+            await self._respawn_server()
+
     async def _cleanup_queue_on_convert_exc(self, queue: asyncio.Queue, provider_future: asyncio.Task, exc: Exception):
         provider_future.cancel(str(exc))  # in real this is task
 
-        # queued messages dump to unlock external queue.join()
+        # queued messages dump to unlock provider, QUEUE_END must stay for other consumers
+        queue_end = None
         while not queue.empty():
-            queue.get_nowait()
+            item = queue.get_nowait()
             queue.task_done()
+            if item is QUEUE_END:
+                queue_end = item
+
+        if queue_end is not None:
+            queue.put_nowait(queue_end)
 
         await provider_future
 
+    async def _process_convert_exc(self, file_info: FileInfo, exc: Exception) -> str:
+        """
+            Makes server usable for the next attempt or document.
+            Timed out (or dead) server is killed and respawned, otherwise just UNO connection is renewed.
+        """
+        timed_out = isinstance(exc, asyncio.TimeoutError)
+        reason = f'timeout [{self.timeout}s]' if timed_out else repr(exc)
+        self._soffice_server._log_server(f'"{file_info.file}" attempt [{file_info.attempts}] failed: {reason}')
+
+        if timed_out or not self._is_server_alive():
+            await self._respawn_server(kill=timed_out)
+        else:
+            self._shutdown_executor()
+
+        return reason
+
+    async def _switch_server(self):
+        """
+            Retry should be made by other server where it is possible (pool has other idle server).
+        """
+        if self.pool is not None and self.pool.idle_number > 0:
+            await self._finalize_server()
+            await self._get_server()
+
+    async def _convert_file(self, file_info: FileInfo, outpaths: Optional[list[Path]]) -> Optional[str]:
+        """
+            Converts file with retries. Returns None if it is done, otherwise the reason of the last failure.
+            Raises exception only if server can't be respawned.
+            BytesFileInfo is converted in memory (outpaths are not used), result is set into file_info.output
+        """
+        outpath = outpaths[0] if outpaths else None
+        if isinstance(file_info, BytesFileInfo):
+            func, args = self._convert_bytes, (file_info, )
+        else:
+            func, args = self._convert, (file_info.home / file_info.file, outpaths)
+
+        while True:
+            # backoff sleep is made without the lock, other callers use the server meanwhile
+            async with self._convert_lock:
+                # server could be finalized by other caller during backoff sleep
+                server = await self._get_server()
+                file_info.attempts += 1
+                stime = time.perf_counter()
+                try:
+                    # deadline can't interrupt the blocking call if use_executor is False
+                    res = await asyncio.wait_for(self._run_in_server_thread(func, *args), self.timeout)
+                except Exception as exc:
+                    reason = await self._process_convert_exc(file_info, exc)
+                    if file_info.attempts > self.retries:
+                        self.failed.append((file_info, reason))
+                        self._set_output(file_info, exc=RuntimeError(f'"{file_info.file}" failed: {reason}'))
+                        self._notify('file_failed', file_info, reason, server)
+                        return reason
+
+                    await self._switch_server()
+                else:
+                    self._set_output(file_info, res)
+                    self._notify('file_done', file_info, outpath, server)
+                    await self._recycle_server_if_needed(time.perf_counter() - stime)
+                    return None
+
+            await asyncio.sleep(self.retry_delay * 2 ** (file_info.attempts - 1))
+
+    @staticmethod
+    def _set_output(file_info: FileInfo, result: Any = None, exc: Optional[Exception] = None):
+        output = getattr(file_info, 'output', None)
+        if output is None or output.done():
+            return
+        if exc is None:
+            output.set_result(result)
+        else:
+            output.set_exception(exc)
+
+    def _notify(self, method: str, *args):
+        for observer in self.observers:
+            try:
+                getattr(observer, method)(*args)
+            except Exception as exc:
+                logger.exception(f'##{self.__class__.__name__}##: observer {observer!r}.{method} failed')
+
     async def process(self, queue: asyncio.Queue, provider_task: asyncio.Task):
         result = []
         await self._get_server()
-        while not provider_task.done() or not queue.empty():
-            try:
-                file_info: FileInfo = queue.get_nowait()
-            except asyncio.QueueEmpty as exc:
-                await asyncio.sleep(0)
-                continue
+        while True:
+            file_info: FileInfo = await queue_get(queue)
+            if file_info is QUEUE_END:
+                break
 
             stime = time.perf_counter()
-            converter = self.get_converter()
-            inpath = file_info.home / file_info.file
-            outfile = file_info.file.with_suffix(f'.{self.convert_to}')
-            outpath = self.outdir / outfile
-            outpath.parent.mkdir(parents=True, exist_ok=True)
+            outfile = outpaths = None
+            if not isinstance(file_info, BytesFileInfo):
+                outpaths = self.get_outpaths(file_info)
+                outfile = ', '.join(str(outpath.relative_to(self.outdir)) for outpath in outpaths)
+                outpaths[0].parent.mkdir(parents=True, exist_ok=True)
             try:
-                converter.convert(inpath=inpath, outpath=str(outpath), convert_to=self.convert_to)
-            except RuntimeError as exc:
-                # need close server and tasks
-                await self._finalize_server()
+                reason = await self._convert_file(file_info, outpaths)
+            except Exception as exc:
+                # server can't be respawned, need close server and tasks
+                queue.task_done()
+                self._set_output(file_info, exc=exc)
+                await self._finalize_server(discard=True)
                 try:
                     await self._cleanup_queue_on_convert_exc(queue, provider_task, exc)
                 except asyncio.CancelledError:
                     pass
                 raise exc
 
+            queue.task_done()
+            ctime = time.perf_counter() - stime
+            if reason is None:
+                if outfile is None:
+                    outfile = f'[{len(file_info.output.result())} bytes]' if file_info.output else '[bytes]'
+                result.append(f'"{file_info.file}" -> "{outfile}" [done in {ctime:.2f}]')
             else:
-                queue.task_done()
-                result.append(f'"{file_info.file}" -> "{outfile}" [done in {time.perf_counter() - stime:.2f}]')
-
-            await asyncio.sleep(0)
+                result.append(
+                    f'"{file_info.file}" -> failed: {reason} [attempts {file_info.attempts} in {ctime:.2f}]'
+                )
 
         await self._finalize_server()
 
@@ -0,0 +1,324 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: conversion_cache.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 7:30 PM
+import asyncio
+import functools
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Union, Any, Optional, Callable, Iterable
+
+from definitions import FileInfo, ConversionObserver, AsyncQueuePutProcessable, WrappingFileProvider
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# linux/fs.h, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def file_digest(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """
+        sha256 of file content, file is read by chunks into one buffer (memory does not depend on file size)
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as fd:
+        while size := fd.readinto(buffer):
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+@functools.cache
+def get_soffice_version(program: str = 'soffice') -> str:
+    """
+        Like "LibreOffice 7.3.7.2 30(Build:2)", empty string if it can't be got
+    """
+    try:
+        result = subprocess.run([program, '--version'], capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.SubprocessError) as exc:
+        logger.warning(f'##get_soffice_version()##: version of "{program}" is unknown: {exc!r}')
+        return ''
+    return result.stdout.strip()
+
+
+def reflink(src: Path, dst: Path):
+    """
+        Copy-on-write clone (btrfs, xfs, ...), raises OSError if file system does not support it
+    """
+    if fcntl is None:
+        raise OSError('reflink is not supported')
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            dst.unlink(missing_ok=True)
+            raise
+
+
+class ConversionCache(ConversionObserver):
+    """
+        Content-addressed cache of outputs, key is sha256 of (sha256 of source, convert_to, filter options,
+        soffice version). Entry is directory <path>/<key[:2]>/<key> with output, exported images and meta.json.
+
+        Outputs are put into cache (file_done) and materialized from it by first of link_modes that works.
+        Hardlinks are not used: output and entry would share inode, thus rewrite of output in place
+        (reconversion of changed source) would change the entry of the old key.
+        Size of cache is bounded by max_bytes, least recently used entries are evicted.
+
+        Exported images are files next to output like "<stem>_<ext>_*" (soffice names them "doc_html_<hex>.png"),
+        they are materialized with the same names because output refers them.
+    """
+
+    link_modes = ('reflink', 'copy')
+    images_pattern = '{stem}_{ext}_*'
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 1 << 30, soffice_version: Optional[str] = None,
+                 program: str = 'soffice') -> None:
+        """
+            soffice_version - None means it is got from "program --version" when it is needed first time
+        """
+        self.path: Path = path if isinstance(path, Path) else Path(path)
+        self.max_bytes = max_bytes
+        self.program = program
+        self._soffice_version = soffice_version
+        self._lock = threading.Lock()
+        self._index: Optional[dict[str, list]] = None  # key -> [last used, size]
+        self._pending: dict[tuple[str, str], str] = {}  # (home, file) -> key of queued files
+        self._stores: set[asyncio.Future] = set()
+        self.hits = 0
+        self.stored = 0
+
+    @property
+    def soffice_version(self) -> str:
+        if self._soffice_version is None:
+            self._soffice_version = get_soffice_version(self.program)
+        return self._soffice_version
+
+    def get_key(self, source: Path, convert_to: str, filter_options: Iterable[str] = ()) -> str:
+        """
+            It reads whole source (blocking)
+        """
+        parts = [file_digest(source), convert_to, list(filter_options), self.soffice_version]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.path / key[:2] / key
+
+    def _get_index(self) -> dict[str, list]:
+        if self._index is None:
+            index = {}
+            for meta in self.path.glob('*/*/meta.json'):
+                try:
+                    with open(meta, 'r', encoding='utf-8') as fd:
+                        index[meta.parent.name] = [meta.stat().st_mtime, json.load(fd)['size']]
+                except (OSError, ValueError, KeyError) as exc:
+                    continue
+            self._index = index
+        return self._index
+
+    def _link(self, src: Path, dst: Path):
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        dst.unlink(missing_ok=True)
+        for mode in self.link_modes:
+            try:
+                if mode == 'reflink':
+                    reflink(src, dst)
+                else:
+                    shutil.copyfile(src, dst)
+                return
+            except OSError as exc:
+                if mode == self.link_modes[-1]:
+                    raise
+
+    def get_outputs(self, outpath: Path) -> list[Path]:
+        """
+            Output and its exported images
+        """
+        pattern = self.images_pattern.format(stem=glob.escape(outpath.stem), ext=outpath.suffix.lstrip('.'))
+        return [outpath] + sorted(path for path in outpath.parent.glob(pattern) if path.is_file())
+
+    def materialize(self, key: str, outpath: Path) -> bool:
+        """
+            Returns False if key is not in cache
+        """
+        with self._lock:
+            if key not in self._get_index():
+                return False
+        entry = self._entry_path(key)
+        try:
+            with open(entry / 'meta.json', 'r', encoding='utf-8') as fd:
+                meta = json.load(fd)
+            for name in meta['files']:
+                self._link(entry / name, outpath if name == meta['output'] else outpath.parent / name)
+            os.utime(entry / 'meta.json')
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning(f'##{self.__class__.__name__}##: entry "{entry}" is broken: {exc!r}')
+            self._remove(key)
+            return False
+
+        with self._lock:
+            if key in self._index:
+                self._index[key][0] = time.time()
+            self.hits += 1
+        return True
+
+    def store(self, key: str, outpath: Path):
+        entry = self._entry_path(key)
+        with self._lock:
+            if key in self._get_index():
+                return
+
+        outputs = self.get_outputs(outpath)
+        tmp_entry = entry.with_name(f'{key}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            tmp_entry.mkdir(parents=True, exist_ok=True)
+            for path in outputs:
+                self._link(path, tmp_entry / path.name)
+            meta = {
+                'output': outpath.name,
+                'files': [path.name for path in outputs],
+                'size': sum(path.stat().st_size for path in outputs),
+            }
+            with open(tmp_entry / 'meta.json', 'w', encoding='utf-8') as fd:
+                json.dump(meta, fd)
+            os.rename(tmp_entry, entry)
+        except OSError as exc:
+            # entry exists (stored by other process) or output is not readable
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            if not entry.exists():
+                logger.warning(f'##{self.__class__.__name__}##: "{outpath}" is not stored: {exc!r}')
+            return
+
+        with self._lock:
+            self._index[key] = [time.time(), meta['size']]
+            self.stored += 1
+        self._evict()
+
+    def _remove(self, key: str):
+        with self._lock:
+            self._get_index().pop(key, None)
+        shutil.rmtree(self._entry_path(key), ignore_errors=True)
+
+    def _evict(self):
+        with self._lock:
+            index = self._get_index()
+            total = sum(size for last_used, size in index.values())
+            if total <= self.max_bytes:
+                return
+            evicted = []
+            for key, (last_used, size) in sorted(index.items(), key=lambda item: item[1][0]):
+                if total <= self.max_bytes:
+                    break
+                total -= size
+                evicted.append(key)
+                del index[key]
+
+        for key in evicted:
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+        logger.debug(f'##{self.__class__.__name__}##: [{len(evicted)}] entries are evicted')
+
+    @staticmethod
+    def _pending_key(file_info: FileInfo) -> tuple[str, str]:
+        return str(file_info.home), str(file_info.file)
+
+    def set_pending(self, file_info: FileInfo, key: str):
+        self._pending[self._pending_key(file_info)] = key
+
+    def file_done(self, file_info: FileInfo, outpath: Path, server: Any):
+        key = self._pending.pop(self._pending_key(file_info), None)
+        if key is None or outpath is None:
+            return
+        # linking or copying is made outside of loop, join() waits for it
+        future = asyncio.get_running_loop().run_in_executor(None, self.store, key, outpath)
+        self._stores.add(future)
+        future.add_done_callback(self._stores.discard)
+
+    def file_failed(self, file_info: FileInfo, error: str, server: Any):
+        self._pending.pop(self._pending_key(file_info), None)
+
+    async def join(self):
+        """
+            Waits until converted outputs are stored
+        """
+        while self._stores:
+            await asyncio.gather(*self._stores, return_exceptions=True)
+
+
+class CachedFileProvider(WrappingFileProvider):
+    """
+        Wraps other provider, if output of file is in cache then it is materialized instead of conversion
+        and observers are notified (file_done, server is None), otherwise file is queued.
+        Hashing and materializing are made in thread.
+    """
+
+    def __init__(self, provider: AsyncQueuePutProcessable, cache: ConversionCache,
+                 get_outpath: Callable[[FileInfo], Path], convert_to: str, filter_options: Iterable[str] = (),
+                 observers: Optional[list[ConversionObserver]] = None) -> None:
+        super().__init__(provider)
+        self.cache = cache
+        self.get_outpath = get_outpath
+        self.convert_to = convert_to
+        self.filter_options = tuple(filter_options)
+        self.observers: list[ConversionObserver] = list(observers or [])
+        self.hits = 0
+
+    @property
+    def home(self) -> Optional[Path]:
+        return getattr(self.provider, 'home', None)
+
+    def _lookup(self, file_info: FileInfo) -> tuple[Optional[str], Optional[Path]]:
+        """
+            (key, outpath) - outpath is not None if output is materialized
+        """
+        try:
+            key = self.cache.get_key(file_info.home / file_info.file, self.convert_to, self.filter_options)
+        except OSError as exc:
+            # converter will report it
+            return None, None
+        outpath = self.get_outpath(file_info)
+        return key, outpath if self.cache.materialize(key, outpath) else None
+
+    def _lookup_batch(self, batch: list[FileInfo]) -> list[tuple[FileInfo, Optional[str], Optional[Path]]]:
+        return [(file_info, *self._lookup(file_info)) for file_info in batch]
+
+    def _notify(self, method: str, *args):
+        for observer in self.observers:
+            try:
+                getattr(observer, method)(*args)
+            except Exception:
+                logger.exception(f'##{self.__class__.__name__}##: observer {observer!r}.{method} failed')
+
+    async def _process_batch(self, batch: list[FileInfo], queue: asyncio.Queue):
+        for file_info, key, outpath in await asyncio.to_thread(self._lookup_batch, batch):
+            if outpath is not None:
+                self.hits += 1
+                logger.info(f'##{self.__class__.__name__}.process()##: output is got from cache: {file_info}')
+                self._notify('file_done', file_info, outpath, None)
+                continue
+            if key is not None:
+                self.cache.set_pending(file_info, key)
+            await queue.put(file_info)
+            self.queued += 1
+
+    async def _on_done(self):
+        logger.info(
+            f'##{self.__class__.__name__}.process()##: done, queued: [{self.queued}], from cache: [{self.hits}]'
+        )
@@ -0,0 +1,97 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: dead_letter.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 1:10 PM
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Union, Any, Generator, Optional
+
+from definitions import FileInfo, ConversionObserver, AsyncQueuePutProcessable, QUEUE_END
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeadLetterSink(ConversionObserver):
+    """
+        Appends files that failed all attempts into JSONL file, one JSON object per line
+        {"home": ..., "file": ..., "error": ..., "attempts": ..., "server_id": ..., "pid": ..., "port": ..., "time": ...}
+
+        File is opened for each record, failures are expected to be rare.
+        Recorded files can be converted again later via DeadLetterFileProvider.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path: Path = path if isinstance(path, Path) else Path(path)
+        self.count = 0
+
+    def file_done(self, file_info: FileInfo, outpath: Path, server: Any):
+        pass
+
+    def file_failed(self, file_info: FileInfo, error: str, server: Any):
+        record = {
+            'home': str(file_info.home),
+            'file': str(file_info.file),
+            'error': error,
+            'attempts': file_info.attempts,
+            'server_id': getattr(server, 'server_id', None),
+            'pid': None,
+            'port': getattr(server, 'effective_port', None),
+            'time': time.time(),
+        }
+        if server is not None and server._proc.done():
+            record['pid'] = server.proc.pid
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as fd:
+            fd.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+        logger.warning(f'##{self.__class__.__name__}##: "{file_info.file}" is dead after [{file_info.attempts}] attempts')
+
+    @staticmethod
+    def read(path: Union[str, Path]) -> Generator[dict, None, None]:
+        with open(path, 'r', encoding='utf-8') as fd:
+            for line in fd:
+                if line.strip():
+                    yield json.loads(line)
+
+    @classmethod
+    def file_infos(cls, path: Union[str, Path]) -> Generator[FileInfo, None, None]:
+        """
+            Recorded files without duplicates (the same file can be recorded by many runs)
+        """
+        seen = set()
+        for record in cls.read(path):
+            key = (record['home'], record['file'])
+            if key not in seen:
+                seen.add(key)
+                yield FileInfo(Path(record['home']), Path(record['file']))
+
+
+class DeadLetterFileProvider(AsyncQueuePutProcessable):
+    """
+        Replays the dead-letter file, it can be used instead of AsyncFileProvider.
+    """
+
+    def __init__(self, path: Union[str, Path], home: Optional[Union[str, Path]] = None) -> None:
+        """
+            home - if it is passed, only files of this home are replayed
+        """
+        self.path: Path = path if isinstance(path, Path) else Path(path)
+        self.home: Optional[Path] = None if home is None else Path(home)
+
+    async def process(self, queue: asyncio.Queue):
+        cnt = 0
+        try:
+            for fi in DeadLetterSink.file_infos(self.path):
+                if self.home is None or fi.home == self.home:
+                    await queue.put(fi)
+                    cnt += 1
+        finally:
+            await queue.put(QUEUE_END)
+        logger.info(f'##{self.__class__.__name__}.process()##: done, replayed: [{cnt}] files')
@@ -5,24 +5,200 @@
 # Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
 # Created by ox23 at 2022-08-29 (y-m-d) 8:49 AM
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Protocol
+from typing import Protocol, Union, Any, Optional, Iterable
 
 
 @dataclass
 class FileInfo:
     home: Path
     file: Path
+    attempts: int = 0  # conversion attempts made
+
+
+@dataclass
+class BytesFileInfo(FileInfo):
+    """
+        In-memory document, it is converted through the UNO bridge without files.
+        home and file are used just as name (logs, results).
+        output - future that gets the converted bytes (or exception).
+    """
+    data: bytes = field(default=b'', repr=False)
+    convert_to: Optional[str] = None  # None - converter's convert_to
+    filter_options: tuple[str, ...] = ()
+    output: Optional[asyncio.Future] = field(default=None, repr=False, compare=False)
+
+
+@dataclass(frozen=True)
+class ConvertTarget:
+    """
+        Output format. convert_to has syntax of soffice --convert-to, like "html" or "html:XHTML Writer File:UTF8"
+        (extension of output, optional filter name and its FilterOptions).
+        filter_options - list of "OptionName=Value" (FilterData) or "Value" (look at UnoConverter.convert),
+        they are used by UNO converters only.
+    """
+    convert_to: str
+    filter_options: tuple[str, ...] = ()
+
+    @property
+    def ext(self) -> str:
+        return self.convert_to.split(':', maxsplit=1)[0]
+
+
+def parse_targets(convert_to: Union[str, ConvertTarget, Iterable[Union[str, ConvertTarget, tuple]]]
+                  ) -> tuple[ConvertTarget, ...]:
+    """
+        convert_to - one target or list of them, target is ConvertTarget, convert_to string
+        or tuple (convert_to, filter_options). Outputs of targets are placed side by side,
+        thus extensions of targets should differ.
+    """
+    if isinstance(convert_to, (str, ConvertTarget)):
+        convert_to = [convert_to]
+
+    targets = []
+    for target in convert_to:
+        if isinstance(target, str):
+            target = ConvertTarget(target)
+        elif not isinstance(target, ConvertTarget):
+            target_convert_to, filter_options = target
+            target = ConvertTarget(target_convert_to, tuple(filter_options))
+        targets.append(target)
+
+    if not targets:
+        raise ValueError('at least one target should be passed')
+    exts = [target.ext for target in targets]
+    if not all(exts) or len(set(exts)) != len(exts):
+        raise ValueError(f'extensions of targets {exts} should be set and differ')
+    return tuple(targets)
+
+
+class QueueEnd:
+    """
+        End-of-stream marker. Provider puts it into the queue as the last item (also when it is cancelled).
+        It is never removed from the queue, each consumer that gets it puts it back for the other consumers.
+    """
+
+    def __repr__(self) -> str:
+        return 'QUEUE_END'
+
+
+QUEUE_END = QueueEnd()
+
+
+async def queue_get(queue: asyncio.Queue) -> Union[FileInfo, QueueEnd]:
+    """
+        Waits (without spinning) for the next item.
+        If it is QUEUE_END then it is returned back to queue, so other consumers will get it too.
+        Thus, queue.join() will never be done after QUEUE_END, consumer's tasks must be awaited instead.
+    """
+    item = await queue.get()
+    if item is QUEUE_END:
+        queue.put_nowait(item)  # slot was just released by get(), it can't raise QueueFull
+        queue.task_done()
+    return item
 
 
 class AsyncQueuePutProcessable(Protocol):
 
     async def process(self, queue: asyncio.Queue):
+        """
+            Puts items into queue. Last item must be QUEUE_END in any case (done, failed or cancelled).
+        """
+        raise NotImplementedError
+
+
+class WrappingFileProvider(AsyncQueuePutProcessable):
+    """
+        Base of providers that wrap other provider. Files that wrapped provider has queued already
+        are taken by batches and passed to _process_batch(), it queues them (or not).
+        When wrapped provider is done (not cancelled), _on_done() is called.
+        When process() is cancelled, wrapped provider is cancelled too and it is awaited.
+    """
+
+    def __init__(self, provider: AsyncQueuePutProcessable) -> None:
+        self.provider = provider
+        self.queued = 0
+
+    def _get_inner_queue(self, queue: asyncio.Queue) -> asyncio.Queue:
+        return asyncio.Queue(max(queue.maxsize, 1))
+
+    @staticmethod
+    async def _get_batch(inner_queue: asyncio.Queue, limit: Optional[int] = None,
+                         wait: bool = True) -> tuple[list[FileInfo], bool]:
+        """
+            (files, end) - up to limit files that are in inner_queue already, if wait is True then the first one
+            is waited for. end is True if QUEUE_END is got (it is not in files).
+        """
+        batch = [await inner_queue.get()] if wait else []
+        while (limit is None or len(batch) < limit) and not inner_queue.empty():
+            batch.append(inner_queue.get_nowait())
+        if batch and batch[-1] is QUEUE_END:
+            batch.pop()
+            return batch, True
+        return batch, False
+
+    async def _process_batch(self, batch: list[FileInfo], queue: asyncio.Queue):
         raise NotImplementedError
 
+    async def _on_done(self):
+        pass
+
+    async def _pump(self, inner_queue: asyncio.Queue, queue: asyncio.Queue):
+        end = False
+        while not end:
+            batch, end = await self._get_batch(inner_queue)
+            if batch:
+                await self._process_batch(batch, queue)
+
+    async def process(self, queue: asyncio.Queue):
+        inner_queue = self._get_inner_queue(queue)
+        provider_task = asyncio.create_task(self.provider.process(inner_queue))
+        try:
+            await self._pump(inner_queue, queue)
+            await provider_task
+            await self._on_done()
+        except asyncio.CancelledError as exc:
+            provider_task.cancel()
+            await self._wait_provider(inner_queue, provider_task)
+            raise
+        finally:
+            await queue.put(QUEUE_END)
+
+    @staticmethod
+    async def _wait_provider(inner_queue: asyncio.Queue, provider_task: asyncio.Task):
+        """
+            Cancelled provider puts QUEUE_END too, inner_queue is drained meanwhile so it is not blocked forever
+        """
+        async def drain():
+            while True:
+                await inner_queue.get()
+
+        drain_task = asyncio.create_task(drain())
+        try:
+            await asyncio.gather(provider_task, return_exceptions=True)
+        finally:
+            drain_task.cancel()
+
 
 class AsyncQueueGetProcessable(Protocol):
 
     async def process(self, queue: asyncio.Queue, provider_task: asyncio.Task):
+        """
+            Consumes items via queue_get(queue) until QUEUE_END.
+            provider_task is used only to abort providing when further processing is impossible.
+        """
+        raise NotImplementedError
+
+
+class ConversionObserver(Protocol):
+    """
+        Gets notified by converter about the result of each file.
+        server - the server (or None) that made the last attempt.
+    """
+
+    def file_done(self, file_info: FileInfo, outpath: Path, server: Any):
+        raise NotImplementedError
+
+    def file_failed(self, file_info: FileInfo, error: str, server: Any):
         raise NotImplementedError
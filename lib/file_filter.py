@@ -0,0 +1,208 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: file_filter.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 5:10 PM
+import functools
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional, Sequence, Collection, Pattern, Union
+
+
+# "*.odt" like patterns are checked by extension set, without regex
+SIMPLE_EXTENSION_PATTERN = re.compile(r'\*(\.[^*?\[\]/.]+)')
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+        Translates glob into regex that is matched against the path relative to home ("/" separated).
+        "**" matches any number of path parts (including none), "*" and "?" do not match "/",
+        "[...]" and "[!...]" are character classes.
+        Pattern without "/" is matched against the name at any depth (like "*.odt"),
+        pattern with "/" is matched against the whole relative path (like "docs/**/*.odt" or "/docs").
+    """
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.strip('/')
+    res, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            res.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            res.append('.*')
+            i += 2
+            continue
+
+        if c == '*':
+            res.append('[^/]*')
+        elif c == '?':
+            res.append('[^/]')
+        elif c == '[' and pattern.find(']', i + 2) != -1:
+            j = pattern.find(']', i + 2)
+            body = pattern[i + 1:j].replace('\\', '\\\\')
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            res.append(f'[{body}]')
+            i = j
+        else:
+            res.append(re.escape(c))
+        i += 1
+
+    regex = ''.join(res)
+    return regex if anchored else f'(?:.*/)?{regex}'
+
+
+def parse_shard(value: Union[str, Sequence[int]]) -> tuple[int, int]:
+    """
+        "i/n" or (i, n) -> (i, n), shards are numbered from 0
+    """
+    try:
+        index, count = (int(part) for part in (value.split('/') if isinstance(value, str) else value))
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f'shard "{value}" should be like "i/n"')
+    if not 0 <= index < count:
+        raise ValueError(f'shard "{value}" should be in range [0..n-1]/n')
+    return index, count
+
+
+def shard_of(rel_path: str, count: int) -> int:
+    """
+        Stable (does not depend on run, process or machine) shard of path relative to home ("/" separated)
+    """
+    digest = hashlib.blake2b(rel_path.encode('utf-8', 'surrogateescape'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count
+
+
+def compile_globs(patterns: Sequence[str], flags: int = 0) -> Optional[Pattern]:
+    """
+        All patterns are compiled into one regex, None if there are no patterns
+    """
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{glob_to_regex(pattern)})' for pattern in patterns), flags)
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """
+        Include/exclude rules that FileProvider evaluates while it walks (look at FileProvider.filter_spec).
+        Paths are relative to home and "/" separated, look at glob_to_regex() about patterns.
+
+        File is accepted if
+            - it is a file (or symlink to file)
+            - its extension is in extensions (if extensions is set)
+            - it matches any of include and none of exclude
+            - size and mtime are inside of [min_size, max_size] and [min_mtime, max_mtime] (if they are set)
+        Directory is not walked at all if it matches any of prune or it is excluded by "dir/**" pattern of exclude.
+
+        Only size/mtime predicates need stat(), the rest uses the name and type of DirEntry.
+
+        FilterSpec(include=('*.odt', '*.docx'), exclude=('drafts/**', '~$*'), prune=('.git', 'node_modules'))
+    """
+
+    include: Sequence[str] = ('*', )
+    exclude: Sequence[str] = ()
+    extensions: Optional[Collection[str]] = None  # like {'.odt', '.docx'}
+    prune: Sequence[str] = ()
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    min_mtime: Optional[float] = None  # timestamp
+    max_mtime: Optional[float] = None
+    case_sensitive: bool = True
+
+    @functools.cached_property
+    def _flags(self) -> int:
+        return 0 if self.case_sensitive else re.IGNORECASE
+
+    def _normalize_ext(self, ext: str) -> str:
+        return ext if self.case_sensitive else ext.lower()
+
+    @functools.cached_property
+    def _extensions(self) -> Optional[frozenset[str]]:
+        if self.extensions is None:
+            return None
+        return frozenset(self._normalize_ext(ext if ext.startswith('.') else f'.{ext}') for ext in self.extensions)
+
+    @functools.cached_property
+    def _include(self) -> tuple[frozenset[str], Optional[Pattern], bool]:
+        """
+            (extensions of simple patterns, regex of others, accept all)
+        """
+        if not self.include or '*' in self.include or '**' in self.include:
+            return frozenset(), None, True
+
+        exts, others = set(), []
+        for pattern in self.include:
+            m = SIMPLE_EXTENSION_PATTERN.fullmatch(pattern)
+            if m:
+                exts.add(self._normalize_ext(m.group(1)))
+            else:
+                others.append(pattern)
+        return frozenset(exts), compile_globs(others, self._flags), False
+
+    @functools.cached_property
+    def _exclude(self) -> Optional[Pattern]:
+        return compile_globs(self.exclude, self._flags)
+
+    @functools.cached_property
+    def _prune(self) -> Optional[Pattern]:
+        # "dir/**" of exclude means nothing inside of dir is accepted, thus dir is not walked
+        prune = list(self.prune) + ['/' + pattern[:-3] for pattern in self.exclude if pattern.endswith('/**')]
+        return compile_globs([pattern for pattern in prune if pattern.strip('/')], self._flags)
+
+    @property
+    def needs_stat(self) -> bool:
+        return any(value is not None for value in (self.min_size, self.max_size, self.min_mtime, self.max_mtime))
+
+    @staticmethod
+    def _to_relative(rel_path: str) -> str:
+        return rel_path if os.sep == '/' else rel_path.replace(os.sep, '/')
+
+    def match_stat(self, st: os.stat_result) -> bool:
+        if self.min_size is not None and st.st_size < self.min_size:
+            return False
+        if self.max_size is not None and st.st_size > self.max_size:
+            return False
+        if self.min_mtime is not None and st.st_mtime < self.min_mtime:
+            return False
+        if self.max_mtime is not None and st.st_mtime > self.max_mtime:
+            return False
+        return True
+
+    def match_path(self, rel_path: str) -> bool:
+        """
+            Name rules only (extensions, include, exclude)
+        """
+        rel_path = self._to_relative(rel_path)
+        ext = self._normalize_ext(os.path.splitext(rel_path)[1])
+        if self._extensions is not None and ext not in self._extensions:
+            return False
+
+        exts, include, accept_all = self._include
+        if not accept_all and ext not in exts and (include is None or not include.fullmatch(rel_path)):
+            return False
+
+        return self._exclude is None or not self._exclude.fullmatch(rel_path)
+
+    def match_entry(self, entry: os.DirEntry, rel_path: str) -> bool:
+        """
+            entry is not directory (FileProvider walks directories itself)
+        """
+        if not self.match_path(rel_path):
+            return False
+        try:
+            if not entry.is_file():
+                return False
+            if self.needs_stat and not self.match_stat(entry.stat()):
+                return False
+        except OSError as exc:
+            return False
+        return True
+
+    def prune_dir(self, rel_path: str) -> bool:
+        return self._prune is not None and self._prune.fullmatch(self._to_relative(rel_path)) is not None
@@ -5,13 +5,18 @@
 # Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
 # Created by ox23 at 2022-08-13 (y-m-d) 1:49 PM
 import asyncio
+import concurrent.futures
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
 from enum import Enum, auto
 from pathlib import Path
-from typing import Iterable, Callable, Generator, Iterator, Optional
+from typing import Iterable, Callable, Generator, Iterator, Optional, Union
 
-from definitions import FileInfo, AsyncQueuePutProcessable
+from definitions import FileInfo, AsyncQueuePutProcessable, QUEUE_END
+from file_filter import FilterSpec, parse_shard, shard_of
 
 
 logger = logging.getLogger(__name__)
@@ -59,13 +64,28 @@ class FileProvider(Iterable):
     _home: Path = None
     _filters: list[Callable] = None
     _result_path_type: ResultPathType = ResultPathType.AS_IS
+    _shard: Optional[tuple[int, int]] = None
     __duplicates_due_to_symbolic_links = None
 
-    def __init__(self, home='.', result_path_type=ResultPathType.AS_IS, filters: list[Callable] = None) -> None:
+    # Number of threads that list directories ahead of the walk, 0 - the walk lists each directory itself.
+    # It is for high-latency file systems (NFS, CIFS). Result (order, duplicates, filters) is the same.
+    walk_workers: int = 0
+    # Max number of directories that are listed ahead
+    walk_prefetch: int = 64
+
+    def __init__(self, home='.', result_path_type=ResultPathType.AS_IS, filters: list[Callable] = None,
+                 filter_spec: Optional[FilterSpec] = None, shard: Optional[Union[str, tuple[int, int]]] = None) -> None:
+        """
+            filter_spec - is checked while walking before filters (it does not need Path objects and extra syscalls),
+            files rejected by it and pruned directories are not passed to filters
+            shard - "i/n", only files whose relative path falls into i-th of n shards are provided (look at shard_of())
+        """
         if not filters:
             filters = [type(self)._default_filter]
 
         self.filters = filters
+        self.filter_spec = filter_spec
+        self.shard = shard
         self.home = home
         self.result_path_type = result_path_type
         super().__init__()
@@ -81,6 +101,21 @@ class FileProvider(Iterable):
             raise FileNotFoundError('The home property must point to an existing directory or file.')
         self._home = path
 
+    @property
+    def shard(self) -> Optional[tuple[int, int]]:
+        return self._shard
+
+    @shard.setter
+    def shard(self, value: Optional[Union[str, tuple[int, int]]]):
+        self._shard = None if value is None else parse_shard(value)
+
+    def in_shard(self, rel_path: str) -> bool:
+        if self._shard is None:
+            return True
+        if os.sep != '/':
+            rel_path = rel_path.replace(os.sep, '/')
+        return shard_of(rel_path, self._shard[1]) == self._shard[0]
+
     @property
     def result_path_type(self) -> ResultPathType:
         return self._result_path_type
@@ -138,68 +173,195 @@ class FileProvider(Iterable):
 
         return True
 
-    def __filter_dirs(self, dirs: list[str], root: str):
-        """
-            Removes directory from dirs if filter does not allow it
-        """
-        dlen = len(dirs)
-        for i in range(dlen-1, -1, -1):  # walk reverse
-            dpath = Path(root) / dirs[i]
-            if self.filter(dpath) is False:
-                dirs.pop(i)
-
     @property
     def duplicates_due_to_symbolic_links(self) -> Optional[dict[Path, list[Path]]]:
         return self.__duplicates_due_to_symbolic_links
 
-    def _get_files(self) -> Generator[Path, None, None]:
+    def _filter_entry(self, entry: os.DirEntry, home_hidden: bool) -> bool:
+        """
+            Same as filter(), but _default_filter is checked by name of entry only, because resolved path
+            of walked directory is checked already (home once, each directory before it is walked).
+            Only symlinks are resolved (target can be hidden). Path is not created if no other filters.
+        """
+        path = None
+        for f in self.filters:
+            if f is FileProvider._default_filter:
+                if home_hidden or entry.name.startswith('.'):
+                    result = False
+                elif entry.is_symlink():
+                    result = f(entry.path)
+                else:
+                    result = None
+            else:
+                if path is None:
+                    path = Path(entry.path)
+                result = f(path)
+
+            if result is True or result is False:
+                return result
 
-        def is_symlink_processed(path: Path, processed_abspath_path: dict[Path, list[Path]]):
-            abs_path = path.resolve()
-            if abs_path in processed_abspath_path:
-                processed_abspath_path[abs_path].append(path)
-                return True
+        return True
 
-            if path.is_symlink():
-                processed_abspath_path.setdefault(abs_path, []).append(path)
+    def _make_result(self, entry: os.DirEntry, rel_root: str, real_root: str) -> Path:
+        if self.result_path_type == ResultPathType.AS_IS:
+            return Path(entry.path)
+        elif self.result_path_type == ResultPathType.ABSOLUTE:
+            if entry.is_symlink():
+                return Path(os.path.realpath(entry.path))
+            return Path(os.path.join(real_root, entry.name))
+        # ResultPathType.RELATIVE_TO_HOME
+        return Path(os.path.join(rel_root, entry.name))
 
-            return False
+    @staticmethod
+    def _scandir(path: str) -> tuple[list[os.DirEntry], list[os.DirEntry]]:
+        """
+            Returns (files, dirs) entries in directory order, symlinks to directories are dirs (like os.walk does).
+        """
+        files, dirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError as exc:
+                    is_dir = False
+                (dirs if is_dir else files).append(entry)
+        return files, dirs
+
+    def _scan(self, path: str, spec: Optional[FilterSpec]) -> tuple[list[os.DirEntry], list[os.DirEntry]]:
+        """
+            _scandir() + stat() of entries that the walk needs (DirEntry caches it), used by walk_workers
+        """
+        files, dirs = self._scandir(path)
+        needs_stat = spec is not None and spec.needs_stat
+        for entry in dirs:
+            try:
+                entry.stat()
+            except OSError as exc:
+                pass
+        for entry in files:
+            try:
+                if needs_stat or entry.is_symlink():
+                    entry.stat()
+            except OSError as exc:
+                pass
+        return files, dirs
+
+    def _on_directory(self, path: str, rel_path: str):
+        """
+            It is called for each directory that is walked before it is listed (inside of walker thread if it is used),
+            thus changes made after the listing are not missed by watcher (WatchFileProvider).
+            Directory that is listed ahead (walk_workers) can turn out to be walked already, it is skipped then.
+        """
+        pass
 
-        self.__duplicates_due_to_symbolic_links = {}  # dict of abspath -> [path, path] duplicates due to symbolic links
+    def _get_files(self, heartbeat: Optional[Callable[[], bool]] = None) -> Generator[Path, None, None]:
+        """
+            heartbeat - it is called before each directory is walked (also between files that match rarely),
+            walk stops if it returns False
+            Depth-first walk on os.scandir (same order as os.walk(followlinks=True)).
+            Directory that was walked already (symlink loop or other symlink to it) is skipped,
+            directories are identified by (st_dev, st_ino). The same for files that are pointed by symlinks,
+            only the first symlink to the file is yielded (regular files are not tracked).
+            DirEntry caches type, thus regular files need no syscalls except filters of user.
+            If walk_workers is set, directories on top of the stack (next to be walked) are listed
+            by thread pool ahead, the walk itself stays sequential.
+        """
+        # dict of abspath -> [path, path] duplicates due to symbolic links
+        duplicates = self.__duplicates_due_to_symbolic_links = {}
         if self.home.is_file():
             yield self.home
-        else:
-            for root, dirs, files in os.walk(str(self.home), followlinks=True):
-                # root is the concatenated root from previous step + each dir from dirs on next step.
-                # but on the first step is the root that passed into os.walk
-
-                root_path = Path(root)
-                if is_symlink_processed(root_path, self.__duplicates_due_to_symbolic_links):
-                    # skip walking through internal processed dirs too
-                    dirs.clear()
-                    continue
-
-                # remove from dirs the dirs which didn't allow by filter
-                self.__filter_dirs(dirs, str(root_path))
+            return
+
+        def is_duplicate(key: tuple[int, int], path: str, visited: dict[tuple[int, int], str]) -> bool:
+            first = visited.get(key)
+            if first is None:
+                visited[key] = path
+                return False
+            duplicates.setdefault(Path(first).resolve(), [Path(first)]).append(Path(path))
+            return True
+
+        spec = self.filter_spec
+        home = str(self.home)
+        home_hidden = FileProvider._default_filter in self.filters and self._default_filter(self.home) is False
+        home_stat = os.stat(home)
+
+        # (path, key, path relative to home, resolved path)
+        stack = [(home, (home_stat.st_dev, home_stat.st_ino), '', os.path.realpath(home))]
+        visited_dirs: dict[tuple[int, int], str] = {}  # (st_dev, st_ino) -> path
+        visited_files: dict[tuple[int, int], str] = {}  # files pointed by symlinks
+        listings: dict[str, Future] = {}  # path -> future of _scan()
+        executor = None
+        if self.walk_workers:
+            executor = ThreadPoolExecutor(self.walk_workers, thread_name_prefix=self.__class__.__name__)
 
-                for file in files:
-                    file_path = root_path / file
+        try:
+            while stack:
+                root, key, rel_root, real_root = stack.pop()
+                listing = listings.pop(root, None)
+                if is_duplicate(key, root, visited_dirs):
+                    if listing is not None:
+                        listing.cancel()
+                    continue
+                if heartbeat is not None and heartbeat() is False:
+                    return
+
+                if listing is None:
+                    self._on_directory(root, rel_root)
+                try:
+                    files, dirs = listing.result() if listing is not None else self._scandir(root)
+                except OSError as exc:
+                    logger.debug(f'##{self.__class__.__name__}##: directory "{root}" is skipped: {exc!r}')
+                    continue
 
-                    # check symlink if it points in already processed file
-                    if is_symlink_processed(file_path, self.__duplicates_due_to_symbolic_links):
-                        # skip walking through internal processed dirs too
+                for entry in files:
+                    rel_path = os.path.join(rel_root, entry.name)
+                    if spec is not None and not spec.match_entry(entry, rel_path):
+                        continue
+                    if not self.in_shard(rel_path):
                         continue
 
-                    if self.filter(file_path):
-                        res = file_path.relative_to(self.home)
-                        if self.result_path_type == ResultPathType.AS_IS:
-                            res = file_path
-                        elif self.result_path_type == ResultPathType.ABSOLUTE:
-                            res = file_path.resolve()
-                        elif self.result_path_type == ResultPathType.RELATIVE_TO_HOME:
-                            pass
-
-                        yield res
+                    try:
+                        # only targets of symlinks are tracked, regular files (hardlinks too) are never skipped
+                        if entry.is_symlink():
+                            st = entry.stat()
+                            if is_duplicate((st.st_dev, st.st_ino), entry.path, visited_files):
+                                continue
+                    except OSError as exc:
+                        # broken symlink
+                        pass
+
+                    if self._filter_entry(entry, home_hidden):
+                        yield self._make_result(entry, rel_root, real_root)
+
+                subdirs = []
+                for entry in dirs:
+                    rel_path = os.path.join(rel_root, entry.name)
+                    if spec is not None and spec.prune_dir(rel_path):
+                        continue
+                    if not self._filter_entry(entry, home_hidden):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError as exc:
+                        continue
+                    if entry.is_symlink():
+                        real_path = os.path.realpath(entry.path)
+                    else:
+                        real_path = os.path.join(real_root, entry.name)
+                    subdirs.append((entry.path, (st.st_dev, st.st_ino), rel_path, real_path))
+                stack.extend(reversed(subdirs))
+
+                if executor is not None:
+                    # directories that are next to be walked
+                    for item in reversed(stack):
+                        if len(listings) >= self.walk_prefetch:
+                            break
+                        if item[0] not in listings:
+                            self._on_directory(item[0], item[2])
+                            listings[item[0]] = executor.submit(self._scan, item[0], spec)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
 
     def __iter__(self) -> Iterator:
         for res_path in self._get_files():
@@ -207,10 +369,22 @@ class FileProvider(Iterable):
 
 
 class AsyncFileProvider(FileProvider, AsyncQueuePutProcessable):
+    """
+        If use_thread is True, directory walking (scandir, stat, filters) runs in a thread
+        and found files are handed over to the queue by batches. Thread waits while the queue is full,
+        thus the queue size bounds the prefetch, and the event loop never waits for the file system.
+        Batch is handed over if it has batch_size files or it is older than batch_interval seconds
+        (age is checked for each found file and each walked directory).
+    """
+
+    use_thread: bool = True
+    batch_size: int = 32
+    batch_interval: float = 0.05
 
     def __init__(self, home='.', result_path_type=ResultPathType.AS_IS, filters: list[Callable] = None,
-                 logger_handler: Optional[logging.Handler] = None) -> None:
-        super().__init__(home, result_path_type, filters)
+                 logger_handler: Optional[logging.Handler] = None, filter_spec: Optional[FilterSpec] = None,
+                 shard: Optional[Union[str, tuple[int, int]]] = None) -> None:
+        super().__init__(home, result_path_type, filters, filter_spec, shard)
 
         if not isinstance(logger_handler, logging.Handler):
             exists = [handler for handler in logger.handlers if isinstance(handler, logging.StreamHandler)]
@@ -219,19 +393,84 @@ class AsyncFileProvider(FileProvider, AsyncQueuePutProcessable):
         else:
             logger.addHandler(logger_handler)
 
-    async def process(self, queue: asyncio.Queue):
+    async def _put_batch(self, queue: asyncio.Queue, batch: list[FileInfo]):
         cimsg = f'##{self.__class__.__name__}.process()##:'
+        for fi in batch:
+            logger.debug(f'{cimsg} trying put in queue: {fi}')
+            await queue.put(fi)
+            logger.info(f'{cimsg} file are queued: {fi} ')
+
+    def _walk_in_thread(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop, stop: threading.Event,
+                        handoff: list[concurrent.futures.Future]) -> int:
+        """
+            It is run inside the thread. Returns number of queued files.
+            handoff - holder of the current handoff future, process() cancels it if it is cancelled itself
+        """
+        cnt, batch, batch_time, cancelled = 0, [], 0, False
+
+        def hand_over(force: bool = False) -> bool:
+            """
+                Hands over the batch if it is full or old (or force). Returns False if walk should be stopped.
+            """
+            nonlocal cnt, batch, cancelled
+            if cancelled or stop.is_set():
+                return False
+            if not batch or not (
+                force or len(batch) >= self.batch_size or time.monotonic() - batch_time >= self.batch_interval
+            ):
+                return True
+
+            handoff[:] = [asyncio.run_coroutine_threadsafe(self._put_batch(queue, batch), loop)]
+            try:
+                handoff[0].result()
+            except concurrent.futures.CancelledError as exc:
+                cancelled = True
+                return False
+            cnt += len(batch)
+            batch = []
+            return True
+
+        # file is path but depends from provider.result_path_type
+        for file in self._get_files(heartbeat=hand_over):
+            if not batch:
+                batch_time = time.monotonic()
+            batch.append(FileInfo(self.home, file))
+            if not hand_over():
+                return cnt
+
+        hand_over(force=True)
+        return cnt
+
+    async def _process_in_loop(self, queue: asyncio.Queue) -> int:
         cnt = 0
+        for file in self._get_files():  # file is path but depends from provider.result_path_type
+            await self._put_batch(queue, [FileInfo(self.home, file)])
+            cnt += 1
+        return cnt
+
+    async def _walk(self, queue: asyncio.Queue, stop: threading.Event, handoff: list[concurrent.futures.Future]) -> int:
+        """
+            Returns number of queued files
+        """
+        if self.use_thread:
+            return await asyncio.to_thread(self._walk_in_thread, queue, asyncio.get_running_loop(), stop, handoff)
+        return await self._process_in_loop(queue)
+
+    async def process(self, queue: asyncio.Queue):
+        cimsg = f'##{self.__class__.__name__}.process()##:'
         logger.info(f'{cimsg} started')
+        stop, handoff = threading.Event(), []
         try:
-            for file in self._get_files():  # file is path but depends from provider.result_path_type
-                fi = FileInfo(self.home, file)
-                logger.debug(f'{cimsg} trying put in queue: {fi}')
-                await queue.put(fi)
-                logger.info(f'{cimsg} file are queued: {fi} ')
-                cnt += 1
+            cnt = await self._walk(queue, stop, handoff)
         except asyncio.CancelledError as exc:
+            # thread stops on the next file or handoff
+            stop.set()
+            for fut in handoff:
+                fut.cancel()
             logger.info(f'{cimsg} cancelled due to: {exc}')
             raise
         else:
             logger.info(f'{cimsg} done, processed: [{cnt}] files')
+        finally:
+            # unblocks the consumers that wait in queue_get()
+            await queue.put(QUEUE_END)
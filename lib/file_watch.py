@@ -0,0 +1,380 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: file_watch.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 9:15 PM
+import asyncio
+import concurrent.futures
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import stat
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Callable, Union
+
+from definitions import FileInfo
+from file_filter import FilterSpec
+from file_provider import AsyncFileProvider, ResultPathType
+
+
+logger = logging.getLogger(__name__)
+
+# linux/inotify.h
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF \
+             | IN_ONLYDIR
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError) as exc:
+        return None
+    return libc
+
+
+_libc = _load_libc()
+INOTIFY_SUPPORTED = _libc is not None
+
+
+def _raise_errno(what: str):
+    code = ctypes.get_errno()
+    raise OSError(code, f'{what}: {os.strerror(code)}')
+
+
+class Inotify:
+    """
+        Minimal inotify(7) binding, fd is non-blocking (read() returns [] if there are no events)
+    """
+
+    read_size = 64 * 1024
+
+    def __init__(self) -> None:
+        if not INOTIFY_SUPPORTED:
+            raise OSError(errno.ENOSYS, 'inotify is not supported')
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            _raise_errno('inotify_init1')
+        self.fd = fd
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            _raise_errno(f'inotify_add_watch "{path}"')
+        return wd
+
+    def rm_watch(self, wd: int):
+        # EINVAL if watch is removed already (directory is deleted)
+        _libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> list[tuple[int, int, int, str]]:
+        """
+            [(wd, mask, cookie, name), ...]
+        """
+        try:
+            data = os.read(self.fd, self.read_size)
+        except BlockingIOError:
+            return []
+
+        events, offset = [], 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class WatchFileProvider(AsyncFileProvider):
+    """
+        Long-running provider, after initial walk it queues files of home that are created or modified,
+        until stop() is called or process() is cancelled.
+
+        Watches (inotify) are added for each walked directory while walking, directories that are
+        created or moved in later are walked and watched too (their files are queued).
+        File is queued when it is quiet: settle_delay after it is closed for writing (or moved in),
+        debounce_delay after the last modification otherwise. Then it is checked by filter_spec and filters.
+        If events are lost (queue overflow) files modified since the last events are found by walk.
+
+        If inotify is not supported (or watch limit is reached) then home is walked each poll_interval
+        and files whose mtime or size is changed are queued, if they were not modified for debounce_delay.
+    """
+
+    use_inotify: bool = True
+    settle_delay: float = 0.5
+    debounce_delay: float = 2.0
+    poll_interval: float = 30.0
+
+    _inotify: Optional[Inotify] = None
+    _inotify_error: Optional[OSError] = None
+
+    def __init__(self, home='.', result_path_type=ResultPathType.AS_IS, filters: list[Callable] = None,
+                 logger_handler: Optional[logging.Handler] = None, filter_spec: Optional[FilterSpec] = None,
+                 shard: Optional[Union[str, tuple[int, int]]] = None) -> None:
+        super().__init__(home, result_path_type, filters, logger_handler, filter_spec, shard)
+        # stop() can be called before process() is started, it is not reset by process()
+        self._wakeup = asyncio.Event()
+        self._stopped = asyncio.Event()
+
+    def _init_watch(self):
+        self._inotify, self._inotify_error = None, None
+        self._watches: dict[int, tuple[str, str]] = {}  # wd -> (path, path relative to home)
+        self._watches_lock = threading.Lock()
+        self._pending: dict[tuple[str, str], float] = {}  # (path, relative path) -> when it is quiet (loop.time())
+        self._new_dirs: list[tuple[str, str]] = []
+        self._overflow = False
+        if self.use_inotify and INOTIFY_SUPPORTED:
+            try:
+                self._inotify = Inotify()
+            except OSError as exc:
+                logger.warning(f'##{self.__class__.__name__}##: polling is used, inotify failed: {exc!r}')
+
+    def stop(self):
+        """
+            process() queues QUEUE_END and returns
+        """
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _on_directory(self, path: str, rel_path: str):
+        if self._inotify is None or self._inotify_error is not None:
+            return
+        try:
+            wd = self._inotify.add_watch(path)
+        except OSError as exc:
+            if exc.errno == errno.ENOSPC:
+                # fs.inotify.max_user_watches
+                self._inotify_error = exc
+            return
+        with self._watches_lock:
+            # watch is per inode, the same directory through symlink gets the same wd
+            self._watches.setdefault(wd, (path, rel_path))
+
+    def _remove_watches(self, path: str):
+        prefix = path + os.sep
+        with self._watches_lock:
+            for wd, (watched, rel) in list(self._watches.items()):
+                if watched == path or watched.startswith(prefix):
+                    del self._watches[wd]
+                    self._inotify.rm_watch(wd)
+
+    def _on_events(self):
+        """
+            Reader callback of inotify fd, it does not make syscalls except read()
+            and rm_watch() for directories that are moved out
+        """
+        now = asyncio.get_running_loop().time()
+        for wd, mask, cookie, name in self._inotify.read():
+            if mask & IN_Q_OVERFLOW:
+                self._overflow = True
+                continue
+            with self._watches_lock:
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                watch = self._watches.get(wd)
+            if watch is None or not name:
+                # IN_DELETE_SELF, IN_MOVE_SELF are followed by IN_IGNORED or IN_MOVED_FROM of parent
+                continue
+
+            key = (os.path.join(watch[0], name), os.path.join(watch[1], name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._new_dirs.append(key)
+                elif mask & IN_MOVED_FROM:
+                    self._remove_watches(key[0])
+            elif mask & IN_MOVED_FROM:
+                self._pending.pop(key, None)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._pending[key] = now + self.settle_delay
+            else:
+                self._pending[key] = now + self.debounce_delay
+        self._wakeup.set()
+
+    def _walk_new_dirs(self, dirs: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """
+            It is run inside of thread. Adds watches, returns files [(path, relative path)]
+        """
+        files, stack = [], list(dirs)
+        while stack:
+            path, rel_path = stack.pop()
+            if not self._accept_dir(path, rel_path):
+                continue
+            self._on_directory(path, rel_path)
+            try:
+                entries, subdirs = self._scandir(path)
+            except OSError as exc:
+                continue
+            files.extend((entry.path, os.path.join(rel_path, entry.name)) for entry in entries)
+            stack.extend((entry.path, os.path.join(rel_path, entry.name)) for entry in subdirs)
+        return files
+
+    def _accept_dir(self, path: str, rel_path: str) -> bool:
+        if self.filter_spec is not None and self.filter_spec.prune_dir(rel_path):
+            return False
+        return self.filter(Path(path)) is not False
+
+    def _accept_file(self, path: str, rel_path: str) -> bool:
+        try:
+            st = os.stat(path)
+        except OSError as exc:
+            # it is deleted or moved already
+            return False
+        if not stat.S_ISREG(st.st_mode):
+            return False
+        spec = self.filter_spec
+        if spec is not None:
+            if not spec.match_path(rel_path) or (spec.needs_stat and not spec.match_stat(st)):
+                return False
+        if not self.in_shard(rel_path):
+            return False
+        return self.filter(Path(path))
+
+    def _get_result(self, path: str, rel_path: str) -> Path:
+        if self.result_path_type == ResultPathType.AS_IS:
+            return Path(path)
+        elif self.result_path_type == ResultPathType.ABSOLUTE:
+            return Path(os.path.realpath(path))
+        return Path(rel_path)
+
+    def _accept_files(self, files: list[tuple[str, str]]) -> list[Path]:
+        return [self._get_result(path, rel_path) for path, rel_path in files if self._accept_file(path, rel_path)]
+
+    def _full_path(self, result: Path) -> Path:
+        return self.home / result if self.result_path_type == ResultPathType.RELATIVE_TO_HOME else result
+
+    def _snapshot(self) -> dict[Path, tuple[int, int]]:
+        """
+            It is run inside of thread. Walks home, {result: (mtime_ns, size)}
+        """
+        snapshot = {}
+        for result in self._get_files():
+            try:
+                st = self._full_path(result).stat()
+            except OSError as exc:
+                continue
+            snapshot[result] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    async def _put(self, queue: asyncio.Queue, results: list[Path]) -> int:
+        await self._put_batch(queue, [FileInfo(self.home, result) for result in results])
+        return len(results)
+
+    async def _wait(self, timeout: Optional[float]):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _watch_events(self, queue: asyncio.Queue) -> int:
+        cimsg = f'##{self.__class__.__name__}.process()##:'
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self._inotify.fd, self._on_events)
+        cnt, last_events_time = 0, time.time()
+        try:
+            while not self._stopped.is_set():
+                now = loop.time()
+                timeout = max(min(self._pending.values()) - now, 0) if self._pending else None
+                await self._wait(timeout)
+
+                new_dirs, self._new_dirs = self._new_dirs, []
+                if new_dirs:
+                    files = await asyncio.to_thread(self._walk_new_dirs, new_dirs)
+                    for key in files:
+                        self._pending.setdefault(key, loop.time() + self.debounce_delay)
+
+                if self._overflow:
+                    self._overflow = False
+                    logger.warning(f'{cimsg} inotify events are lost, home is walked')
+                    since_ns = int((last_events_time - 1) * 1e9)
+                    snapshot = await asyncio.to_thread(self._snapshot)
+                    modified = [result for result, (mtime_ns, size) in snapshot.items() if mtime_ns >= since_ns]
+                    cnt += await self._put(queue, modified)
+                last_events_time = time.time()
+
+                now = loop.time()
+                ready = [key for key, quiet_time in self._pending.items() if quiet_time <= now]
+                for key in ready:
+                    del self._pending[key]
+                if ready:
+                    cnt += await self._put(queue, await asyncio.to_thread(self._accept_files, ready))
+        finally:
+            loop.remove_reader(self._inotify.fd)
+        return cnt
+
+    async def _watch_polling(self, queue: asyncio.Queue) -> int:
+        cnt = 0
+        # files that are modified after start of initial walk are checked by next poll
+        known = {
+            result: None if identity[0] >= self._walk_start_ns else identity
+            for result, identity in (await asyncio.to_thread(self._snapshot)).items()
+        }
+        while not self._stopped.is_set():
+            await self._wait(self.poll_interval)
+            if self._stopped.is_set():
+                break
+            snapshot = await asyncio.to_thread(self._snapshot)
+            quiet_ns = int((time.time() - self.debounce_delay) * 1e9)
+            changed = []
+            for result, identity in snapshot.items():
+                if known.get(result) != identity and identity[0] <= quiet_ns:
+                    changed.append(result)
+                    known[result] = identity
+            # not quiet files stay unknown, they are checked by next poll
+            known = {result: identity for result, identity in known.items() if result in snapshot}
+            cnt += await self._put(queue, changed)
+        return cnt
+
+    async def _walk(self, queue: asyncio.Queue, stop: threading.Event, handoff: list[concurrent.futures.Future]) -> int:
+        cimsg = f'##{self.__class__.__name__}.process()##:'
+        self._init_watch()
+        self._walk_start_ns = time.time_ns()
+        try:
+            cnt = await super()._walk(queue, stop, handoff)
+            logger.info(f'{cimsg} initial walk is done, queued: [{cnt}] files')
+            if self._inotify is not None and self._inotify_error is not None:
+                logger.warning(f'##{self.__class__.__name__}##: polling is used, {self._inotify_error!r}')
+                self._inotify.close()
+                self._inotify = None
+
+            if self._inotify is not None:
+                cnt += await self._watch_events(queue)
+            else:
+                cnt += await self._watch_polling(queue)
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+        return cnt
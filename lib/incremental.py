@@ -0,0 +1,189 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: incremental.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 6:45 PM
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Union, Any, Optional, Callable
+
+from conversion_cache import file_digest
+from definitions import FileInfo, ConversionObserver, AsyncQueuePutProcessable, WrappingFileProvider
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionState(ConversionObserver):
+    """
+        Stored record of converted files, JSON file
+        {"version": 1, "files": {"<file relative to home>": {"size": ..., "mtime_ns": ..., "sha256": ..., "output": ...}}}
+
+        Record is made when file is converted (file_done), identity of source is taken when file is queued.
+        Source is fresh if its size and mtime are the same as recorded and the recorded output is the asked one
+        and it exists.
+        If use_hash is True and only mtime differs (touched, copied back) then content hash decides.
+        Without record (first run, lost state) source is fresh if output exists and is not older than source.
+    """
+
+    version = 1
+    hash_chunk_size = 1 << 20
+
+    def __init__(self, path: Union[str, Path], use_hash: bool = False) -> None:
+        self.path: Path = path if isinstance(path, Path) else Path(path)
+        self.use_hash = use_hash
+        self.records: dict[str, dict] = {}
+        self._pending: dict[str, dict] = {}  # identity of queued files
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fd:
+                data = json.load(fd)
+        except FileNotFoundError as exc:
+            return
+        except (OSError, ValueError) as exc:
+            logger.warning(f'##{self.__class__.__name__}##: state "{self.path}" is ignored: {exc!r}')
+            return
+
+        if data.get('version') == self.version:
+            self.records = data.get('files', {})
+
+    def save(self):
+        """
+            Atomic, state is written into temporary file that replaces the old one
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f'{self.path.name}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as fd:
+            json.dump({'version': self.version, 'files': self.records}, fd, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def key(file_info: FileInfo) -> str:
+        return file_info.file.as_posix()
+
+    def get_hash(self, path: Path) -> str:
+        return file_digest(path, self.hash_chunk_size)
+
+    def check(self, file_info: FileInfo, outpath: Path) -> Optional[dict]:
+        """
+            It makes blocking calls (stat, read for hash). Returns None if output is fresh,
+            otherwise identity of source that should be recorded when file is converted.
+        """
+        source = file_info.home / file_info.file
+        try:
+            st = source.stat()
+        except OSError as exc:
+            # converter will report it
+            return {}
+
+        identity = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        record = self.records.get(self.key(file_info))
+        if record is None:
+            try:
+                if outpath.stat().st_mtime_ns >= st.st_mtime_ns:
+                    # output of previous run is adopted
+                    if self.use_hash:
+                        identity['sha256'] = self.get_hash(source)
+                    self.records[self.key(file_info)] = dict(identity, output=str(outpath))
+                    return None
+            except OSError as exc:
+                pass
+        # recorded output of other target (convert_to or dest is changed) does not make the asked one fresh
+        elif record.get('output') == str(outpath) and outpath.exists() and record.get('size') == st.st_size:
+            if record.get('mtime_ns') == st.st_mtime_ns:
+                return None
+            if self.use_hash and record.get('sha256'):
+                identity['sha256'] = self.get_hash(source)
+                if identity['sha256'] == record['sha256']:
+                    # content is the same, only mtime is updated
+                    record.update(identity)
+                    return None
+
+        if self.use_hash and 'sha256' not in identity:
+            identity['sha256'] = self.get_hash(source)
+        return identity
+
+    def set_pending(self, file_info: FileInfo, identity: dict):
+        self._pending[self.key(file_info)] = identity
+
+    def file_done(self, file_info: FileInfo, outpath: Path, server: Any):
+        key = self.key(file_info)
+        identity = self._pending.pop(key, None)
+        if identity and outpath is not None:
+            self.records[key] = dict(identity, output=str(outpath))
+
+    def file_failed(self, file_info: FileInfo, error: str, server: Any):
+        self._pending.pop(self.key(file_info), None)
+
+    def remove_deleted(self, home: Path, seen: set[str]) -> list[Path]:
+        """
+            Removes outputs (and records) of sources that are not seen and do not exist anymore.
+            Returns removed outputs.
+        """
+        removed = []
+        for key in [key for key in self.records if key not in seen]:
+            if (home / key).exists():
+                # it is just not provided (filters are changed, replay of some files)
+                continue
+            output = Path(self.records.pop(key).get('output', ''))
+            try:
+                output.unlink()
+            except FileNotFoundError as exc:
+                continue
+            except OSError as exc:
+                logger.warning(f'##{self.__class__.__name__}##: output "{output}" is not removed: {exc!r}')
+                continue
+            removed.append(output)
+        return removed
+
+
+class IncrementalFileProvider(WrappingFileProvider):
+    """
+        Wraps other provider, files whose output is fresh (look at ConversionState) are not queued.
+        When wrapped provider is done (not cancelled), outputs of deleted sources are removed.
+        Checks are made in thread.
+    """
+
+    def __init__(self, provider: AsyncQueuePutProcessable, state: ConversionState,
+                 get_outpath: Callable[[FileInfo], Path], home: Optional[Union[str, Path]] = None) -> None:
+        """
+            home - where sources of the records are, by default provider.home. If it is None, nothing is removed.
+        """
+        super().__init__(provider)
+        self.state = state
+        self.get_outpath = get_outpath
+        home = getattr(provider, 'home', None) if home is None else home
+        self.home: Optional[Path] = None if home is None else Path(home)
+        self.seen: set[str] = set()
+        self.skipped = 0
+        self.removed: list[Path] = []
+
+    def _check(self, batch: list[FileInfo]) -> list[tuple[FileInfo, Optional[dict]]]:
+        return [(file_info, self.state.check(file_info, self.get_outpath(file_info))) for file_info in batch]
+
+    async def _process_batch(self, batch: list[FileInfo], queue: asyncio.Queue):
+        for file_info, identity in await asyncio.to_thread(self._check, batch):
+            self.seen.add(self.state.key(file_info))
+            if identity is None:
+                self.skipped += 1
+                logger.debug(f'##{self.__class__.__name__}.process()##: output is fresh: {file_info}')
+                continue
+            self.state.set_pending(file_info, identity)
+            await queue.put(file_info)
+            self.queued += 1
+
+    async def _on_done(self):
+        cimsg = f'##{self.__class__.__name__}.process()##:'
+        if self.home is not None:
+            self.removed = await asyncio.to_thread(self.state.remove_deleted, self.home, self.seen)
+            for output in self.removed:
+                logger.info(f'{cimsg} output of deleted source is removed: {output}')
+        logger.info(
+            f'{cimsg} done, queued: [{self.queued}], fresh: [{self.skipped}], removed: [{len(self.removed)}]'
+        )
@@ -0,0 +1,241 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: job_journal.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 8:20 PM
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Union, Any, Optional, Iterable
+
+from definitions import FileInfo, ConversionObserver, AsyncQueuePutProcessable, WrappingFileProvider, QUEUE_END
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobJournal(ConversionObserver):
+    """
+        Durable state of run in SQLite (WAL mode), it allows to resume the run after crash.
+        Each file of home has status: pending (enumerated), in_flight (queued to converters), done or failed.
+        Walk of home is marked as done when provider is exhausted, then resume does not walk again.
+
+        Changes are buffered in memory (only last status of file is kept) and committed by one transaction
+        each flush_interval seconds in thread, look at start() and stop().
+    """
+
+    PENDING = 'pending'
+    IN_FLIGHT = 'in_flight'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    flush_interval: float = 1.0
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path: Path = path if isinstance(path, Path) else Path(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._buffer_lock = threading.Lock()
+        self._jobs: dict[tuple[str, str], tuple] = {}  # (home, file) -> row
+        self._walks: dict[str, bool] = {}  # home -> walk is done
+        self._flusher: Optional[asyncio.Task] = None
+        self.commits = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS jobs (home TEXT NOT NULL, file TEXT NOT NULL, status TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0, error TEXT, output TEXT, updated REAL,'
+                ' PRIMARY KEY (home, file))'
+            )
+            connection.execute('CREATE TABLE IF NOT EXISTS walks (home TEXT PRIMARY KEY, done INTEGER NOT NULL)')
+            self._connection = connection
+        return self._connection
+
+    def record(self, file_info: FileInfo, status: str, error: Optional[str] = None, output: Optional[Path] = None):
+        row = (
+            str(file_info.home), file_info.file.as_posix(), status, file_info.attempts, error,
+            None if output is None else str(output), time.time()
+        )
+        with self._buffer_lock:
+            self._jobs[row[:2]] = row
+
+    def set_walk_done(self, home: Union[str, Path], done: bool = True):
+        with self._buffer_lock:
+            self._walks[str(home)] = done
+
+    def flush(self):
+        """
+            Blocking, buffered changes are committed by one transaction.
+            If it fails (disk is full, database is locked), changes are returned into buffer for the next flush.
+        """
+        with self._buffer_lock:
+            jobs, self._jobs = self._jobs, {}
+            walks, self._walks = self._walks, {}
+        if not jobs and not walks:
+            return
+
+        try:
+            with self._db_lock:
+                connection = self._connect()
+                connection.execute('BEGIN')
+                try:
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO jobs (home, file, status, attempts, error, output, updated)'
+                        ' VALUES (?, ?, ?, ?, ?, ?, ?)', jobs.values()
+                    )
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO walks (home, done) VALUES (?, ?)', walks.items()
+                    )
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                connection.execute('COMMIT')
+                self.commits += 1
+        except BaseException:
+            with self._buffer_lock:
+                # changes that are recorded meanwhile are newer
+                self._jobs = {**jobs, **self._jobs}
+                self._walks = {**walks, **self._walks}
+            raise
+
+    def reset(self, home: Union[str, Path]):
+        """
+            Blocking, new run of home, its records are deleted
+        """
+        home = str(home)
+        with self._buffer_lock:
+            self._jobs = {key: row for key, row in self._jobs.items() if key[0] != home}
+            self._walks.pop(home, None)
+        with self._db_lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM jobs WHERE home = ?', (home, ))
+                connection.execute('DELETE FROM walks WHERE home = ?', (home, ))
+
+    def is_walk_done(self, home: Union[str, Path]) -> bool:
+        with self._db_lock:
+            row = self._connect().execute('SELECT done FROM walks WHERE home = ?', (str(home), )).fetchone()
+        return bool(row and row[0])
+
+    def get_files(self, home: Union[str, Path], statuses: Iterable[str]) -> list[str]:
+        statuses = list(statuses)
+        with self._db_lock:
+            rows = self._connect().execute(
+                f'SELECT file FROM jobs WHERE home = ? AND status IN ({",".join("?" * len(statuses))}) ORDER BY rowid',
+                (str(home), *statuses)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def file_done(self, file_info: FileInfo, outpath: Path, server: Any):
+        self.record(file_info, self.DONE, output=outpath)
+
+    def file_failed(self, file_info: FileInfo, error: str, server: Any):
+        self.record(file_info, self.FAILED, error=error)
+
+    async def _flush(self):
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as exc:
+            logger.error(f'##{self.__class__.__name__}##: flush into "{self.path}" failed: {exc!r}')
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    def start(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically(), name='JobJournal')
+
+    async def stop(self):
+        """
+            Stops periodical flush and flushes the rest, failures are logged (not flushed changes stay in buffer)
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            except Exception as exc:
+                logger.error(f'##{self.__class__.__name__}##: periodical flush failed: {exc!r}')
+            self._flusher = None
+        await self._flush()
+
+    def close(self):
+        self.flush()
+        with self._db_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class JournalReplayProvider(AsyncQueuePutProcessable):
+    """
+        Files of home that were enumerated but are not done yet (pending, in_flight), it is used instead of walk.
+    """
+
+    def __init__(self, journal: JobJournal, home: Union[str, Path]) -> None:
+        self.journal = journal
+        self.home: Path = home if isinstance(home, Path) else Path(home)
+
+    async def process(self, queue: asyncio.Queue):
+        cnt = 0
+        try:
+            files = await asyncio.to_thread(
+                self.journal.get_files, self.home, (JobJournal.PENDING, JobJournal.IN_FLIGHT)
+            )
+            for file in files:
+                await queue.put(FileInfo(self.home, Path(file)))
+                cnt += 1
+        finally:
+            await queue.put(QUEUE_END)
+        logger.info(f'##{self.__class__.__name__}.process()##: done, replayed: [{cnt}] files')
+
+
+class JournalFileProvider(WrappingFileProvider):
+    """
+        Wraps other provider, records each file as pending and as in_flight when converters' queue accepted it.
+        Files from skip (finished by previous run) are not queued.
+        When wrapped provider is done (not cancelled), walk of home is marked as done.
+    """
+
+    def __init__(self, provider: AsyncQueuePutProcessable, journal: JobJournal, home: Union[str, Path],
+                 skip: Iterable[str] = (), is_walk: bool = True) -> None:
+        """
+            is_walk - provider enumerates all files of home (walk or its replay), otherwise (for example replay
+            of dead letters) walk is not marked as done
+        """
+        super().__init__(provider)
+        self.journal = journal
+        self.home: Path = home if isinstance(home, Path) else Path(home)
+        self.skip = set(skip)
+        self.is_walk = is_walk
+        self.skipped = 0
+
+    async def _process_batch(self, batch: list[FileInfo], queue: asyncio.Queue):
+        for file_info in batch:
+            if file_info.file.as_posix() in self.skip:
+                self.skipped += 1
+                continue
+            self.journal.record(file_info, JobJournal.PENDING)
+            await queue.put(file_info)
+            self.journal.record(file_info, JobJournal.IN_FLIGHT)
+            self.queued += 1
+
+    async def _on_done(self):
+        if self.is_walk:
+            self.journal.set_walk_done(self.home)
+        logger.info(
+            f'##{self.__class__.__name__}.process()##: done, queued: [{self.queued}], '
+            f'finished by previous run: [{self.skipped}]'
+        )
@@ -0,0 +1,130 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: run_summary.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 11:10 PM
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Union, Any, Optional, Iterable
+
+from definitions import FileInfo, ConversionObserver
+
+
+class RunSummary(ConversionObserver):
+    """
+        Small JSON report of one run (one shard), reports of shards are combined by merge()
+        {"shard": "i/n", "home": ..., "started": ..., "finished": ..., "done": ..., "failed": [{"file": ..., "error": ...}],
+         + counters of run like "fresh", "from_cache", "removed"}
+    """
+
+    def __init__(self, path: Union[str, Path], shard: Optional[tuple[int, int]] = None) -> None:
+        self.path: Path = path if isinstance(path, Path) else Path(path)
+        self.shard = shard
+        self.info: dict[str, Any] = {}
+        self.done = 0
+        self.failed: list[dict[str, str]] = []
+
+    def start(self, **info):
+        self.info = dict(info, started=time.time())
+        self.done = 0
+        self.failed = []
+
+    def file_done(self, file_info: FileInfo, outpath: Path, server: Any):
+        self.done += 1
+
+    def file_failed(self, file_info: FileInfo, error: str, server: Any):
+        self.failed.append({'file': file_info.file.as_posix(), 'error': error})
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(
+            self.info,
+            shard=None if self.shard is None else f'{self.shard[0]}/{self.shard[1]}',
+            done=self.done,
+            failed=self.failed,
+        )
+
+    def save(self, **info):
+        """
+            info - counters that are known at the end of run
+        """
+        self.info.update(info, finished=time.time())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f'{self.path.name}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as fd:
+            json.dump(self.to_dict(), fd, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def merge(summaries: Iterable[dict[str, Any]]) -> dict[str, Any]:
+        """
+            Numeric counters are summed, failed are concatenated,
+            missing_shards - shards of "n" that have no report (run is not complete)
+        """
+        summaries = list(summaries)
+        result: dict[str, Any] = {'shards': [], 'done': 0, 'failed': []}
+        counts = set()
+        for summary in summaries:
+            if summary.get('shard'):
+                result['shards'].append(summary['shard'])
+                counts.add(int(summary['shard'].split('/')[1]))
+            result['failed'].extend(summary.get('failed', []))
+            for key, value in summary.items():
+                if key in ('started', 'finished', 'shard', 'failed'):
+                    continue
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    result[key] = result.get(key, 0) + value
+                else:
+                    result.setdefault(key, value)
+
+        started = [summary['started'] for summary in summaries if 'started' in summary]
+        finished = [summary['finished'] for summary in summaries if 'finished' in summary]
+        if started and finished:
+            result['started'], result['finished'] = min(started), max(finished)
+            result['elapsed'] = result['finished'] - result['started']
+
+        result['shards'].sort(key=lambda shard: int(shard.split('/')[0]))
+        result['missing_shards'] = [
+            f'{index}/{count}' for count in sorted(counts) for index in range(count)
+            if f'{index}/{count}' not in result['shards']
+        ]
+        return result
+
+    @classmethod
+    def merge_files(cls, paths: Iterable[Union[str, Path]], out_path: Optional[Union[str, Path]] = None) -> dict:
+        summaries = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as fd:
+                summaries.append(json.load(fd))
+        result = cls.merge(summaries)
+        if out_path is not None:
+            with open(out_path, 'w', encoding='utf-8') as fd:
+                json.dump(result, fd, ensure_ascii=False, indent=1)
+        return result
+
+
+def shard_path(path: Union[str, Path], shard: Optional[tuple[int, int]]) -> Path:
+    """
+        state.json -> state.shard-1-of-4.json, thus each shard has own file (state, journal, summary, dead letter)
+    """
+    path = Path(path)
+    if shard is None:
+        return path
+    return path.with_name(f'{path.stem}.shard-{shard[0]}-of-{shard[1]}{path.suffix}')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Combines summaries of shards into one run report')
+    parser.add_argument('summaries', nargs='+', help='summary files of shards')
+    parser.add_argument('-o', '--output', help='file of run report, otherwise it is printed')
+    args = parser.parse_args()
+
+    report = RunSummary.merge_files(args.summaries, args.output)
+    if args.output is None:
+        print(json.dumps(report, ensure_ascii=False, indent=1))
+    elif report['missing_shards']:
+        print(f'missing shards: {", ".join(report["missing_shards"])}')
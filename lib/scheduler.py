@@ -0,0 +1,120 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: scheduler.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 10:20 PM
+import asyncio
+import heapq
+import itertools
+import logging
+import zipfile
+from pathlib import Path
+from typing import Union, Optional
+from xml.etree import ElementTree
+
+from definitions import FileInfo, AsyncQueuePutProcessable, WrappingFileProvider
+
+
+logger = logging.getLogger(__name__)
+
+ODF_META_NS = 'urn:oasis:names:tc:opendocument:xmlns:meta:1.0'
+
+
+def read_odf_statistic(path: Union[str, Path]) -> Optional[dict[str, int]]:
+    """
+        Attributes of <meta:document-statistic> from meta.xml of ODF zip (only this member is read),
+        like {'page-count': 12, 'word-count': 3400, 'image-count': 5, ...}. None if file is not ODF.
+    """
+    tag = f'{{{ODF_META_NS}}}document-statistic'
+    try:
+        with zipfile.ZipFile(path) as zf, zf.open('meta.xml') as fd:
+            for event, elem in ElementTree.iterparse(fd):
+                if elem.tag == tag:
+                    return {
+                        name.rsplit('}', maxsplit=1)[-1]: int(value)
+                        for name, value in elem.attrib.items() if value.isdigit()
+                    }
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError) as exc:
+        return None
+    return None
+
+
+class CostEstimator:
+    """
+        Expected conversion cost of document in abstract units, about one unit per page.
+        ODF statistic is used if it exists, otherwise size of file (size_cost per byte).
+    """
+
+    statistic_costs = {
+        'page-count': 1.0,
+        'word-count': 0.002,
+        'image-count': 0.5,
+        'table-count': 0.2,
+        'object-count': 0.5,
+    }
+    size_cost: float = 1 / 50_000
+
+    def estimate(self, path: Union[str, Path]) -> float:
+        """
+            It is blocking
+        """
+        statistic = read_odf_statistic(path)
+        if statistic:
+            return sum(self.statistic_costs.get(name, 0) * value for name, value in statistic.items())
+        try:
+            return Path(path).stat().st_size * self.size_cost
+        except OSError as exc:
+            return 0
+
+
+class LongestJobFirstProvider(WrappingFileProvider):
+    """
+        Wraps other provider, files are queued in order of expected cost (the most expensive first)
+        inside of lookahead window: up to window files are gathered (costs are estimated in thread)
+        before the most expensive of them is queued. Thus, big documents do not come last.
+
+        Files wait for dispatch in window, not in converters' queue,
+        so converters' queue should be small (about number of workers).
+    """
+
+    def __init__(self, provider: AsyncQueuePutProcessable, window: int = 256,
+                 estimator: Optional[CostEstimator] = None) -> None:
+        super().__init__(provider)
+        self.window = max(int(window), 1)
+        self.estimator = estimator or CostEstimator()
+
+    @property
+    def home(self) -> Optional[Path]:
+        return getattr(self.provider, 'home', None)
+
+    def _estimate(self, batch: list[FileInfo]) -> list[float]:
+        return [self.estimator.estimate(file_info.home / file_info.file) for file_info in batch]
+
+    def _get_inner_queue(self, queue: asyncio.Queue) -> asyncio.Queue:
+        return asyncio.Queue(self.window)
+
+    async def _pump(self, inner_queue: asyncio.Queue, queue: asyncio.Queue):
+        heap: list[tuple[float, int, FileInfo]] = []
+        order = itertools.count()
+        end = False
+        while not end or heap:
+            if not end and len(heap) < self.window:
+                batch, end = await self._get_batch(inner_queue, self.window - len(heap), wait=not heap)
+                if batch:
+                    for file_info, cost in zip(batch, await asyncio.to_thread(self._estimate, batch)):
+                        heapq.heappush(heap, (-cost, next(order), file_info))
+                if not end and len(heap) < self.window:
+                    # window is not full, wait for the provider a bit
+                    await asyncio.sleep(0)
+                    if not inner_queue.empty():
+                        continue
+
+            if heap:
+                cost, i, file_info = heapq.heappop(heap)
+                logger.debug(f'##{self.__class__.__name__}.process()##: expected cost [{-cost:.1f}]: {file_info}')
+                await queue.put(file_info)
+                self.queued += 1
+
+    async def _on_done(self):
+        logger.info(f'##{self.__class__.__name__}.process()##: done, queued: [{self.queued}] files')
@@ -0,0 +1,341 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: soffice_endpoints.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 11:50 PM
+import asyncio
+import contextlib
+import logging
+import re
+from pathlib import Path
+from typing import Optional, Union, Iterable, AsyncIterator
+
+import soffice_options as sopt
+from soffice_pool import SofficeServerPool
+from soffice_server import ServerStats, SofficeAsyncServer
+
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_RE = re.compile(
+    r'(?:pipe:(?P<pipe_name>[\w.-]+)|(?:\[(?P<host6>[^\]]+)\]|(?P<host>[^:\s\[\]]+)):(?P<port>\d+))(?::(?P<slots>\d+))?'
+)
+
+
+class RemoteSofficeServer:
+    """
+        Externally managed soffice that accepts UNO connections, for example started on other host as
+        soffice --headless --accept="socket,host=0.0.0.0,port=2002,tcpNoDelay=1;urp;StarOffice.ComponentContext"
+
+        It has interface of SofficeAsyncServer that converters use, but it is never started, killed or recycled here.
+        It serves up to slots documents at a time (one per connection).
+        Its file system is not shared by default, thus documents are sent and outputs come back through UNO bridge.
+    """
+
+    shared_filesystem: bool = False
+
+    def __init__(self, host: Optional[str] = None, port: Optional[Union[str, int]] = None,
+                 pipe_name: Optional[str] = None, slots: int = 1, shared_filesystem: Optional[bool] = None) -> None:
+        """
+            pipe_name - named pipe of soffice on this host (host and port are not used)
+        """
+        if pipe_name is None and (not host or port is None):
+            raise ValueError('either host and port or pipe_name should be set')
+        if slots < 1:
+            raise ValueError(f'slots "{slots}" should be greater than 0')
+        self.host = host
+        self.port = None if port is None else int(port)
+        self.pipe_name = pipe_name
+        self.slots = slots
+        if shared_filesystem is not None:
+            self.shared_filesystem = shared_filesystem
+
+        self.stats = ServerStats()
+        self.leased = 0
+        self.failures = 0
+        self.healthy: Optional[bool] = None  # None - it is not probed yet
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.address!r}, slots={self.slots})'
+
+    @property
+    def address(self) -> str:
+        if self.pipe_name:
+            return f'pipe:{self.pipe_name}'
+        return f'[{self.host}]:{self.port}' if ':' in self.host else f'{self.host}:{self.port}'
+
+    @property
+    def connection(self) -> dict:
+        """
+            Keyword arguments for uno_bridge.UnoBridgeConverter(...)
+        """
+        if self.pipe_name:
+            return {'pipe_name': self.pipe_name}
+        return {'interface': self.host, 'port': self.port}
+
+    @property
+    def effective_port(self) -> Union[int, str]:
+        return self.pipe_name or self.port
+
+    @property
+    def load(self) -> float:
+        return self.leased / self.slots
+
+    def is_running(self) -> bool:
+        return self.healthy is not False
+
+    def record_conversion(self, latency: float):
+        self.stats.add_latency(latency)
+
+    def should_recycle(self) -> Optional[str]:
+        return None
+
+    def terminate(self):
+        pass
+
+    def kill(self):
+        # document that hung on remote host is left to its owner, endpoint is suspended by EndpointRegistry.release()
+        self._log_server('is not killed, it is managed externally')
+
+    def _log_server(self, msg: str = '', level=logging.INFO):
+        logger.log(level, f'##{self.__class__.__name__}##: [{self.address}] {msg}')
+
+    async def probe(self, timeout: float = 3) -> bool:
+        """
+            Endpoint is healthy if it accepts connection (socket or unix domain socket of pipe)
+        """
+        try:
+            if self.pipe_name:
+                paths = [path for path in sopt.AcceptSOCmdOption(pipe_name=self.pipe_name).pipe_paths()
+                         if path.exists()]
+                if not paths:
+                    return False
+                connect = asyncio.open_unix_connection(str(paths[0]))
+            else:
+                connect = asyncio.open_connection(self.host, self.port)
+            reader, writer = await asyncio.wait_for(connect, timeout)
+        except (OSError, asyncio.TimeoutError) as exc:
+            return False
+
+        writer.close()
+        with contextlib.suppress(OSError):
+            await writer.wait_closed()
+        return True
+
+
+def parse_endpoint(spec: str) -> RemoteSofficeServer:
+    """
+        "host:port[:slots]", "[ipv6]:port[:slots]" or "pipe:name[:slots]"
+    """
+    match = ENDPOINT_RE.fullmatch(spec.strip())
+    if match is None:
+        raise ValueError(f'endpoint "{spec}" should be "host:port[:slots]" or "pipe:name[:slots]"')
+    return RemoteSofficeServer(
+        match['host6'] or match['host'], match['port'], match['pipe_name'], int(match['slots'] or 1)
+    )
+
+
+class EndpointRegistry:
+    """
+        Leases servers of remote endpoints (RemoteSofficeServer) next to servers of local pool (optional).
+        It has interface of SofficeServerPool, thus it can be passed as pool into converters:
+
+        async with EndpointRegistry.from_file('endpoints.txt', local_pool=SofficeServerPool(2)) as registry:
+            await SOUnoFileConverter(home, dest, pool=registry, workers_number=registry.capacity).process()
+
+        Endpoints are probed each probe_interval seconds, unhealthy ones are not leased.
+        Server is leased from the least loaded source (leased / slots for endpoint, busy / size for local pool).
+        Endpoint released with discard=True (failed or timed out conversion) is suspended
+        for failure_cooldown seconds and probed again.
+    """
+
+    probe_interval: float = 10
+    probe_timeout: float = 3
+    failure_cooldown: float = 5
+
+    # local pool replaces discarded servers in background, waiting acquire() checks it each wait_interval seconds
+    wait_interval: float = 0.5
+
+    def __init__(self, endpoints: Iterable[Union[str, RemoteSofficeServer]] = (),
+                 local_pool: Optional[SofficeServerPool] = None) -> None:
+        """
+            endpoints - RemoteSofficeServer or their specifications (look at parse_endpoint)
+            local_pool - it is started and stopped by registry
+        """
+        self._endpoints: list[RemoteSofficeServer] = [
+            endpoint if isinstance(endpoint, RemoteSofficeServer) else parse_endpoint(endpoint)
+            for endpoint in endpoints
+        ]
+        self.local_pool = local_pool
+        if not self._endpoints and local_pool is None:
+            raise ValueError('neither endpoints nor local_pool are passed')
+
+        self._released: Optional[asyncio.Event] = None
+        self._started: Optional[asyncio.Future] = None
+        self._background_tasks: set[asyncio.Task] = set()
+        self._closed = False
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], local_pool: Optional[SofficeServerPool] = None) -> 'EndpointRegistry':
+        """
+            One endpoint per line (look at parse_endpoint), empty lines and "#" comments are skipped
+        """
+        with open(path, 'r', encoding='utf-8') as fd:
+            lines = [line.split('#', maxsplit=1)[0].strip() for line in fd]
+        return cls([line for line in lines if line], local_pool)
+
+    def _log(self, msg: str, level=logging.INFO):
+        logger.log(level, f'##{self.__class__.__name__}##: {msg}')
+
+    @property
+    def endpoints(self) -> list[RemoteSofficeServer]:
+        return list(self._endpoints)
+
+    @property
+    def capacity(self) -> int:
+        """
+            Documents that can be converted at a time, it is good number of workers
+        """
+        local = 0 if self.local_pool is None else self.local_pool.size
+        return local + sum(endpoint.slots for endpoint in self._endpoints)
+
+    @property
+    def idle_number(self) -> int:
+        idle = 0 if self.local_pool is None else self.local_pool.idle_number
+        return idle + sum(
+            endpoint.slots - endpoint.leased for endpoint in self._endpoints if endpoint.healthy
+        )
+
+    async def probe(self, endpoint: RemoteSofficeServer) -> bool:
+        healthy = await endpoint.probe(self.probe_timeout)
+        if healthy != endpoint.healthy:
+            level = logging.INFO if healthy else logging.WARNING
+            endpoint._log_server('is healthy' if healthy else 'is unhealthy', level)
+        endpoint.healthy = healthy
+        if healthy:
+            self._released.set()
+        return healthy
+
+    async def _probe_periodically(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await asyncio.gather(*[self.probe(endpoint) for endpoint in self._endpoints])
+
+    def _run_background(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def start(self):
+        """
+            Probes endpoints and starts local pool. It is safe to call it many times.
+        """
+        if self._closed:
+            raise RuntimeError('Registry is stopped')
+
+        if self._started is None:
+            self._started = asyncio.get_running_loop().create_future()
+            self._released = asyncio.Event()
+            try:
+                await asyncio.gather(*[self.probe(endpoint) for endpoint in self._endpoints])
+                if self.local_pool is not None:
+                    await self.local_pool.start()
+            except BaseException as exc:
+                self._started.set_exception(exc)
+                raise
+            else:
+                self._started.set_result(True)
+                self._run_background(self._probe_periodically())
+                healthy = sum(1 for endpoint in self._endpoints if endpoint.healthy)
+                self._log(f'started, healthy endpoints: [{healthy}] of [{len(self._endpoints)}]')
+
+        await asyncio.shield(self._started)
+
+    async def stop(self):
+        self._closed = True
+        for task in list(self._background_tasks):
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        if self.local_pool is not None:
+            await self.local_pool.stop()
+        if self._released is not None:
+            # waiting acquire() raises RuntimeError
+            self._released.set()
+        self._log('stopped')
+
+    def _pick(self) -> Optional[Union[RemoteSofficeServer, SofficeServerPool]]:
+        """
+            The least loaded endpoint that has free slot or local pool if it has idle server,
+            local pool wins a tie (nothing is transferred through network)
+        """
+        candidates = [
+            (endpoint.load, 1, -endpoint.slots, i, endpoint) for i, endpoint in enumerate(self._endpoints)
+            if endpoint.healthy and endpoint.leased < endpoint.slots
+        ]
+        if self.local_pool is not None and self.local_pool.idle_number > 0:
+            load = 1 - self.local_pool.idle_number / self.local_pool.size
+            candidates.append((load, 0, 0, -1, self.local_pool))
+        return min(candidates)[-1] if candidates else None
+
+    async def acquire(self) -> Union[RemoteSofficeServer, SofficeAsyncServer]:
+        await self.start()
+        while True:
+            if self._closed:
+                raise RuntimeError('Registry is stopped')
+
+            source = self._pick()
+            if isinstance(source, RemoteSofficeServer):
+                source.leased += 1
+                return source
+            if source is not None:
+                return await self.local_pool.acquire()
+
+            self._released.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._released.wait(), self.wait_interval)
+
+    async def _suspend(self, endpoint: RemoteSofficeServer):
+        await asyncio.sleep(self.failure_cooldown)
+        await self.probe(endpoint)
+
+    def release(self, server: Union[RemoteSofficeServer, SofficeAsyncServer], discard: bool = False):
+        """
+            discard=True - remote endpoint is suspended (look at failure_cooldown),
+            local server is replaced by local pool.
+        """
+        if isinstance(server, RemoteSofficeServer):
+            if server not in self._endpoints:
+                return
+            server.leased = max(server.leased - 1, 0)
+            if discard and not self._closed:
+                server.failures += 1
+                if server.healthy:
+                    server._log_server(f'is suspended for [{self.failure_cooldown}s]', logging.WARNING)
+                    server.healthy = False
+                    self._run_background(self._suspend(server))
+        elif self.local_pool is not None:
+            self.local_pool.release(server, discard=discard)
+
+        if self._released is not None:
+            self._released.set()
+
+    @contextlib.asynccontextmanager
+    async def lease(self) -> AsyncIterator[Union[RemoteSofficeServer, SofficeAsyncServer]]:
+        server = await self.acquire()
+        discard = False
+        try:
+            yield server
+        except Exception:
+            discard = True
+            raise
+        finally:
+            self.release(server, discard=discard)
+
+    async def __aenter__(self) -> 'EndpointRegistry':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
@@ -6,6 +6,8 @@
 # Created by ox23 at 2022-08-16 (y-m-d) 4:19 PM
 
 import functools
+import os
+import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
@@ -89,10 +91,18 @@ class NorestoreSOCmdOption(cmdopt.ValuelessCmdOption):
     cmd_key: str = '--norestore'
 
 
+@dataclass
+class TerminateAfterInitSOCmdOption(cmdopt.ValuelessCmdOption):
+    order: int = 90
+    name: str = 'terminate_after_init'
+    cmd_key: str = '--terminate_after_init'
+
+
 @dataclass
 class AcceptSOCmdOption(cmdopt.CmdOption):
     """
         It will represent "--accept="socket,host=%s,port=%s,tcpNoDelay=1;urp;StarOffice.ComponentContext""
+        or "--accept="pipe,name=%s;urp;StarOffice.ComponentContext"" if pipe_name is set (host and port are ignored).
         It does not check host:port busyness.
     """
 
@@ -102,6 +112,8 @@ class AcceptSOCmdOption(cmdopt.CmdOption):
     cmd_value: str = 'socket,host={host},{port}tcpNoDelay=1;urp;StarOffice.ComponentContext'
     host: str = '127.0.0.1'
     port: str = None
+    pipe_cmd_value: str = 'pipe,name={pipe_name};urp;StarOffice.ComponentContext'
+    pipe_name: str = None
 
     def __setattr__(self, name: str, value: Any) -> None:
         if name == 'host':
@@ -121,14 +133,32 @@ class AcceptSOCmdOption(cmdopt.CmdOption):
                     if 0 > value > 65535:
                         raise ValueError(f'port "{value}" neither in range [0..65535] nor None')
 
+        if name == 'pipe_name':
+            if value is not None and not re.fullmatch(r'[\w.-]+', value):
+                raise ValueError(f'pipe name "{value}" should contain only letters, digits, "_", "." and "-"')
+
         super().__setattr__(name, value)
 
     def __iter__(self):
+        if self.pipe_name:
+            yield f'{self.cmd_key}={self.pipe_cmd_value.format(pipe_name=self.pipe_name)}'
+            return
+
         port = ''
         if self.port:
             port = f'port={self.port},'
         yield f'{self.cmd_key}={self.cmd_value.format(host=self.host, port=port)}'
 
+    def pipe_paths(self) -> list[Path]:
+        """
+            Possible paths of unix domain socket that soffice creates for pipe_name.
+            osl library (sal/osl/unx/pipe.cxx) creates it as /tmp/OSL_PIPE_<uid>_<name>
+            or /var/tmp/OSL_PIPE_<uid>_<name> if /tmp is not writable.
+        """
+        if not self.pipe_name or not hasattr(os, 'getuid'):
+            return []
+        return [Path(tmp) / f'OSL_PIPE_{os.getuid()}_{self.pipe_name}' for tmp in ('/tmp', '/var/tmp')]
+
 
 @dataclass
 class ConvertToSOCmdOption(cmdopt.CmdOption):
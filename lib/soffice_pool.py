@@ -0,0 +1,207 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: soffice_pool.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 11:02 AM
+import asyncio
+import contextlib
+import logging
+from typing import Optional, Type, AsyncIterator, Callable, Awaitable
+
+from soffice_server import SofficeAsyncServer
+
+
+logger = logging.getLogger(__name__)
+
+
+class SofficeServerPool:
+    """
+        Keeps warm soffice servers that can be shared across many conversion runs.
+
+        Servers are started with bounded (start_concurrency) and staggered (start_delay) concurrency,
+        because simultaneous cold starts of many soffice instances make each of them slower.
+        Converters lease the idle servers, the longest idle server is handed out first.
+
+        async with SofficeServerPool(size=3) as pool:
+            await SOUnoFileConverter(home, dest, pool=pool).process()
+            await SOUnoFileConverter(other_home, other_dest, pool=pool).process()  # no startup cost anymore
+
+        or
+
+        pool = SofficeServerPool(size=3)
+        async with pool.lease() as server:
+            ...
+        await pool.stop()
+    """
+
+    server_class: Type[SofficeAsyncServer] = SofficeAsyncServer
+
+    def __init__(self, size: int = 3, *, start_concurrency: int = 2, start_delay: float = 0.5,
+                 server_kwargs: Optional[dict] = None,
+                 warm_up: Optional[Callable[[SofficeAsyncServer], Awaitable]] = None) -> None:
+        """
+            server_kwargs - are passed into server_class(...), for example profile_template
+            warm_up - coroutine function, it is awaited before server gets into pool
+            (for example aio_uno_converter.warm_up_server)
+        """
+        if size < 1:
+            raise ValueError(f'size "{size}" should be greater than 0')
+        self.size = size
+        self.start_concurrency = max(1, start_concurrency)
+        self.start_delay = start_delay
+        self.server_kwargs = dict(server_kwargs or {})
+        self.warm_up = warm_up
+
+        self._servers: dict[SofficeAsyncServer, asyncio.Task] = {}  # server -> server's process task
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_semaphore: Optional[asyncio.Semaphore] = None
+        self._started: Optional[asyncio.Future] = None
+        self._background_tasks: set[asyncio.Task] = set()
+        self._closed = False
+
+    def _log(self, msg: str, level=logging.INFO):
+        logger.log(level, f'##{self.__class__.__name__}##: {msg}')
+
+    @property
+    def servers(self) -> list[SofficeAsyncServer]:
+        return list(self._servers)
+
+    @property
+    def idle_number(self) -> int:
+        return 0 if self._idle is None else self._idle.qsize()
+
+    async def _start_server(self) -> SofficeAsyncServer:
+        async with self._start_semaphore:
+            if self._closed:
+                raise RuntimeError('Pool is stopped')
+
+            server = self.server_class(**self.server_kwargs)
+            task = server.process_background()
+            self._servers[server] = task
+            try:
+                await server.get_effective_port()
+                if self.warm_up is not None:
+                    await self.warm_up(server)
+            except BaseException:
+                await self._stop_server(server)
+                raise
+
+            # holding the semaphore staggers the next start
+            if self.start_delay:
+                await asyncio.sleep(self.start_delay)
+
+        server._log_server('added to pool')
+        return server
+
+    async def _stop_server(self, server: SofficeAsyncServer):
+        task = self._servers.pop(server, None)
+        if task is None:
+            return
+
+        server.terminate()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception) as exc:
+            # the task cancels itself when process is done (look at BaseAsyncServer.process)
+            pass
+
+    def _run_background(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _add_server(self):
+        try:
+            self._idle.put_nowait(await self._start_server())
+        except Exception as exc:
+            self._log(f'server was not started due to: {exc!r}', logging.ERROR)
+            raise
+
+    async def start(self):
+        """
+            Starts all servers. It is safe to call it many times, servers are started only once.
+        """
+        if self._closed:
+            raise RuntimeError('Pool is stopped')
+
+        if self._started is None:
+            self._started = asyncio.get_running_loop().create_future()
+            self._idle = asyncio.Queue()
+            self._start_semaphore = asyncio.Semaphore(self.start_concurrency)
+            try:
+                await asyncio.gather(*[self._add_server() for i in range(self.size)])
+            except BaseException as exc:
+                self._started.set_exception(exc)
+                raise
+            else:
+                self._started.set_result(True)
+                self._log(f'started [{self.size}] servers')
+
+        await asyncio.shield(self._started)
+
+    async def stop(self):
+        """
+            Terminates all servers, leased servers too.
+        """
+        self._closed = True
+        for task in list(self._background_tasks):
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await asyncio.gather(*[self._stop_server(server) for server in list(self._servers)])
+        self._log('stopped')
+
+    async def acquire(self) -> SofficeAsyncServer:
+        await self.start()
+        while True:
+            server = await self._idle.get()
+            task = self._servers.get(server)
+            if task is not None and not task.done():
+                return server
+
+            # server has died while it was idle
+            server._log_server('died in pool, it will be replaced')
+            self.release(server, discard=True)
+
+    def release(self, server: SofficeAsyncServer, discard: bool = False):
+        """
+            Returns leased server to pool.
+            discard=True means server is broken (or should not be used anymore),
+            it will be stopped and replaced with the new one in background.
+        """
+        if server not in self._servers:
+            return
+
+        if self._closed or server.should_recycle():
+            discard = True
+
+        if not discard:
+            self._idle.put_nowait(server)
+            return
+
+        async def replace():
+            await self._stop_server(server)
+            if not self._closed:
+                await self._add_server()
+
+        self._run_background(replace())
+
+    @contextlib.asynccontextmanager
+    async def lease(self) -> AsyncIterator[SofficeAsyncServer]:
+        server = await self.acquire()
+        discard = False
+        try:
+            yield server
+        except Exception:
+            discard = True
+            raise
+        finally:
+            self.release(server, discard=discard)
+
+    async def __aenter__(self) -> 'SofficeServerPool':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
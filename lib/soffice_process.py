@@ -12,7 +12,8 @@
 # https://git.libreoffice.org/sdk-examples/+/HEAD/MiscFunctionsPyUNOPython/runner.py - LibreOfficeRunner
 # https://github.com/unoconv/unoconv - Python unoconv Git page
 # https://github.com/unoconv/unoconv/blob/master/unoconv - Python unoconv source code on Git (one file contains all code)
-import concurrent.futures
+import contextlib
+import logging
 import tempfile
 import time
 from pathlib import Path
@@ -20,7 +21,12 @@ from typing import Iterable, Any, NamedTuple, Union, Optional
 import asyncio
 from urllib import request
 
-from definitions import AsyncQueueGetProcessable, FileInfo
+import sysproc_tools as sysproc
+from definitions import AsyncQueueGetProcessable, FileInfo, QUEUE_END, queue_get, ConversionObserver
+from definitions import ConvertTarget, parse_targets
+
+
+logger = logging.getLogger(__name__)
 
 
 class PopenResult(NamedTuple):
@@ -158,16 +164,24 @@ class SofficeHeadlessSubprocessConverter:
 
         return result
 
+    # seconds between SIGTERM and SIGKILL to the process group of timed out (or cancelled) soffice
+    kill_timeout = 5
+
     async def process(self, timeout=None) -> PopenResult:
+        """
+            soffice is started in own session, thus on timeout or cancel the whole group (soffice and soffice.bin)
+            is terminated. Process group is registered in sysproc_tools.reaper while it is running.
+        """
         time_expired, out, err, returncode, pid = False, '', '', None, None
+        proc = await asyncio.create_subprocess_exec(
+                self.program, *self.args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+        pid = proc.pid
+        sysproc.reaper.register(pid)
         try:
-            proc = await asyncio.create_subprocess_exec(
-                    self.program, *self.args,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-            pid = proc.pid
-
             stdout_data, stderr_data = await asyncio.wait_for(proc.communicate(), timeout=timeout)
             out = stdout_data.decode()
             err = stderr_data.decode()
@@ -175,6 +189,17 @@ class SofficeHeadlessSubprocessConverter:
 
         except asyncio.exceptions.TimeoutError as exc:
             time_expired = True
+            returncode = await sysproc.terminate_process_group(proc, self.kill_timeout)
+
+        except asyncio.CancelledError:
+            await asyncio.shield(sysproc.terminate_process_group(proc, self.kill_timeout))
+            raise
+
+        finally:
+            if sysproc.is_process_group_alive(pid):
+                # leader is done but something of its group is left
+                await sysproc.terminate_process_group(proc, self.kill_timeout)
+            sysproc.reaper.unregister(pid)
 
         result = PopenResult(
             out=out,
@@ -213,46 +238,242 @@ class SafeSofficeHeadlessSubprocessConverter(SofficeHeadlessSubprocessConverter)
             return await super().process(timeout)
 
 
+class BatchSofficeHeadlessSubprocessConverter(SafeSofficeHeadlessSubprocessConverter):
+    """
+        Converts many files by one soffice invocation
+        'soffice --headless -env:UserInstallation=... --convert-to html --outdir .../dest_dir file1.odt file2.odt ...'
+        Thus, startup of soffice (the most part of time for small documents) is paid once per batch.
+
+        User profile directory is not temporary, it is passed by caller and reused by next invocations
+        (it is initialized by the first invocation only). Profile must not be shared by simultaneous invocations.
+    """
+
+    def __init__(self, files: Iterable[Union[str, Path]], outdir: Union[str, Path],
+                 user_profile_dir: Union[str, Path]) -> None:
+        files = list(files)
+        if not files:
+            raise ValueError('files should contain one file at least')
+        super().__init__(files[0], outdir)
+        self.files = files
+        self.user_profile_dir = str(user_profile_dir)
+
+    @property
+    def files(self) -> list[str]:
+        return list(self.get_arg('file'))
+
+    @files.setter
+    def files(self, value: Iterable[Union[str, Path]]):
+        files = []
+        for file in value:
+            if not Path(file).is_file():
+                raise ValueError(f'file "{file}" does not exist.')
+            files.append(str(file))
+        # files should be last
+        self.popen_args.pop('file', None)
+        self.popen_args['file'] = files
+
+    @property
+    def args(self) -> list:
+        result = []
+        for key, value in self.popen_args.items():
+            result.extend(value)
+        return result
+
+
 class AsyncSOSubprocessConverter(AsyncQueueGetProcessable):
+    """
+        Queued files that share the output directory are grouped into batches,
+        each batch is converted by one soffice invocation (BatchSofficeHeadlessSubprocessConverter).
+        Batch is limited by batch_max_files and batch_max_bytes (sum of file sizes).
+        Each process() call (worker) has own user profile directory that is reused by all its invocations,
+        all other state of the call is local too, thus many workers can share one converter.
+        Worker consumes the queue until QUEUE_END (the provider is exhausted).
+
+        Files of the failed multi-file batch are converted again one by one,
+        thus one bad document does not fail others.
+
+        soffice --convert-to exports into one format, thus batch is converted by one invocation per target
+        (each target loads the documents again, uno engine loads them once, look at AsyncSOUnoConverter).
+    """
 
+    # deadline of one document conversion (seconds), batch deadline is timeout * number of files
     timeout = 20
 
-    def __init__(self, outdir: Union[str, Path], convert_to: str = 'html') -> None:
+    batch_max_files = 16
+    batch_max_bytes = 32 * 1024 ** 2
+
+    # after the first file of batch, worker waits so long for next files (provider can be slower than worker)
+    batch_wait = 0.05
+
+    def __init__(self, outdir: Union[str, Path], convert_to: Union[str, Iterable] = 'html',
+                 observers: Optional[list[ConversionObserver]] = None,
+                 process_semaphore: Optional[asyncio.Semaphore] = None) -> None:
+        """
+            convert_to - one target or list of them (look at parse_targets), outputs are placed side by side,
+            output of the first target is reported to observers. filter_options of targets are not supported.
+            observers are notified about result of each file (look at ConversionObserver)
+            process_semaphore - limits simultaneously running soffice processes, it can be shared by many converters
+        """
         self._queue: Optional[asyncio.Queue] = None
         self.outdir: Path = outdir if isinstance(outdir, Path) else Path(outdir)
         if not self.outdir.exists():
             self.outdir.mkdir()
-        self._converter = None
-        self.convert_to = convert_to
-
-    def get_converter(self, file: Path) -> SafeSofficeHeadlessSubprocessConverter:
-        if self._converter is None:
-            self._converter = SafeSofficeHeadlessSubprocessConverter(file=str(file), outdir=self.outdir)
-            arg_convert_to = self._converter.get_arg('convert_to')
-            arg_convert_to[1] = self.convert_to
-            self._converter.set_arg('convert_to', arg_convert_to)
-        else:
-            self._converter.file = file
-        return self._converter
+        self.targets: tuple[ConvertTarget, ...] = parse_targets(convert_to)
+        for target in self.targets:
+            if target.filter_options:
+                raise ValueError(
+                    f'filter_options of "{target.convert_to}" are not supported by soffice --convert-to,'
+                    f' use "ext:FilterName:FilterOptions" syntax of convert_to or uno engine'
+                )
+        self.convert_to = self.targets[0].convert_to
+        self.failed: list[tuple[FileInfo, str]] = []  # (file, reason)
+        self.observers: list[ConversionObserver] = list(observers or [])
+        self.process_semaphore = process_semaphore
+
+    def get_converter(self, files: list[Path], outdir: Path, user_profile_dir: Union[str, Path],
+                      target: Optional[ConvertTarget] = None) -> BatchSofficeHeadlessSubprocessConverter:
+        """
+            target - the first target by default
+        """
+        converter = BatchSofficeHeadlessSubprocessConverter(files, outdir, user_profile_dir)
+        arg_convert_to = converter.get_arg('convert_to')
+        arg_convert_to[1] = (target or self.targets[0]).convert_to
+        converter.set_arg('convert_to', arg_convert_to)
+        return converter
+
+    def get_outpath(self, file_info: FileInfo, target: Optional[ConvertTarget] = None) -> Path:
+        """
+            soffice writes result as <outdir>/<stem>.<extension>, convert_to can be like "html:XHTML Writer File:UTF8"
+        """
+        return (self.outdir / file_info.file).with_suffix(f'.{(target or self.targets[0]).ext}')
+
+    @staticmethod
+    def _get_size(file_info: FileInfo) -> int:
+        try:
+            return (file_info.home / file_info.file).stat().st_size
+        except OSError as exc:
+            return 0
 
-    async def process(self, queue: asyncio.Queue, provider_task: asyncio.Task):
-        result = []
-        while not queue.empty():
+    def _notify(self, method: str, *args):
+        for observer in self.observers:
+            try:
+                getattr(observer, method)(*args)
+            except Exception as exc:
+                logger.exception(f'##{self.__class__.__name__}##: observer {observer!r}.{method} failed')
+
+    async def _fill_pending(self, queue: asyncio.Queue, pending: dict[Path, list[FileInfo]]) -> bool:
+        """
+            Moves queued files into pending (grouped by output directory), it waits for the first file only
+            if there is nothing pending. Returns True if QUEUE_END is reached.
+        """
+        blocking = not pending
+        wait = None
+        limit = self.batch_max_files * 2
+        while sum(len(files) for files in pending.values()) < limit:
+            if not blocking and queue.empty():
+                break
             try:
-                file_info: FileInfo = await queue.get()
-            except asyncio.QueueEmpty as exc:
+                file_info = await (queue_get(queue) if wait is None else asyncio.wait_for(queue_get(queue), wait))
+            except asyncio.TimeoutError:
                 break
+            if file_info is QUEUE_END:
+                return True
+            pending.setdefault(self.get_outpath(file_info).parent, []).append(file_info)
+            if blocking:
+                wait = self.batch_wait
+        return False
+
+    def _take_batch(self, pending: dict[Path, list[FileInfo]]) -> tuple[Path, list[FileInfo]]:
+        """
+            The oldest group is taken first. Files with the same output name are not put into one batch.
+        """
+        outdir = next(iter(pending))
+        files = pending[outdir]
+        batch, rest, names, size = [], [], set(), 0
+        for file_info in files:
+            fsize = self._get_size(file_info)
+            name = self.get_outpath(file_info).name
+            full = len(batch) >= self.batch_max_files or (batch and size + fsize > self.batch_max_bytes)
+            if full or name in names:
+                rest.append(file_info)
             else:
+                batch.append(file_info)
+                names.add(name)
+                size += fsize
+
+        if rest:
+            pending[outdir] = rest
+        else:
+            del pending[outdir]
+        return outdir, batch
+
+    async def _convert_batch(self, outdir: Path, batch: list[FileInfo], user_profile_dir: str) -> list[FileInfo]:
+        """
+            Returns files that were not converted.
+        """
+        outdir.mkdir(parents=True, exist_ok=True)
+        failed, exist = [], []
+        for file_info in batch:
+            file_info.attempts += 1
+            (exist if (file_info.home / file_info.file).is_file() else failed).append(file_info)
+        if not exist:
+            return failed
+
+        res = []
+        async with self.process_semaphore or contextlib.nullcontext():
+            start = time.time()
+            for target in self.targets:
+                converter = self.get_converter([fi.home / fi.file for fi in exist], outdir, user_profile_dir, target)
+                res.append(await converter.process(timeout=self.timeout * len(exist)))
+
+        for file_info in exist:
+            try:
+                # result of previous run should not be treated as result of this one
+                done = all(
+                    self.get_outpath(file_info, target).stat().st_mtime >= start - 1 for target in self.targets
+                )
+            except OSError as exc:
+                done = False
+            if done:
+                self._notify('file_done', file_info, self.get_outpath(file_info), None)
+            else:
+                failed.append(file_info)
+
+        if failed:
+            logger.warning(
+                f'##{self.__class__.__name__}##: [{len(failed)}] of [{len(batch)}] files are not converted: {res}'
+            )
+        return failed
+
+    async def process(self, queue: asyncio.Queue, provider_task: asyncio.Task):
+        result = []
+        pending: dict[Path, list[FileInfo]] = {}
+        ended = False
+        with tempfile.TemporaryDirectory(prefix='soffice_', suffix='.up') as user_profile_dir:
+            while pending or not ended:
+                if not ended:
+                    ended = await self._fill_pending(queue, pending)
+                if not pending:
+                    continue
+
+                outdir, batch = self._take_batch(pending)
                 stime = time.perf_counter()
-                with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
-                    converter = self.get_converter(file_info.home / file_info.file)
-                    outdir_path = (self.outdir / file_info.file).parent
-                    outdir_path.mkdir(parents=True, exist_ok=True)
-                    converter.outdir = str(outdir_path)
-                    res = await converter.process(timeout=self.timeout)
-
-                queue.task_done()
-                result.append(f'{file_info.file} [done in {time.perf_counter() - stime:.2f}]: {res}')
+                failed = await self._convert_batch(outdir, batch, user_profile_dir)
+                if failed and len(batch) > 1:
+                    # to find out the bad ones
+                    batch_failed, failed = failed, []
+                    for file_info in batch_failed:
+                        failed.extend(await self._convert_batch(outdir, [file_info], user_profile_dir))
+
+                for file_info in failed:
+                    reason = f'no output [{self.get_outpath(file_info)}]'
+                    self.failed.append((file_info, reason))
+                    self._notify('file_failed', file_info, reason, None)
+
+                result.append(
+                    f'batch [{len(batch)}] files -> "{outdir}" [done in {time.perf_counter() - stime:.2f}]'
+                    f' failed [{len(failed)}]'
+                )
 
         return result
 
@@ -7,39 +7,34 @@
 import functools
 import io
 import logging
+import shutil
+import signal
+import socket
+import stat
+import subprocess
 import tempfile
 import time
 import asyncio
 import copy
+import statistics
+import uuid
 
+from collections import deque
 from dataclasses import dataclass
-from typing import Optional, Callable, Generator
+from pathlib import Path
+from typing import Optional, Callable, Union, Any
 from binascii import crc32
 
 import psutil
 
 import cmd_options as cmdopt
 import soffice_options as sopt
+import sysproc_tools as sysproc
 
 
 logger = logging.getLogger(__name__)
 
 
-def get_sleep_time(max_=30, start=0.75, incr=0.12) -> Generator[float, None, None]:
-    # by default it will next sequence
-    # [0.56, 0.76, 0.98, 1.23, 1.51, 1.82, 2.16, 2.53, 2.92, 3.35, 3.8, 4.28, 4.8]
-    # total time 30.7
-    # ! sum of sequence must be greater than self.wait_timeout (max_)
-
-    rest = max_
-    c = start
-    while rest > 0:
-        val = round(c ** 2, 2)
-        yield val
-        rest -= val
-        c = c + incr
-
-
 def run_once(func, *other):
     """
     It can be used like not parametrized decorator @run_once
@@ -104,6 +99,81 @@ class PortCmdOption(cmdopt.KeylessCmdOption):
     cmd_value: str = '7800'
 
 
+class ServerStats:
+    """
+        Collects conversions served, RSS and conversion latencies of the running server.
+        Baseline latency is the median of the first latency_window conversions,
+        baseline RSS is the first measured RSS (after the first conversion, when filters are loaded).
+    """
+
+    def __init__(self, latency_window: int = 20) -> None:
+        self.conversions: int = 0
+        self.baseline_rss: Optional[int] = None
+        self.rss: Optional[int] = None
+        self.baseline_latency: Optional[float] = None
+        self._baseline_latencies: list[float] = []
+        self.latencies: deque[float] = deque(maxlen=latency_window)
+
+    def add_latency(self, latency: float):
+        self.conversions += 1
+        self.latencies.append(latency)
+        if self.baseline_latency is None:
+            self._baseline_latencies.append(latency)
+            if len(self._baseline_latencies) == self.latencies.maxlen:
+                self.baseline_latency = statistics.median(self._baseline_latencies)
+                self._baseline_latencies = []
+
+    def add_rss(self, rss: int):
+        self.rss = rss
+        if self.baseline_rss is None:
+            self.baseline_rss = rss
+
+    @property
+    def rss_growth(self) -> int:
+        if self.baseline_rss is None:
+            return 0
+        return self.rss - self.baseline_rss
+
+    @property
+    def latency_drift(self) -> Optional[float]:
+        """
+            Ratio of the rolling median latency to the baseline one.
+            None, until rolling window contains only conversions made after the baseline.
+        """
+        if not self.baseline_latency or self.conversions < 2 * self.latencies.maxlen:
+            return None
+        return statistics.median(self.latencies) / self.baseline_latency
+
+
+@dataclass
+class RecyclePolicy:
+    """
+        Thresholds for server recycling. None - threshold is not checked.
+        rss_check_interval - RSS is measured each N conversions (psutil call is not free).
+    """
+    max_conversions: Optional[int] = 1000
+    max_rss_growth: Optional[int] = 512 * 1024 * 1024  # bytes
+    max_latency_drift: Optional[float] = 2.0
+    latency_window: int = 20
+    rss_check_interval: int = 10
+
+    def check(self, stats: ServerStats) -> Optional[str]:
+        """
+            Returns the reason of recycling or None
+        """
+        if self.max_conversions is not None and stats.conversions >= self.max_conversions:
+            return f'conversions [{stats.conversions}] >= [{self.max_conversions}]'
+
+        if self.max_rss_growth is not None and stats.rss_growth >= self.max_rss_growth:
+            return f'RSS growth [{stats.rss_growth}] >= [{self.max_rss_growth}]'
+
+        drift = stats.latency_drift
+        if self.max_latency_drift is not None and drift is not None and drift >= self.max_latency_drift:
+            return f'latency drift [{drift:.2f}] >= [{self.max_latency_drift}]'
+
+        return None
+
+
 class BaseAsyncServer:
     options: Optional[cmdopt.CmdOptions] = cmdopt.CmdOptions(
         ProgramCmdOption(), HostCmdOption(), PortCmdOption()
@@ -111,6 +181,18 @@ class BaseAsyncServer:
 
     wait_timeout = 10
 
+    # (first, max) interval of effective port polling, each next interval is doubled
+    port_poll_interval = (0.02, 0.5)
+
+    # seconds between SIGTERM and SIGKILL to the process group of server (look at terminate())
+    kill_timeout = 5
+
+    # None - server is never recycled
+    recycle_policy: Optional[RecyclePolicy] = None
+
+    # server sees files of converter, otherwise documents are sent through UNO bridge (look at soffice_endpoints.py)
+    shared_filesystem: bool = True
+
     def __init__(self, host=None, port=None,
                  stdout: Optional[io.StringIO] = None, stderr: Optional[io.StringIO] = None,
                  logger_handler: Optional[logging.Handler] = None) -> None:
@@ -126,6 +208,9 @@ class BaseAsyncServer:
         self.__server_id = None  # used just for logging
         self.__self_id = crc32(str(id(self)).encode())  # used just for logging
 
+        window = self.recycle_policy.latency_window if self.recycle_policy else 20
+        self.stats = ServerStats(window)
+
         self.host = host
         self.port = port
         self.stdout = stdout
@@ -163,6 +248,22 @@ class BaseAsyncServer:
             raise RuntimeError('Try to change a port, when server is running')
         self.options['port'].cmd_value = value
 
+    @property
+    def server_id(self) -> Optional[int]:
+        """
+            sid from log messages (look at _make_log_message), None until effective port is gotten
+        """
+        if self.__server_id is None and self.effective_port is not None:
+            self._make_log_message()
+        return self.__server_id
+
+    @property
+    def connection(self) -> dict:
+        """
+            Keyword arguments for uno_bridge.UnoBridgeConverter(...) to connect to this running server.
+        """
+        return {'interface': self.host, 'port': self.effective_port}
+
     @property
     def effective_port(self):
         result = None
@@ -184,6 +285,44 @@ class BaseAsyncServer:
         else:
             return result
 
+    def get_rss(self) -> int:
+        """
+            RSS of the whole process tree (soffice runs soffice.bin as child)
+        """
+        if not self._proc.done():
+            return 0
+        try:
+            psi = psutil.Process(self.proc.pid)
+            return sum(p.memory_info().rss for p in (psi, *psi.children(recursive=True)))
+        except psutil.Error as exc:
+            return 0
+
+    def record_conversion(self, latency: float):
+        """
+            Should be called by the converter after each successful conversion made by this server.
+        """
+        self.stats.add_latency(latency)
+        policy = self.recycle_policy
+        if policy is not None and policy.max_rss_growth is not None:
+            if self.stats.conversions == 1 or self.stats.conversions % max(1, policy.rss_check_interval) == 0:
+                self.stats.add_rss(self.get_rss())
+
+    def should_recycle(self) -> Optional[str]:
+        """
+            Returns the reason if server passed thresholds of recycle_policy and should be replaced, otherwise None.
+            Server that is not used by anybody (between conversions) is drained, thus it can be replaced safely.
+        """
+        if self.recycle_policy is None:
+            return None
+
+        reason = self.recycle_policy.check(self.stats)
+        if reason:
+            self._log_server(f'should be recycled: {reason}')
+        return reason
+
+    def is_running(self) -> bool:
+        return self._proc.done() and self.proc.returncode is None
+
     def get_process_task_name(self):
         """
             Returns unified string that contains initial host and port.
@@ -231,9 +370,33 @@ class BaseAsyncServer:
     def _log_server(self, msg='', msg_key: str = 'message'):
         logger.info(' '.join(self._make_log_message(msg, msg_key)))
 
-    def _process_exc(self, exc: Exception, new_exc: Exception = None):
-        if self._proc.done():
+    def terminate(self):
+        """
+            SIGTERM to the whole process group of server (it is started in own session),
+            SIGKILL follows if it is still running after kill_timeout seconds.
+        """
+        if not self._proc.done() or self.proc.returncode is not None:
+            return
+        if not sysproc.signal_process_group(self.proc.pid, signal.SIGTERM):
             self.proc.terminate()
+        self._loop.call_later(self.kill_timeout, self._kill_if_running)
+
+    def _kill_if_running(self):
+        if self.proc.returncode is None:
+            self._log_server(f'is not terminated in [{self.kill_timeout}s], killing')
+            self.kill()
+
+    def kill(self):
+        """
+            SIGKILL to the whole process group of server
+        """
+        if not self._proc.done():
+            return
+        if not sysproc.signal_process_group(self.proc.pid, signal.SIGKILL) and self.proc.returncode is None:
+            self.proc.kill()
+
+    def _process_exc(self, exc: Exception, new_exc: Exception = None):
+        self.terminate()
 
         if exc:
             for waiter in self._waiters:
@@ -277,61 +440,100 @@ class BaseAsyncServer:
                 ))
 
     def _check_port(self):
+        """
+            Bind test instead of the scan of all sockets in system. Owner is searched only if port is busy.
+        """
         if self.port:
             iport = int(self.port)
-            conis = [coni for coni in psutil.net_connections() if coni.laddr[1] == iport]
-            assert len(conis) < 2, f'Too many ports opened. Probably wrong logic {conis}'
-            if conis:
-                p = psutil.Process(conis[0].pid)
-                raise RuntimeError(f'Port [{iport}] is busy by pid:[{p.pid}] cmd: {p.cmdline()}')
-
-    def _get_effective_port_cmd_compare(self, proc_cmd: list, init_cmd: list):
-        lcmp = len(init_cmd) - 1
-        return init_cmd[-lcmp:] == proc_cmd[-lcmp:]
-
-    async def _get_effective_port(self):
+            try:
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                    sock.bind((self.host or '', iport))
+            except OSError as exc:
+                owner = ''
+                conis = [coni for coni in psutil.net_connections() if coni.laddr and coni.laddr[1] == iport]
+                if conis and conis[0].pid:
+                    p = psutil.Process(conis[0].pid)
+                    owner = f' by pid:[{p.pid}] cmd: {p.cmdline()}'
+                raise RuntimeError(f'Port [{iport}] is busy{owner}: {exc}')
+
+    def _get_listening_ports(self) -> list[int]:
+        """
+            Blocking call. Returns ports listened by process tree of the server only (soffice runs soffice.bin).
+            On Linux sockets are resolved via inodes of /proc/<pid>/fd (look at sysproc_tools.get_listening_ports)
+        """
+        ports = []
+        psi = psutil.Process(self.proc.pid)
+        for p in (psi, *psi.children(recursive=True)):
+            try:
+                if sysproc.PROC_NET_SUPPORTED:
+                    pports = sysproc.get_listening_ports(p.pid)
+                else:
+                    get_connections = getattr(p, 'net_connections', None) or p.connections
+                    pports = [coni.laddr[1] for coni in get_connections('inet') if coni.status == psutil.CONN_LISTEN]
+            except (psutil.Error, OSError) as exc:
+                # process has gone or it is not accessible
+                continue
+            ports.extend(port for port in pports if port not in ports)
+        return ports
+
+    def _probe_effective_port(self) -> Optional[int]:
+        """
+            Blocking call. Returns the listening port of the server or None if it is not opened yet.
+        """
+        ports = self._get_listening_ports()
+        if len(ports) == 1:
+            self._log_server(f'_get_effective_port: {ports}')
+            return ports[0]
+
+        if len(ports) > 1:
+            logger.error(' '.join(
+                self._make_log_message(f'_get_effective_port-s: {ports}')
+            ))
+            if self.port and int(self.port) in ports:
+                return int(self.port)
+
+    async def _poll_until_ready(self, probe: Callable[[], Any], what: str = 'effective port') -> Any:
+        """
+            Calls blocking probe (off the loop) with short, growing intervals until it returns not None result.
+            Waiting stops as soon as the process exits.
+        """
         if self.proc is None:
             raise RuntimeError('It only works, if process has been created.')
 
-        init_cmd = self.options.args()[1:]
+        deadline = self._loop.time() + self.wait_timeout
+        interval, max_interval = self.port_poll_interval
+        proc_wait = self._loop.create_task(self.proc.wait())
+        try:
+            while True:
+                result = await asyncio.to_thread(probe)
+                if result is not None:
+                    return result
 
-        psi = psutil.Process(self.proc.pid)
-        for stime in get_sleep_time(self.wait_timeout):
-
-            efpids = []
-            for p in (psi, *psi.children()):
-                proc_cmd = p.cmdline()[1:]
-                if self._get_effective_port_cmd_compare(proc_cmd, init_cmd):
-                    efpids.append(p.pid)
-
-            self._log_server(f'_get_effective_port -> effective_pids: {efpids}')
-
-            las = [coni.laddr[1] for coni in psutil.net_connections() if coni.pid in efpids]
-            llas = len(las)
-            if llas != 1:
-                if llas > 1:
-                    logger.error(' '.join(
-                        self._make_log_message(f'_get_effective_port-s: {las}')
-                    ))
-                    port = int(self.port)
-                    if port in las:
-                        return port
-                    # raise RuntimeError(f'can\'t resolve unambiguity the effective port {las}')
-                else:
-                    self._log_server(f'_get_effective_port -> slept time: {stime}')
-                    await asyncio.sleep(stime)
-            else:
-                self._log_server(f'_get_effective_port: {las}')
-                return las[0]
+                if proc_wait.done():
+                    raise RuntimeError(f'Process exited with code [{self.proc.returncode}] before {what} was opened')
+
+                rest = deadline - self._loop.time()
+                if rest <= 0:
+                    break
+
+                await asyncio.wait({proc_wait}, timeout=min(interval, rest))
+                interval = min(interval * 2, max_interval)
+        finally:
+            if not proc_wait.done():
+                proc_wait.cancel()
 
         raise asyncio.TimeoutError(
-            f'Unable to get effective port of running server. self_id[{self.__self_id}]'
+            f'Unable to get {what} of running server. self_id[{self.__self_id}]'
         )
 
+    async def _get_effective_port(self):
+        return await self._poll_until_ready(self._probe_effective_port)
+
     async def _create_subprocess(self):
         program, *args = self.options.args()
         return await asyncio.create_subprocess_exec(
-            program, *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            program, *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True
         )
 
     async def process(self, on_start: Optional[Callable] = None) -> int:
@@ -347,6 +549,7 @@ class BaseAsyncServer:
         self._log_server()
 
         self._proc.set_result(await self._create_subprocess())
+        sysproc.reaper.register(self.proc.pid)
         pipe_readers = {}
         returncode = 256
         try:
@@ -380,6 +583,10 @@ class BaseAsyncServer:
                     )
                 )
 
+            # leader is done, but its children (soffice.bin) can be alive
+            self.kill()
+            sysproc.reaper.unregister(self.proc.pid)
+
             if self._process_task is not None and not self._process_task.done():
                 self._process_task.cancel(
                     f'task {self.get_process_task_name()} is done due to returncode [{returncode}]'
@@ -414,6 +621,90 @@ class TestHTTPAsyncServer(BaseAsyncServer):
         self.options.add(ModuleCmdOption())
 
 
+class UserProfileTemplate:
+    """
+        soffice user profile that is initialized once (first start of soffice) and cloned for each server start.
+        Thus, servers skip the first-start profile initialization that is a large part of startup time.
+        Profile is cloned via "cp --reflink=auto" (copy-on-write where file system supports it)
+        with fallback to shutil.copytree.
+
+        template = UserProfileTemplate()  # or UserProfileTemplate('/var/cache/soffice_profile') to keep it between runs
+        server = SofficeAsyncServer(profile_template=template)
+        ...
+        template.cleanup()
+    """
+
+    build_timeout = 60
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, program: str = 'soffice') -> None:
+        """
+            path - None means temporary directory that is removed by cleanup()
+        """
+        self._tmpdir: Optional[tempfile.TemporaryDirectory] = None
+        self._path: Optional[Path] = None if path is None else Path(path)
+        self.program = program
+        self._lock = asyncio.Lock()
+
+    @property
+    def path(self) -> Path:
+        if self._path is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='soffice_', suffix='.aio_tmpl')
+            self._path = Path(self._tmpdir.name)
+        return self._path
+
+    def is_built(self) -> bool:
+        return (self.path / 'user').is_dir()
+
+    async def build(self):
+        """
+            Initializes profile by soffice --terminate_after_init, it is made only once.
+        """
+        async with self._lock:
+            if self.is_built():
+                return
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            options = cmdopt.CmdOptions(
+                sopt.ProgramSOCmdOption(cmd_value=self.program), sopt.HeadlessSOCmdOption(),
+                sopt.UserProfileDirSOCmdOption(cmd_value=str(self.path)), sopt.NofirststartwizardSOCmdOption(),
+                sopt.NorestoreSOCmdOption(), sopt.TerminateAfterInitSOCmdOption(),
+            )
+            stime = time.perf_counter()
+            program, *args = options.args()
+            proc = await asyncio.create_subprocess_exec(
+                program, *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+                start_new_session=True
+            )
+            sysproc.reaper.register(proc.pid)
+            try:
+                await asyncio.wait_for(proc.wait(), self.build_timeout)
+            except asyncio.TimeoutError:
+                await sysproc.terminate_process_group(proc, 0)
+                raise
+            finally:
+                sysproc.reaper.unregister(proc.pid)
+
+            if not self.is_built():
+                raise RuntimeError(f'profile template was not initialized, returncode [{proc.returncode}]: {options}')
+            logger.info(f'profile template [{self.path}] is built in [{time.perf_counter() - stime:.2f}s]')
+
+    def clone(self, dest: Union[str, Path]):
+        """
+            Copies template content into existing dest directory. It is blocking call.
+        """
+        if shutil.which('cp'):
+            res = subprocess.run(['cp', '-a', '--reflink=auto', f'{self.path}/.', str(dest)], capture_output=True)
+            if res.returncode == 0:
+                return
+        shutil.copytree(self.path, dest, symlinks=True, dirs_exist_ok=True)
+
+    def cleanup(self):
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+            self._path = None
+
+
 class SofficeAsyncServer(BaseAsyncServer):
 
     options = cmdopt.CmdOptions(
@@ -425,10 +716,33 @@ class SofficeAsyncServer(BaseAsyncServer):
 
     wait_timeout = 20
 
+    recycle_policy: Optional[RecyclePolicy] = RecyclePolicy()
+
+    # if it is set, user profile directory is cloned from it (fast start)
+    profile_template: Optional[UserProfileTemplate] = None
+
+    # If True, server accepts UNO connections on the named pipe (unix domain socket, Linux/Unix only) instead of TCP.
+    # Pipe name is generated for each server, host and port are not used, thus port discovery is not needed.
+    use_pipe: bool = False
+
     def __init__(self, host=None, port=None, stdout: Optional[io.StringIO] = None, stderr: Optional[io.StringIO] = None,
-                 logger_handler: Optional[logging.Handler] = None) -> None:
+                 logger_handler: Optional[logging.Handler] = None,
+                 profile_template: Optional[UserProfileTemplate] = None,
+                 use_pipe: Optional[bool] = None, pipe_name: Optional[str] = None) -> None:
+        """
+            profile_template - overrides the class level profile_template
+            use_pipe - overrides the class level use_pipe
+            pipe_name - explicit pipe name (implies use_pipe)
+        """
         super().__init__(host, port, stdout, stderr, logger_handler)
         self._user_profile_dir: Optional[tempfile.TemporaryDirectory] = None
+        if profile_template is not None:
+            self.profile_template = profile_template
+        if use_pipe is not None:
+            self.use_pipe = use_pipe
+        if pipe_name is None and self.use_pipe:
+            pipe_name = f'aio_soffice_{uuid.uuid4().hex[:16]}'
+        self.pipe_name = pipe_name
 
     @property
     def proc(self) -> Optional[asyncio.subprocess.Process]:
@@ -455,6 +769,43 @@ class SofficeAsyncServer(BaseAsyncServer):
             raise RuntimeError('Try to change a port, when server is running')
         self.options['accept'].port = value
 
+    @property
+    def pipe_name(self) -> Optional[str]:
+        return self.options['accept'].pipe_name
+
+    @pipe_name.setter
+    def pipe_name(self, value):
+        if self._proc.done():
+            raise RuntimeError('Try to change a pipe name, when server is running')
+        self.options['accept'].pipe_name = value
+
+    @property
+    def connection(self) -> dict:
+        if self.pipe_name:
+            return {'pipe_name': self.pipe_name}
+        return super().connection
+
+    def _check_port(self):
+        if not self.pipe_name:
+            super()._check_port()
+
+    def _probe_pipe(self) -> Optional[str]:
+        for path in self.options['accept'].pipe_paths():
+            try:
+                if stat.S_ISSOCK(path.stat().st_mode):
+                    self._log_server(f'_get_effective_port: pipe [{path}]')
+                    return self.pipe_name
+            except OSError as exc:
+                continue
+
+    async def _get_effective_port(self):
+        """
+            For pipe transport the pipe name is "effective port", it is resolved as soon as soffice creates the pipe.
+        """
+        if self.pipe_name:
+            return await self._poll_until_ready(self._probe_pipe, 'pipe')
+        return await super()._get_effective_port()
+
     def _create_user_profile_dir(self):
         if self._user_profile_dir:
             self._user_profile_dir.cleanup()
@@ -466,10 +817,13 @@ class SofficeAsyncServer(BaseAsyncServer):
 
     async def _create_subprocess(self):
         self._create_user_profile_dir()
+        if self.profile_template is not None:
+            await self.profile_template.build()
+            await asyncio.to_thread(self.profile_template.clone, self._user_profile_dir.name)
 
         program, *args = self.options.args()
         return await asyncio.create_subprocess_exec(
-            program, *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            program, *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, start_new_session=True
         )
 
     async def process(self, on_start: Optional[Callable] = None) -> int:
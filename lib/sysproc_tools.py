@@ -50,11 +50,19 @@
 # lrwx------ 1 ox23 ox23 64 Aug 17 16:21 /proc/7575/fd/12 -> 'socket:[310036]'
 # ....
 
+import asyncio
+import atexit
+import os
 import re
+import signal
 import socket
 import sys
 
 from pathlib import Path
+from typing import Iterable
+
+# /proc/<pid>/net and /proc/<pid>/fd are used for socket resolving (Linux)
+PROC_NET_SUPPORTED = Path('/proc/self/net/tcp').is_file()
 
 TCP_STATE = {'01': 'ESTABLISHED', '02': 'SYN_SENT', '03': 'SYN_RECV', '04': 'FIN_WAIT1', '05': 'FIN_WAIT2',
              '06': 'TIME_WAIT', '07': 'CLOSE', '08': 'CLOSE_WAIT', '09': 'LAST_ACK', '0A': 'LISTEN',
@@ -68,8 +76,13 @@ def get_socket_inodes(pid: int) -> list[int]:
     if not pfd.is_dir():
         raise FileExistsError(f'Process {pid} is not ran yet. Directory {pfd} does not exists')
     for f in pfd.iterdir():
-        if f.is_symlink():
-            m = rc.match(str(f.readlink()))  # f.readlink() -> 'socket:[369865]'
+        try:
+            link = f.readlink()  # 'socket:[369865]'
+        except OSError as exc:
+            # descriptor was closed after directory listing
+            continue
+        else:
+            m = rc.match(str(link))
             if m:
                 sinode = m.group('inode')
                 result.append(int(sinode))
@@ -106,6 +119,36 @@ def get_net_info(file, test_calback=None) -> list[tuple[tuple[str, int], tuple[s
     return res
 
 
+def get_listening_ports(pid: int, infos: Iterable[str] = ('tcp', 'tcp6')) -> list[int]:
+    """
+    Returns ports in LISTEN state that are opened by process itself.
+    Only own socket inodes are checked (/proc/<pid>/fd), thus it does not look at descriptors of all processes
+    like psutil.net_connections() does. Lines of /proc/<pid>/net/tcp* are parsed partially (state and inode first).
+
+    :param pid: int
+    :param infos: files of /proc/<pid>/net/
+    :return: list of ports
+    """
+    inodes = set(get_socket_inodes(pid))
+    res = []
+    if not inodes:
+        return res
+
+    for info in infos:
+        pfd = Path(f'/proc/{pid}/net/{info}')
+        if not pfd.is_file():
+            continue
+        with open(pfd, 'r') as fd:
+            header = fd.readline()
+            for line in fd:
+                parts = line.split(maxsplit=10)
+                if parts[3] == '0A' and int(parts[9]) in inodes:  # 0A - LISTEN
+                    port = int(parts[1].rsplit(':', 1)[1], 16)
+                    if port not in res:
+                        res.append(port)
+    return res
+
+
 def pid_to_address(pid, info='tcp'):
     """
     Returns list of 3-tuples
@@ -172,6 +215,77 @@ def get_local_ips(info: str = 'tcp', keep_unknown=True):
     return res
 
 
+# Supervision of subprocesses that are started in own session (start_new_session=True),
+# thus process group id is the same as pid of the started process and
+# all its children (soffice -> soffice.bin) can be signalled at once.
+
+def signal_process_group(pgid: int, sig: int) -> bool:
+    """
+    Returns False if group does not exist anymore (or signals to groups are not supported)
+    """
+    if not hasattr(os, 'killpg'):
+        return False
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError) as exc:
+        return False
+    return True
+
+
+def is_process_group_alive(pgid: int) -> bool:
+    return signal_process_group(pgid, 0)
+
+
+async def terminate_process_group(proc: asyncio.subprocess.Process, timeout: float = 5) -> int:
+    """
+    SIGTERM to the whole group of proc, SIGKILL if proc does not exit in timeout seconds.
+    Members of group that survived the leader are killed too.
+
+    :return: returncode of proc
+    """
+    pgid = proc.pid
+    if not signal_process_group(pgid, signal.SIGTERM) and proc.returncode is None:
+        proc.terminate()
+    try:
+        await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError as exc:
+        if not signal_process_group(pgid, signal.SIGKILL):
+            proc.kill()
+        await proc.wait()
+
+    signal_process_group(pgid, signal.SIGKILL)
+    reaper.unregister(pgid)
+    return proc.returncode
+
+
+class ProcessGroupReaper:
+    """
+    Keeps process groups of started subprocesses and kills everything left of them at interpreter exit.
+    Subprocess is registered after start and unregistered after it is terminated.
+    """
+
+    def __init__(self) -> None:
+        self.pgids: set[int] = set()
+
+    def register(self, pgid: int):
+        self.pgids.add(pgid)
+
+    def unregister(self, pgid: int):
+        self.pgids.discard(pgid)
+
+    def reap(self) -> list[int]:
+        """
+        Kills left groups, returns ids of groups that were alive
+        """
+        alive = [pgid for pgid in self.pgids if signal_process_group(pgid, signal.SIGKILL)]
+        self.pgids.clear()
+        return alive
+
+
+reaper = ProcessGroupReaper()
+atexit.register(reaper.reap)
+
+
 if __name__ == '__main__':
     print(pid_to_address(7416))
     print(address_info(('localhost', 2002)))
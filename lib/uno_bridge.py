@@ -0,0 +1,242 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: lib
+# File: uno_bridge.py
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 2:05 PM
+
+# Conversions that send the document through UNO bridge instead of a file system path.
+# https://api.libreoffice.org/docs/idl/ref/servicecom_1_1sun_1_1star_1_1document_1_1MediaDescriptor.html
+#   - InputStream / OutputStream properties of MediaDescriptor
+# https://api.libreoffice.org/docs/idl/ref/servicecom_1_1sun_1_1star_1_1io_1_1SequenceInputStream.html
+import io
+import os
+from typing import Iterable, Optional, Union, Callable
+
+import uno
+import unohelper
+from com.sun.star.beans import PropertyValue
+from com.sun.star.io import XOutputStream
+from unoserver.converter import UnoConverter, get_doc_type
+
+
+class BytesOutputStream(unohelper.Base, XOutputStream):
+    """
+        XOutputStream implementation that collects the exported document in memory.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = io.BytesIO()
+
+    def writeBytes(self, data):
+        self.buffer.write(data.value)
+
+    def flush(self):
+        pass
+
+    def closeOutput(self):
+        pass
+
+    def getvalue(self) -> bytes:
+        return self.buffer.getvalue()
+
+
+class _ResolverHook:
+    """
+        UnoUrlResolver whose resolve() gets URL from hook (asked URL is passed into it)
+    """
+
+    def __init__(self, resolver, hook: Callable[[str], str]) -> None:
+        self._resolver = resolver
+        self._hook = hook
+        self.resolved: Optional[str] = None
+
+    def resolve(self, url: str):
+        self.resolved = self._hook(url)
+        return self._resolver.resolve(self.resolved)
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolver, name)
+
+
+class UnoBridgeConverter(UnoConverter):
+    """
+        UnoConverter that also can convert in-memory documents.
+        Input bytes are streamed into soffice as SequenceInputStream and output is collected by BytesOutputStream,
+        thus neither side creates the temporary files.
+
+        Filter must produce a single stream. For example, Writer HTML export of document with images
+        writes them as separate files, thus ("EmbedImages", ) filter option should be used
+        (XHTML export embeds images always).
+    """
+
+    def __init__(self, interface: str = '127.0.0.1', port: Union[str, int] = '2002', temp_dir: Optional[str] = None,
+                 pipe_name: Optional[str] = None) -> None:
+        """
+            pipe_name - connects through the named pipe ("uno:pipe,name=...") instead of TCP interface:port,
+            look at SofficeAsyncServer(use_pipe=True) and SofficeAsyncServer.connection
+        """
+        self.pipe_name = pipe_name
+        self._resolver: Optional[_ResolverHook] = None
+        super().__init__(interface, port, temp_dir)
+        if pipe_name is not None and (self._resolver is None or self._resolver.resolved is None):
+            raise RuntimeError(
+                'UnoConverter.__init__ of this unoserver version does not connect through self.resolver,'
+                ' named pipe is not supported'
+            )
+
+    def get_connection_url(self, url: str) -> str:
+        """
+            UNO URL to connect, url is the socket one that UnoConverter.__init__ asks for
+        """
+        if self.pipe_name is None:
+            return url
+        return f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+
+    @property
+    def resolver(self):
+        return self._resolver
+
+    @resolver.setter
+    def resolver(self, resolver):
+        # UnoConverter.__init__ creates UnoUrlResolver and connects by its resolve(), the rest of init is upstream's
+        self._resolver = _ResolverHook(resolver, self.get_connection_url)
+
+    def _make_input_stream(self, data: bytes):
+        stream = self.service.createInstanceWithContext('com.sun.star.io.SequenceInputStream', self.context)
+        stream.initialize((uno.ByteSequence(data),))
+        return stream
+
+    @staticmethod
+    def _update_indexes(document):
+        # same as UnoConverter.convert(update_index=True) does
+        for ii in range(2):
+            try:
+                document.refresh()
+                indexes = document.getDocumentIndexes()
+            except AttributeError:
+                break
+            else:
+                for i in range(0, indexes.getCount()):
+                    indexes.getByIndex(i).update()
+
+    @staticmethod
+    def make_filter_props(filter_options: Iterable[str]) -> tuple:
+        """
+            filter_options have the same format as UnoConverter.convert(filter_options=...) ie "OptionName=Value"
+            or "Value" for FilterOptions.
+        """
+        filter_data, props = [], []
+        for option in filter_options:
+            name, value = option.split('=', maxsplit=1) if '=' in option else (None, option)
+            if value == 'false':
+                value = False
+            elif value == 'true':
+                value = True
+            elif value.isdecimal():
+                value = int(value)
+
+            if name is None:
+                props.append(PropertyValue(Name='FilterOptions', Value=value))
+            else:
+                filter_data.append(PropertyValue(Name=name, Value=value))
+
+        if filter_data:
+            props.append(PropertyValue(
+                Name='FilterData', Value=uno.Any('[]com.sun.star.beans.PropertyValue', tuple(filter_data))
+            ))
+        return tuple(props)
+
+    def find_export_filter(self, document, convert_to: str) -> str:
+        import_type = get_doc_type(document)
+        export_type = self.type_service.queryTypeByURL(f'file:///export.{convert_to}')
+        if not export_type:
+            raise RuntimeError(f'Unknown export file type, unknown extension "{convert_to}"')
+
+        filtername = self.find_filter(import_type, export_type)
+        if filtername is None:
+            raise RuntimeError(f'Could not find an export filter from {import_type} to {export_type}')
+        return filtername
+
+    def load_bytes(self, data: bytes):
+        input_props = (
+            PropertyValue(Name='InputStream', Value=self._make_input_stream(data)),
+            PropertyValue(Name='ReadOnly', Value=True),
+            PropertyValue(Name='Hidden', Value=True),
+        )
+        document = self.desktop.loadComponentFromURL('private:stream', '_blank', 0, input_props)
+        if document is None:
+            raise RuntimeError('Could not load document from bytes')
+        return document
+
+    def load_file(self, inpath: str):
+        input_props = (
+            PropertyValue(Name='ReadOnly', Value=True),
+            PropertyValue(Name='Hidden', Value=True),
+        )
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(inpath)), '_blank', 0, input_props
+        )
+        if document is None:
+            raise RuntimeError(f'Could not load document "{inpath}"')
+        return document
+
+    def make_store_props(self, document, convert_to: str, filter_options: Iterable[str] = ()) -> tuple:
+        """
+            convert_to can be like "html:XHTML Writer File:UTF8" (soffice --convert-to syntax),
+            then filter is not looked up and the last part is FilterOptions
+        """
+        ext, filtername, options = (convert_to.split(':', maxsplit=2) + [None, None])[:3]
+        if not filtername:
+            filtername = self.find_export_filter(document, ext)
+        if options:
+            filter_options = [options, *filter_options]
+        return PropertyValue(Name='FilterName', Value=filtername), *self.make_filter_props(filter_options)
+
+    def store_bytes(self, document, convert_to: str, filter_options: Iterable[str] = ()) -> bytes:
+        output = BytesOutputStream()
+        output_props = (
+            PropertyValue(Name='OutputStream', Value=output),
+            *self.make_store_props(document, convert_to, filter_options),
+        )
+        document.storeToURL('private:stream', output_props)
+        return output.getvalue()
+
+    def store_file(self, document, outpath: str, convert_to: str, filter_options: Iterable[str] = ()):
+        output_props = (
+            PropertyValue(Name='Overwrite', Value=True),
+            *self.make_store_props(document, convert_to, filter_options),
+        )
+        document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(outpath)), output_props)
+
+    def convert_many(self, targets: Iterable[tuple[str, Iterable[str], Optional[str]]], inpath: Optional[str] = None,
+                     data: Optional[bytes] = None, update_index: bool = True) -> list[Optional[bytes]]:
+        """
+            Document (inpath or data) is loaded once and stored into each target (convert_to, filter_options, outpath)
+            before it is closed. Target without outpath is stored into bytes.
+            Returns result of each target, bytes or None (it is stored into outpath).
+        """
+        document = self.load_file(inpath) if data is None else self.load_bytes(data)
+        try:
+            if update_index:
+                self._update_indexes(document)
+            result = []
+            for convert_to, filter_options, outpath in targets:
+                if outpath is None:
+                    result.append(self.store_bytes(document, convert_to, filter_options))
+                else:
+                    self.store_file(document, outpath, convert_to, filter_options)
+                    result.append(None)
+            return result
+        finally:
+            document.close(True)
+
+    def convert_bytes(self, data: bytes, convert_to: str, filter_options: Iterable[str] = (),
+                      update_index: bool = True) -> bytes:
+        document = self.load_bytes(data)
+        try:
+            if update_index:
+                self._update_indexes(document)
+            return self.store_bytes(document, convert_to, filter_options)
+        finally:
+            document.close(True)
@@ -0,0 +1,74 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 11:59 PM
+import asyncio
+import inspect
+import tempfile
+from pathlib import Path
+from typing import Callable, Any, Optional
+from unittest import IsolatedAsyncioTestCase
+
+from definitions import FileInfo, AsyncQueuePutProcessable, QUEUE_END
+from file_provider import AsyncFileProvider, ResultPathType
+
+
+async def convert_queued(provider: AsyncQueuePutProcessable, convert: Callable[[FileInfo], Any], maxsize: int = 1,
+                         stop_after: Optional[int] = None) -> list[str]:
+    """
+        Converts queued files one by one as converter does, convert(file_info) (it may be coroutine function)
+        stands in for conversion. Provider is cancelled ("crash") after stop_after files.
+        Returns converted files.
+    """
+    queue = asyncio.Queue(maxsize)
+    task = asyncio.create_task(provider.process(queue))
+    converted = []
+    while (file_info := await queue.get()) is not QUEUE_END:
+        if len(converted) == stop_after:
+            task.cancel()
+            break
+        result = convert(file_info)
+        if inspect.isawaitable(result):
+            await result
+        converted.append(file_info.file.as_posix())
+    try:
+        await task
+    except asyncio.CancelledError:
+        if stop_after is None:
+            raise
+    return converted
+
+
+class HomeTestCase(IsolatedAsyncioTestCase):
+    """
+        Temporary home with home_files {file relative to home: content} and dest, output of file is dest/<file>.html
+    """
+
+    home_files: dict[str, bytes] = {}
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmpdir.name)
+        self.home = self.tmp / 'home'
+        self.dest = self.tmp / 'dest'
+        self.home.mkdir()
+        for name, content in self.home_files.items():
+            (self.home / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.home / name).write_bytes(content)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def get_walker(self) -> AsyncFileProvider:
+        return AsyncFileProvider(self.home, ResultPathType.RELATIVE_TO_HOME)
+
+    def get_outpath(self, file_info: FileInfo) -> Path:
+        return (self.dest / file_info.file).with_suffix('.html')
+
+    def write_output(self, file_info: FileInfo, content: str = 'converted') -> Path:
+        outpath = self.get_outpath(file_info)
+        outpath.parent.mkdir(parents=True, exist_ok=True)
+        outpath.write_text(content)
+        return outpath
@@ -0,0 +1,183 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-17 (y-m-d) 1:20 AM
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
+
+from conversion_cache import ConversionCache
+from dead_letter import DeadLetterFileProvider
+from definitions import FileInfo, QUEUE_END, queue_get
+from job_journal import JobJournal
+from scheduler import CostEstimator
+
+try:
+    from aio_file_converter import SOFileConverterBase, SOSubprocessFileConverter
+    UNO_SUPPORTED = True
+except ImportError:
+    UNO_SUPPORTED = False
+
+
+class FakeConverter:
+    """
+        "Converts" file by copying it into <stem>.html, files named "bad*" fail
+    """
+
+    def __init__(self, outdir: Path, observers: list) -> None:
+        self.outdir = outdir
+        self.observers = observers
+        self.failed: list[tuple[FileInfo, str]] = []
+
+    async def process(self, queue, provider_task) -> list[str]:
+        result = []
+        while (file_info := await queue_get(queue)) is not QUEUE_END:
+            if file_info.file.name.startswith('bad'):
+                self.failed.append((file_info, 'bad document'))
+                for observer in self.observers:
+                    observer.file_failed(file_info, 'bad document', None)
+            else:
+                outpath = (self.outdir / file_info.file).with_suffix('.html')
+                outpath.parent.mkdir(parents=True, exist_ok=True)
+                outpath.write_bytes((file_info.home / file_info.file).read_bytes())
+                for observer in self.observers:
+                    observer.file_done(file_info, outpath, None)
+            queue.task_done()
+            result.append(file_info.file.as_posix())
+        return result
+
+
+if UNO_SUPPORTED:
+    class FakeFileConverter(SOFileConverterBase):
+
+        converter_class = FakeConverter
+
+        def get_converter(self) -> FakeConverter:
+            converter = self.converter_class(self.dest, self.observers)
+            self._converters.append(converter)
+            return converter
+
+
+@unittest.skipUnless(UNO_SUPPORTED, 'uno (LibreOffice python) is not installed')
+class TestSOFileConverterBase(TestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.home = Path(self.tmpdir.name) / 'home'
+        self.home.mkdir()
+        self.dest = Path(self.tmpdir.name) / 'dest'
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_targets(self):
+        state_path = Path(self.tmpdir.name) / 'state.json'
+        converter = SOSubprocessFileConverter(self.home, self.dest, convert_to='html', state=state_path)
+        self.assertIn(converter.state, converter.observers)
+
+        # freshness of the second target's output would not be checked
+        with self.assertRaisesRegex(ValueError, 'state'):
+            SOSubprocessFileConverter(self.home, self.dest, convert_to=['html', 'pdf'], state=state_path)
+
+
+@unittest.skipUnless(UNO_SUPPORTED, 'uno (LibreOffice python) is not installed')
+class TestSOFileConverterBaseProcess(IsolatedAsyncioTestCase):
+    """
+        Composition of providers and observers, converter is stood in by FakeConverter
+    """
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmpdir.name)
+        self.home = self.tmp / 'home'
+        self.dest = self.tmp / 'dest'
+        for name, content in (('a.odt', b'same'), ('d/b.odt', b'same'), ('c.odt', b'other'), ('bad.odt', b'bad')):
+            (self.home / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.home / name).write_bytes(content)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def get_converter(self, **kwargs) -> 'FakeFileConverter':
+        return FakeFileConverter(self.home, self.dest, workers_number=1, queue_maxsize=1, **kwargs)
+
+    async def test_wrappers(self):
+        converter = self.get_converter(
+            state=self.tmp / 'state.json', cache=ConversionCache(self.tmp / 'cache', soffice_version='test'),
+            journal=self.tmp / 'journal.db', schedule_window=4, summary=self.tmp / 'summary.json'
+        )
+        queued = await converter.process()
+        self.assertIn('bad.odt', queued)
+        summary = json.loads((self.tmp / 'summary.json').read_text())
+        # converted or taken from cache
+        self.assertEqual(3, summary['done'])
+        self.assertEqual(4, len(queued) + summary['from_cache'])
+        self.assertListEqual(['bad.odt'], [item['file'] for item in summary['failed']])
+        self.assertListEqual(['bad.odt'], converter.journal.get_files(self.home, (JobJournal.FAILED, )))
+        self.assertEqual(3, len(converter.journal.get_files(self.home, (JobJournal.DONE, ))))
+
+        # fresh files are neither hashed (cache) nor estimated (scheduler) nor recorded (journal of new run)
+        with mock.patch.object(CostEstimator, 'estimate', autospec=True, return_value=1.0) as estimate:
+            self.assertListEqual(['bad.odt'], await converter.process())
+        self.assertListEqual([self.home / 'bad.odt'], [call.args[1] for call in estimate.call_args_list])
+        summary = json.loads((self.tmp / 'summary.json').read_text())
+        self.assertEqual((3, 0, 0), (summary['fresh'], summary['from_cache'], summary['done']))
+        self.assertListEqual(['bad.odt'], converter.journal.get_files(self.home, (JobJournal.FAILED, )))
+        self.assertEqual(0, len(converter.journal.get_files(self.home, (JobJournal.DONE, ))))
+
+        # outputs are lost, they are taken from cache before scheduling
+        for path in list(self.dest.rglob('*.html')):
+            path.unlink()
+        (self.tmp / 'state.json').unlink()
+        converter.state.records.clear()
+        with mock.patch.object(CostEstimator, 'estimate', autospec=True, return_value=1.0) as estimate:
+            self.assertListEqual(['bad.odt'], await converter.process())
+        self.assertEqual(1, estimate.call_count)
+        summary = json.loads((self.tmp / 'summary.json').read_text())
+        self.assertEqual((0, 3, 3), (summary['fresh'], summary['from_cache'], summary['done']))
+        self.assertEqual('same', (self.dest / 'd/b.html').read_text())
+        converter.journal.close()
+
+    async def test_resume(self):
+        converter = self.get_converter(journal=self.tmp / 'journal.db')
+        self.assertEqual(4, len(await converter.process()))
+        journal = converter.journal
+
+        # crash after walk, not finished files are replayed from journal
+        journal.record(FileInfo(self.home, Path('a.odt')), JobJournal.IN_FLIGHT)
+        journal.flush()
+        with mock.patch.object(converter, 'get_file_provider', side_effect=AssertionError('walk')):
+            self.assertListEqual(['a.odt'], await converter.process(resume=True))
+
+        # crash during walk, home is walked again, finished files are skipped
+        journal.record(FileInfo(self.home, Path('c.odt')), JobJournal.PENDING)
+        journal.set_walk_done(self.home, False)
+        journal.flush()
+        self.assertListEqual(['c.odt'], await converter.process(resume=True))
+        self.assertTrue(journal.is_walk_done(self.home))
+
+        # without resume it is new run
+        self.assertEqual(4, len(await converter.process()))
+        journal.close()
+
+    async def test_file_provider(self):
+        dead_letter = self.tmp / 'dead.jsonl'
+        converter = self.get_converter(journal=self.tmp / 'journal.db', dead_letter=dead_letter)
+        await converter.process()
+        (self.home / 'bad.odt').rename(self.home / 'fixed.odt')
+        dead_letter.write_text(dead_letter.read_text().replace('bad.odt', 'fixed.odt'))
+
+        # replay of dead letters does not reset records of run and does not finish its walk
+        journal = converter.journal
+        journal.set_walk_done(self.home, False)
+        journal.flush()
+        self.assertListEqual(['fixed.odt'], await converter.process(DeadLetterFileProvider(dead_letter)))
+        self.assertListEqual(
+            ['a.odt', 'c.odt', 'd/b.odt', 'fixed.odt'], sorted(journal.get_files(self.home, (JobJournal.DONE, )))
+        )
+        self.assertFalse(journal.is_walk_done(self.home))
+        journal.close()
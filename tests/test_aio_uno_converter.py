@@ -0,0 +1,151 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-17 (y-m-d) 12:40 AM
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase, mock
+
+from definitions import BytesFileInfo
+
+try:
+    import aio_uno_converter
+    UNO_SUPPORTED = True
+except ImportError:
+    UNO_SUPPORTED = False
+
+
+class FakeServer:
+    """
+        Stands in for leased soffice server
+    """
+
+    shared_filesystem = False
+
+    def __init__(self, port: int) -> None:
+        self.effective_port = port
+        self.connection = {'port': port}
+
+    def is_running(self) -> bool:
+        return True
+
+    def record_conversion(self, latency: float):
+        pass
+
+    def should_recycle(self):
+        return None
+
+    def _log_server(self, msg: str = '', level=None):
+        pass
+
+
+class FakePool:
+
+    def __init__(self) -> None:
+        self.acquired: list[FakeServer] = []
+        self.released: list[FakeServer] = []
+        self.idle_number = 0
+
+    async def acquire(self) -> FakeServer:
+        await asyncio.sleep(0.01)
+        self.acquired.append(FakeServer(2002 + len(self.acquired)))
+        return self.acquired[-1]
+
+    def release(self, server: FakeServer, discard: bool = False):
+        self.released.append(server)
+
+
+class FakeUnoBridgeConverter:
+    """
+        Upper-cases document, b"bad" document fails, the first attempt of b"flaky" document fails
+    """
+
+    attempts: dict[bytes, int] = {}
+
+    def __init__(self, **connection) -> None:
+        self.connection = connection
+
+    def convert_bytes(self, data: bytes, convert_to: str, filter_options=()) -> bytes:
+        self.attempts[data] = self.attempts.get(data, 0) + 1
+        if data == b'bad' or data == b'flaky' and self.attempts[data] == 1:
+            raise RuntimeError('bad document')
+        return b'|'.join([data.upper(), convert_to.encode(), *[option.encode() for option in filter_options]])
+
+
+class Recorder:
+
+    def __init__(self) -> None:
+        self.done, self.failed = [], []
+
+    def file_done(self, file_info, outpath, server):
+        self.done.append((file_info, outpath, server))
+
+    def file_failed(self, file_info, error, server):
+        self.failed.append((file_info, error, server))
+
+
+@unittest.skipUnless(UNO_SUPPORTED, 'uno (LibreOffice python) is not installed')
+class TestConvertBytes(IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(aio_uno_converter, 'UnoBridgeConverter', FakeUnoBridgeConverter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = FakePool()
+        self.recorder = Recorder()
+        self.converter = aio_uno_converter.AsyncSOUnoConverter(
+            Path(self.tmpdir.name), 'html', pool=self.pool, observers=[self.recorder]
+        )
+        self.converter.retry_delay = 0.01
+        FakeUnoBridgeConverter.attempts = {}
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    async def test_convert_bytes(self):
+        results = await asyncio.gather(
+            self.converter.convert_bytes(b'a'),
+            self.converter.convert_bytes(b'b', 'pdf', ['Quality=90'], name='b.odt'),
+            self.converter.convert_bytes(b'c', 'html:XHTML Writer File:UTF8'),
+        )
+        self.assertListEqual([b'A|html', b'B|pdf|Quality=90', b'C|html:XHTML Writer File:UTF8'], results)
+        # concurrent callers share one leased server
+        self.assertEqual(1, len(self.pool.acquired))
+
+        file_info, outpath, server = self.recorder.done[1]
+        self.assertIsInstance(file_info, BytesFileInfo)
+        self.assertEqual(Path('b.odt'), file_info.file)
+        self.assertEqual(1, file_info.attempts)
+        self.assertIsNone(outpath)
+        self.assertIs(self.pool.acquired[0], server)
+
+        await self.converter.close()
+        self.assertListEqual(self.pool.acquired, self.pool.released)
+
+    async def test_convert_bytes_failed(self):
+        self.converter.retries = 1
+        async with self.converter:
+            with self.assertRaisesRegex(RuntimeError, 'bad document'):
+                await self.converter.convert_bytes(b'bad', name='bad.odt')
+            self.assertEqual(b'A|html', await self.converter.convert_bytes(b'a'))
+
+        file_info, error, server = self.recorder.failed[0]
+        self.assertEqual(Path('bad.odt'), file_info.file)
+        self.assertEqual(2, file_info.attempts)
+        self.assertIn('bad document', error)
+        self.assertTrue(file_info.output.done())
+
+    async def test_server_finalized_during_backoff(self):
+        self.converter.retry_delay = 0.2
+        task = asyncio.create_task(self.converter.convert_bytes(b'flaky'))
+        await asyncio.sleep(0.1)
+        # for example process() is done meanwhile
+        await self.converter.close()
+        self.assertEqual(b'FLAKY|html', await task)
+        self.assertEqual(2, len(self.pool.acquired))
+        await self.converter.close()
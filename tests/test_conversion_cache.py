@@ -0,0 +1,105 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 7:55 PM
+import hashlib
+from pathlib import Path
+
+from conversion_cache import ConversionCache, CachedFileProvider, file_digest
+from definitions import FileInfo
+from tests.helpers import convert_queued, HomeTestCase
+
+
+class Recorder:
+
+    def __init__(self) -> None:
+        self.done = []
+
+    def file_done(self, file_info: FileInfo, outpath: Path, server):
+        self.done.append((file_info.file.as_posix(), outpath))
+
+    def file_failed(self, file_info: FileInfo, error: str, server):
+        pass
+
+
+class TestConversionCache(HomeTestCase):
+
+    home_files = {'a.odt': b'same', 'd/b.odt': b'same', 'c.odt': b'other'}
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.cache = ConversionCache(self.tmp / 'cache', soffice_version='test')
+
+    def convert(self, file_info: FileInfo) -> Path:
+        outpath = self.write_output(file_info, f'<img src="{file_info.file.stem}_html_1.png">')
+        outpath.with_name(f'{outpath.stem}_html_1.png').write_bytes(b'png')
+        return outpath
+
+    async def run_once(self) -> tuple[list[str], Recorder]:
+        recorder = Recorder()
+        provider = CachedFileProvider(self.get_walker(), self.cache, self.get_outpath, 'html', observers=[recorder])
+        provider.provider.use_thread = False
+
+        async def convert(file_info: FileInfo):
+            self.cache.file_done(file_info, self.convert(file_info), None)
+            await self.cache.join()
+
+        queued = await convert_queued(provider, convert)
+        return sorted(queued), recorder
+
+    def test_file_digest(self):
+        path = self.home / 'big.bin'
+        path.write_bytes(b'0123456789' * 100_000)
+        self.assertEqual(hashlib.sha256(path.read_bytes()).hexdigest(), file_digest(path, chunk_size=4096))
+
+    async def test_process(self):
+        queued, recorder = await self.run_once()
+        self.assertIn('c.odt', queued)
+        # byte-identical a.odt and d/b.odt are converted once
+        self.assertEqual(2, len(queued))
+        self.assertEqual(1, len(recorder.done))
+        self.assertEqual(2, self.cache.stored)
+
+        materialized = recorder.done[0][1]
+        self.assertTrue(materialized.exists())
+        # image is materialized with the name output refers to
+        self.assertIn(materialized.parent / f'{Path(queued[0]).stem}_html_1.png', materialized.parent.iterdir())
+
+        queued, recorder = await self.run_once()
+        self.assertListEqual([], queued)
+        self.assertListEqual(['a.odt', 'c.odt', 'd/b.odt'], sorted(file for file, outpath in recorder.done))
+
+    async def test_evict(self):
+        self.cache.link_modes = ('copy', )
+        for name in ('a.odt', 'c.odt'):
+            file_info = FileInfo(self.home, Path(name))
+            key = self.cache.get_key(self.home / name, 'html')
+            self.cache.store(key, self.convert(file_info))
+        self.assertEqual(2, len(list(self.cache.path.glob('*/*/meta.json'))))
+
+        # a.odt is used recently
+        self.cache.materialize(self.cache.get_key(self.home / 'a.odt', 'html'), self.dest / 'x.html')
+        # room for two entries of the same size
+        self.cache.max_bytes = sum(size for last_used, size in self.cache._index.values())
+        outpath = self.convert(FileInfo(self.home, Path('d/b.odt')))
+        self.cache.store(self.cache.get_key(self.home / 'd' / 'b.odt', 'xml'), outpath)
+        keys = {meta.parent.name for meta in self.cache.path.glob('*/*/meta.json')}
+        self.assertNotIn(self.cache.get_key(self.home / 'c.odt', 'html'), keys)
+        self.assertIn(self.cache.get_key(self.home / 'a.odt', 'html'), keys)
+
+    async def test_output_rewrite(self):
+        # reconversion rewrites output in place, entry of the old key stays the same
+        key = self.cache.get_key(self.home / 'c.odt', 'html')
+        outpath = self.convert(FileInfo(self.home, Path('c.odt')))
+        content = outpath.read_bytes()
+        self.cache.store(key, outpath)
+        outpath.write_bytes(b'new content')
+
+        other = self.dest / 'x.html'
+        self.assertTrue(self.cache.materialize(key, other))
+        self.assertEqual(content, other.read_bytes())
+        other.write_bytes(b'modified')
+        self.assertTrue(self.cache.materialize(key, outpath))
+        self.assertEqual(content, outpath.read_bytes())
@@ -0,0 +1,46 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 1:45 PM
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+
+from dead_letter import DeadLetterSink, DeadLetterFileProvider
+from definitions import FileInfo, QUEUE_END
+
+
+class TestDeadLetter(IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / 'dead' / 'letters.jsonl'
+        self.sink = DeadLetterSink(self.path)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_file_failed(self):
+        self.sink.file_failed(FileInfo(Path('/home'), Path('a/b.odt'), attempts=3), 'timeout [20s]', None)
+        self.sink.file_failed(FileInfo(Path('/home'), Path('c.odt'), attempts=1), "RuntimeError('x')", None)
+
+        records = list(DeadLetterSink.read(self.path))
+        self.assertEqual(2, self.sink.count)
+        self.assertEqual(2, len(records))
+        self.assertEqual(
+            {'home': '/home', 'file': 'a/b.odt', 'error': 'timeout [20s]', 'attempts': 3,
+             'server_id': None, 'pid': None, 'port': None},
+            {key: val for key, val in records[0].items() if key != 'time'}
+        )
+
+    async def test_replay(self):
+        for home in ('/home', '/home', '/other'):
+            self.sink.file_failed(FileInfo(Path(home), Path('a.odt')), 'error', None)
+
+        queue = asyncio.Queue()
+        await DeadLetterFileProvider(self.path, home='/home').process(queue)
+        self.assertEqual(FileInfo(Path('/home'), Path('a.odt')), queue.get_nowait())
+        self.assertIs(QUEUE_END, queue.get_nowait())
@@ -0,0 +1,104 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 10:20 AM
+import asyncio
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from definitions import FileInfo, QUEUE_END, queue_get, ConvertTarget, parse_targets, WrappingFileProvider
+
+
+class TestQueueGet(IsolatedAsyncioTestCase):
+
+    async def test_queue_get(self):
+        queue = asyncio.Queue(maxsize=2)
+        fi = FileInfo(Path('.'), Path('file.odt'))
+        queue.put_nowait(fi)
+        queue.put_nowait(QUEUE_END)
+
+        self.assertIs(fi, await queue_get(queue))
+        queue.task_done()
+
+        # QUEUE_END stays in queue for other consumers
+        for i in range(3):
+            self.assertIs(QUEUE_END, await queue_get(queue))
+            self.assertEqual(1, queue.qsize())
+
+    async def test_queue_get_waits(self):
+        queue = asyncio.Queue()
+        consumers = [asyncio.create_task(queue_get(queue)) for i in range(3)]
+        await asyncio.sleep(0)
+        self.assertFalse(any(consumer.done() for consumer in consumers))
+
+        await queue.put(QUEUE_END)
+        self.assertListEqual([QUEUE_END] * 3, await asyncio.gather(*consumers))
+
+
+class ListProvider:
+
+    def __init__(self, number: int) -> None:
+        self.number = number
+        self.finished = False
+
+    async def process(self, queue: asyncio.Queue):
+        try:
+            for i in range(self.number):
+                await queue.put(FileInfo(Path('.'), Path(f'{i}.odt')))
+        finally:
+            await queue.put(QUEUE_END)
+            self.finished = True
+
+
+class PassingProvider(WrappingFileProvider):
+
+    async def _process_batch(self, batch: list[FileInfo], queue: asyncio.Queue):
+        for file_info in batch:
+            await queue.put(file_info)
+            self.queued += 1
+
+
+class TestWrappingFileProvider(IsolatedAsyncioTestCase):
+
+    async def test_process(self):
+        provider = PassingProvider(ListProvider(5))
+        queue = asyncio.Queue(1)
+        task = asyncio.create_task(provider.process(queue))
+        files = []
+        while (file_info := await queue.get()) is not QUEUE_END:
+            files.append(file_info.file.name)
+        await task
+        self.assertListEqual([f'{i}.odt' for i in range(5)], files)
+        self.assertEqual(5, provider.queued)
+
+    async def test_cancel(self):
+        inner = ListProvider(50)
+        queue = asyncio.Queue(1)
+        task = asyncio.create_task(PassingProvider(inner).process(queue))
+        await queue.get()
+        # inner queue is full, wrapped provider waits for free slot
+        await asyncio.sleep(0.05)
+        task.cancel()
+        while await queue.get() is not QUEUE_END:
+            pass
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(task, 1)
+        # wrapped provider is not left blocked on QUEUE_END
+        self.assertTrue(inner.finished)
+
+
+class TestParseTargets(TestCase):
+
+    def test_parse_targets(self):
+        self.assertTupleEqual((ConvertTarget('html'), ), parse_targets('html'))
+
+        targets = parse_targets(['html', ('pdf', ['SelectPdfVersion=1']), ConvertTarget('txt:Text (encoded):UTF8')])
+        self.assertListEqual(['html', 'pdf', 'txt'], [target.ext for target in targets])
+        self.assertTupleEqual(('SelectPdfVersion=1', ), targets[1].filter_options)
+        self.assertEqual('txt:Text (encoded):UTF8', targets[2].convert_to)
+
+        for convert_to in ([], ['html', 'html:XHTML Writer File:UTF8'], [':Text']):
+            with self.assertRaises(ValueError, msg=str(convert_to)):
+                parse_targets(convert_to)
@@ -0,0 +1,100 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 5:40 PM
+import re
+from unittest import TestCase
+
+from file_filter import FilterSpec, glob_to_regex, parse_shard, shard_of
+
+
+class TestGlobToRegex(TestCase):
+
+    def _match(self, pattern: str, path: str) -> bool:
+        return re.fullmatch(glob_to_regex(pattern), path) is not None
+
+    def test_name_pattern(self):
+        self.assertTrue(self._match('*.odt', 'a.odt'))
+        self.assertTrue(self._match('*.odt', 'x/y/a.odt'))
+        self.assertFalse(self._match('*.odt', 'a.odt.bak'))
+        self.assertTrue(self._match('report-?.od[st]', 'x/report-1.ods'))
+        self.assertFalse(self._match('report-[!0-9].odt', 'report-1.odt'))
+
+    def test_path_pattern(self):
+        self.assertTrue(self._match('docs/*.odt', 'docs/a.odt'))
+        self.assertFalse(self._match('docs/*.odt', 'docs/x/a.odt'))
+        self.assertFalse(self._match('docs/*.odt', 'x/docs/a.odt'))
+        self.assertTrue(self._match('docs/**/*.odt', 'docs/a.odt'))
+        self.assertTrue(self._match('docs/**/*.odt', 'docs/x/y/a.odt'))
+        self.assertTrue(self._match('**/tmp/*', 'tmp/a'))
+        self.assertTrue(self._match('**/tmp/*', 'x/tmp/a'))
+        self.assertTrue(self._match('docs/**', 'docs/x/a'))
+        self.assertTrue(self._match('/docs', 'docs'))
+        self.assertFalse(self._match('/docs', 'x/docs'))
+
+
+class TestFilterSpec(TestCase):
+
+    def test_include_exclude(self):
+        spec = FilterSpec(include=('*.odt', 'legacy/**/*.doc'), exclude=('drafts/**', '~$*'))
+        self.assertTrue(spec.match_path('a.odt'))
+        self.assertTrue(spec.match_path('x/a.odt'))
+        self.assertTrue(spec.match_path('legacy/x/a.doc'))
+        self.assertFalse(spec.match_path('x/a.doc'))
+        self.assertFalse(spec.match_path('drafts/a.odt'))
+        self.assertFalse(spec.match_path('x/~$a.odt'))
+        self.assertTrue(spec.match_path('x/drafts/a.odt'))
+
+    def test_extensions(self):
+        spec = FilterSpec(extensions=('odt', '.DOCX'), case_sensitive=False)
+        self.assertTrue(spec.match_path('a.ODT'))
+        self.assertTrue(spec.match_path('a.docx'))
+        self.assertFalse(spec.match_path('a.txt'))
+
+        spec = FilterSpec(include=('*.odt', ))
+        self.assertFalse(spec.match_path('a.ODT'))
+
+    def test_prune(self):
+        spec = FilterSpec(exclude=('drafts/**', ), prune=('.git', 'node_modules', 'build/tmp'))
+        self.assertTrue(spec.prune_dir('drafts'))
+        self.assertFalse(spec.prune_dir('x/drafts'))
+        self.assertTrue(spec.prune_dir('x/.git'))
+        self.assertTrue(spec.prune_dir('node_modules'))
+        self.assertTrue(spec.prune_dir('build/tmp'))
+        self.assertFalse(spec.prune_dir('x/build/tmp'))
+        self.assertFalse(FilterSpec().prune_dir('x'))
+
+    def test_stat(self):
+        spec = FilterSpec(min_size=10, max_size=100, min_mtime=1000)
+        self.assertTrue(spec.needs_stat)
+        self.assertFalse(FilterSpec().needs_stat)
+
+        class St:
+            st_size = 50
+            st_mtime = 2000
+
+        self.assertTrue(spec.match_stat(St))
+        St.st_size = 5
+        self.assertFalse(spec.match_stat(St))
+        St.st_size, St.st_mtime = 50, 10
+        self.assertFalse(spec.match_stat(St))
+
+
+class TestShard(TestCase):
+
+    def test_parse_shard(self):
+        self.assertEqual((1, 4), parse_shard('1/4'))
+        self.assertEqual((0, 1), parse_shard((0, 1)))
+        for value in ('4/4', '-1/4', '1', 'a/b', None):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_shard_of(self):
+        paths = [f'dir{i % 7}/file{i}.odt' for i in range(1000)]
+        shards = [shard_of(path, 4) for path in paths]
+        # stable across runs and processes (not hash() of str)
+        self.assertEqual(shard_of('dir0/file0.odt', 4), shard_of('dir0/file0.odt', 4))
+        self.assertEqual(0, shard_of('a/b.odt', 4))
+        self.assertTrue(all(150 < shards.count(i) < 350 for i in range(4)))
@@ -4,9 +4,15 @@
 # File: ${FILE_NAME}
 # Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
 # Created by ox23 at 2022-08-13 (y-m-d) 8:20 AM
-from unittest import TestCase
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase, IsolatedAsyncioTestCase
 
-from lib.file_provider import FileProvider, ResultPathType
+from lib.file_provider import FileProvider, ResultPathType, AsyncFileProvider, QUEUE_END
+from lib.file_filter import FilterSpec
 from pathlib import Path
 
 
@@ -136,3 +142,209 @@ class TestFileProvider(TestCase):
         self.file_provider.result_path_type = ResultPathType.ABSOLUTE
         self.assertListEqual(result, list(self.file_provider))
 
+
+class TestFileProviderWalker(TestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.home = Path(self.tmpdir.name) / 'home'
+        for name in ('1.odt', 'a/2.odt', 'a/b/3.odt', 'c/4.odt', '.hidden/5.odt', 'a/.6.odt'):
+            (self.home / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.home / name).touch()
+        os.symlink('..', self.home / 'a' / 'b' / 'loop')  # loop
+        os.symlink('../c', self.home / 'a' / 'linkc')  # duplicate of c
+        os.symlink('.hidden', self.home / 'visible')  # target is hidden
+        os.symlink('../1.odt', self.home / 'c' / 'link1.odt')
+
+        self.file_provider = FileProvider(self.home, ResultPathType.RELATIVE_TO_HOME)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_result_path_type(self):
+        relative = sorted(self.file_provider)
+        self.assertListEqual(['1.odt', 'a/2.odt', 'a/b/3.odt', 'c/4.odt', 'c/link1.odt'], relative)
+
+        self.file_provider.result_path_type = ResultPathType.AS_IS
+        self.assertListEqual([str(self.home / file) for file in relative], sorted(self.file_provider))
+
+        self.file_provider.result_path_type = ResultPathType.ABSOLUTE
+        absolute = sorted(str(self.home.resolve() / file) for file in relative if file != 'c/link1.odt')
+        self.assertListEqual(sorted(absolute + [str(self.home.resolve() / '1.odt')]), sorted(self.file_provider))
+
+    def test_duplicates(self):
+        list(self.file_provider)
+        duplicates = self.file_provider.duplicates_due_to_symbolic_links
+        self.assertListEqual([self.home / 'a', self.home / 'a' / 'b' / 'loop'], duplicates[(self.home / 'a').resolve()])
+        self.assertListEqual([self.home / 'c', self.home / 'a' / 'linkc'], duplicates[(self.home / 'c').resolve()])
+
+    def test_hardlinks(self):
+        # hardlinks are different files, symlink to other file does not make them duplicates
+        (self.home / 'z').mkdir()
+        (self.home / 'z' / 'z.odt').touch()
+        os.symlink('z.odt', self.home / 'z' / 'link.odt')
+        os.link(self.home / 'a' / '2.odt', self.home / 'z' / '7.odt')
+        self.assertListEqual(
+            ['1.odt', 'a/2.odt', 'a/b/3.odt', 'c/4.odt', 'c/link1.odt', 'z/7.odt', 'z/link.odt', 'z/z.odt'],
+            sorted(self.file_provider)
+        )
+
+    def test_filters(self):
+        self.file_provider.filters = [lambda path: path.name != 'b' and None]
+        self.assertListEqual(
+            ['.hidden/5.odt', '1.odt', 'a/.6.odt', 'a/2.odt', 'c/4.odt', 'c/link1.odt'], sorted(self.file_provider)
+        )
+
+    def test_hidden_home(self):
+        self.file_provider.home = self.home / '.hidden'
+        self.assertListEqual([], list(self.file_provider))
+
+    def test_filter_spec(self):
+        (self.home / 'a' / 'big.odt').write_bytes(b'0' * 100)
+        (self.home / 'a' / 'b' / 'x.txt').touch()
+        self.file_provider.filter_spec = FilterSpec(include=('*.odt', '*.txt'), exclude=('c/**', ), max_size=10)
+        # c is pruned, thus it is walked through symlink a/linkc
+        self.assertListEqual(
+            ['1.odt', 'a/2.odt', 'a/b/3.odt', 'a/b/x.txt', 'a/linkc/4.odt', 'a/linkc/link1.odt'],
+            sorted(self.file_provider)
+        )
+
+        self.file_provider.filter_spec = FilterSpec(include=('*.odt', ), prune=('b', ))
+        self.assertListEqual(['1.odt', 'a/2.odt', 'a/big.odt', 'c/4.odt', 'c/link1.odt'], sorted(self.file_provider))
+
+    def test_shard(self):
+        expected = sorted(self.file_provider)
+        shards = []
+        for i in range(3):
+            self.file_provider.shard = f'{i}/3'
+            shards.append(sorted(self.file_provider))
+        self.assertListEqual(expected, sorted(file for shard in shards for file in shard))
+        self.assertEqual(len(expected), len(set(file for shard in shards for file in shard)))
+
+    def test_walk_workers(self):
+        (self.home / 'a' / 'big.odt').write_bytes(b'0' * 100)
+        for spec in (None, FilterSpec(include=('*.odt', ), exclude=('c/**', ), max_size=10)):
+            self.file_provider.filter_spec = spec
+            self.file_provider.walk_workers = 0
+            expected = list(self.file_provider)
+            expected_duplicates = self.file_provider.duplicates_due_to_symbolic_links
+
+            self.file_provider.walk_workers, self.file_provider.walk_prefetch = 4, 2
+            self.assertListEqual(expected, list(self.file_provider))
+            self.assertDictEqual(expected_duplicates, self.file_provider.duplicates_due_to_symbolic_links)
+
+    def test_on_directory(self):
+        events = []
+
+        class Recorder(FileProvider):
+
+            def _on_directory(self, path: str, rel_path: str):
+                events.append(('watch', path))
+
+            def _scandir(self, path: str):
+                events.append(('list', path))
+                return FileProvider._scandir(path)
+
+        for workers in (0, 4):
+            events.clear()
+            provider = Recorder(self.home, ResultPathType.RELATIVE_TO_HOME)
+            provider.walk_workers = workers
+            list(provider)
+            listed = [path for event, path in events if event == 'list']
+            self.assertIn(str(self.home / 'a' / 'b'), listed)
+            # directory is watched before it is listed
+            for path in listed:
+                self.assertLess(events.index(('watch', path)), events.index(('list', path)), msg=path)
+
+
+class TestAsyncFileProvider(IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.home = Path(self.tmpdir.name)
+        self.files = sorted(f'{i // 10}/{i}.odt' for i in range(100))
+        for name in self.files:
+            (self.home / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.home / name).touch()
+        self.provider = AsyncFileProvider(self.home, ResultPathType.RELATIVE_TO_HOME)
+        self.provider.batch_size = 8
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    async def _consume(self, queue: asyncio.Queue) -> list:
+        result = []
+        while True:
+            item = await queue.get()
+            result.append(item)
+            if item is QUEUE_END:
+                return result
+
+    async def test_process(self):
+        for use_thread in (True, False):
+            self.provider.use_thread = use_thread
+            queue = asyncio.Queue(4)
+            task = asyncio.create_task(self.provider.process(queue))
+            result = await self._consume(queue)
+            await task
+            self.assertIs(QUEUE_END, result[-1])
+            self.assertListEqual(self.files, sorted(str(fi.file) for fi in result[:-1]))
+
+    async def test_process_off_loop(self):
+        walker_threads = set()
+        get_files = self.provider._get_files
+
+        def _get_files(heartbeat=None):
+            for file in get_files(heartbeat):
+                walker_threads.add(threading.get_ident())
+                yield file
+
+        self.provider._get_files = _get_files
+        queue = asyncio.Queue(4)
+        task = asyncio.create_task(self.provider.process(queue))
+        await self._consume(queue)
+        await task
+        self.assertEqual(1, len(walker_threads))
+        self.assertNotIn(threading.get_ident(), walker_threads)
+
+    async def test_process_cancel(self):
+        queue = asyncio.Queue(4)
+        task = asyncio.create_task(self.provider.process(queue))
+        while not queue.full():
+            await asyncio.sleep(0.01)
+        # walker thread waits for the handoff, cancel has to release it
+        task.cancel()
+        while queue.qsize():
+            if queue.get_nowait() is QUEUE_END:
+                break
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_process_sparse(self):
+        (self.home / 'top.odt').touch()
+        walked = []
+
+        def slow_scandir(path: str):
+            walked.append(path)
+            time.sleep(0.05)
+            return FileProvider._scandir(path)
+
+        self.provider._scandir = slow_scandir
+        self.provider.filters = [lambda path: None if path.is_dir() else path.name == 'top.odt']
+        queue = asyncio.Queue(4)
+        task = asyncio.create_task(self.provider.process(queue))
+
+        # the only file is handed over while directories without matches are walked
+        file_info = await asyncio.wait_for(queue.get(), 0.3)
+        self.assertEqual(Path('top.odt'), file_info.file)
+        self.assertFalse(task.done())
+
+        # walker thread stops on the next directory
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.15)
+        walked_number = len(walked)
+        await asyncio.sleep(0.15)
+        self.assertEqual(walked_number, len(walked))
+        self.assertLess(walked_number, 11)
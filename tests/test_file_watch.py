@@ -0,0 +1,90 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 9:50 PM
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+
+from definitions import QUEUE_END
+from file_filter import FilterSpec
+from file_provider import ResultPathType
+from file_watch import WatchFileProvider, Inotify, INOTIFY_SUPPORTED, IN_CREATE, IN_CLOSE_WRITE
+
+
+class TestWatchFileProvider(IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.home = Path(self.tmpdir.name)
+        (self.home / 'a').mkdir()
+        (self.home / 'a' / '1.odt').touch()
+        self.provider = WatchFileProvider(
+            self.home, ResultPathType.RELATIVE_TO_HOME, filter_spec=FilterSpec(include=('*.odt', ))
+        )
+        self.provider.settle_delay, self.provider.debounce_delay = 0.05, 0.3
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    async def get(self, queue: asyncio.Queue, timeout: float = 5) -> str:
+        item = await asyncio.wait_for(queue.get(), timeout)
+        return item if item is QUEUE_END else item.file.as_posix()
+
+    @unittest.skipUnless(INOTIFY_SUPPORTED, 'inotify is not supported')
+    def test_inotify(self):
+        inotify = Inotify()
+        try:
+            wd = inotify.add_watch(str(self.home))
+            (self.home / 'x.odt').write_bytes(b'x')
+            events = inotify.read()
+            self.assertIn((wd, IN_CREATE, 0, 'x.odt'), events)
+            self.assertIn((wd, IN_CLOSE_WRITE, 0, 'x.odt'), events)
+            self.assertListEqual([], inotify.read())
+        finally:
+            inotify.close()
+
+    async def _test_process(self, queue: asyncio.Queue):
+        task = asyncio.create_task(self.provider.process(queue))
+        self.assertEqual('a/1.odt', await self.get(queue))
+
+        (self.home / 'a' / '2.odt').write_bytes(b'2')
+        (self.home / 'a' / '.hidden.odt').write_bytes(b'2')
+        (self.home / 'a' / '2.txt').write_bytes(b'2')
+        self.assertEqual('a/2.odt', await self.get(queue))
+
+        # new directory with file is watched too
+        (self.home / 'b' / 'c').mkdir(parents=True)
+        (self.home / 'b' / 'c' / '3.odt').write_bytes(b'3')
+        self.assertEqual('b/c/3.odt', await self.get(queue))
+        await asyncio.sleep(0.1)
+        (self.home / 'b' / 'c' / '4.odt').write_bytes(b'4')
+        self.assertEqual('b/c/4.odt', await self.get(queue))
+
+        self.provider.stop()
+        self.assertIs(QUEUE_END, await self.get(queue))
+        await task
+        self.assertTrue(queue.empty())
+
+    @unittest.skipUnless(INOTIFY_SUPPORTED, 'inotify is not supported')
+    async def test_process_inotify(self):
+        await self._test_process(asyncio.Queue(2))
+        self.assertTrue(self.provider._watches)
+
+    async def test_process_polling(self):
+        self.provider.use_inotify = False
+        self.provider.poll_interval, self.provider.debounce_delay = 0.05, 0
+        await self._test_process(asyncio.Queue(2))
+
+    async def test_stop_before_start(self):
+        queue = asyncio.Queue(2)
+        task = asyncio.create_task(self.provider.process(queue))
+        # initial walk is made, then process() returns
+        self.provider.stop()
+        self.assertEqual('a/1.odt', await self.get(queue))
+        self.assertIs(QUEUE_END, await self.get(queue))
+        await asyncio.wait_for(task, 5)
@@ -0,0 +1,81 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 7:05 PM
+import os
+from pathlib import Path
+
+from definitions import FileInfo
+from incremental import ConversionState, IncrementalFileProvider
+from tests.helpers import convert_queued, HomeTestCase
+
+
+class TestIncremental(HomeTestCase):
+
+    home_files = {'a.odt': b'content', 'd/b.odt': b'content'}
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.state_path = self.tmp / 'state.json'
+
+    async def run_once(self, use_hash: bool = False) -> tuple[list[str], IncrementalFileProvider]:
+        """
+            Returns queued files (they are converted)
+        """
+        state = ConversionState(self.state_path, use_hash)
+        provider = IncrementalFileProvider(self.get_walker(), state, self.get_outpath)
+
+        def convert(file_info: FileInfo):
+            state.file_done(file_info, self.write_output(file_info), None)
+
+        queued = await convert_queued(provider, convert, maxsize=2)
+        state.save()
+        return sorted(queued), provider
+
+    async def test_process(self):
+        queued, provider = await self.run_once()
+        self.assertListEqual(['a.odt', 'd/b.odt'], queued)
+        self.assertSetEqual({'a.odt', 'd/b.odt'}, set(ConversionState(self.state_path).records))
+
+        queued, provider = await self.run_once()
+        self.assertListEqual([], queued)
+        self.assertEqual(2, provider.skipped)
+
+        (self.home / 'd' / 'b.odt').write_bytes(b'changed content')
+        queued, provider = await self.run_once()
+        self.assertListEqual(['d/b.odt'], queued)
+
+        (self.home / 'a.odt').unlink()
+        queued, provider = await self.run_once()
+        self.assertListEqual([], queued)
+        self.assertListEqual([self.dest / 'a.html'], provider.removed)
+        self.assertFalse((self.dest / 'a.html').exists())
+        self.assertSetEqual({'d/b.odt'}, set(ConversionState(self.state_path).records))
+
+    async def test_process_hash(self):
+        await self.run_once(use_hash=True)
+        st = (self.home / 'a.odt').stat()
+        os.utime(self.home / 'a.odt', ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        queued, provider = await self.run_once(use_hash=True)
+        self.assertListEqual([], queued)
+
+        os.utime(self.home / 'a.odt', ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10 ** 9))
+        queued, provider = await self.run_once(use_hash=False)
+        self.assertListEqual(['a.odt'], queued)
+
+    async def test_adopt_outputs(self):
+        # outputs of run without state
+        self.write_output(FileInfo(self.home, Path('d/b.odt')))
+        queued, provider = await self.run_once()
+        self.assertListEqual(['a.odt'], queued)
+        self.assertSetEqual({'a.odt', 'd/b.odt'}, set(ConversionState(self.state_path).records))
+
+    async def test_other_target(self):
+        await self.run_once()
+        # convert_to is changed, the same state file
+        self.get_outpath = lambda file_info: (self.dest / file_info.file).with_suffix('.pdf')
+        queued, provider = await self.run_once()
+        self.assertListEqual(['a.odt', 'd/b.odt'], queued)
+        self.assertEqual(str(self.dest / 'a.pdf'), ConversionState(self.state_path).records['a.odt']['output'])
@@ -0,0 +1,110 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 8:50 PM
+import asyncio
+import sqlite3
+from pathlib import Path
+from unittest import mock
+
+from definitions import FileInfo
+from job_journal import JobJournal, JournalFileProvider, JournalReplayProvider
+from tests.helpers import convert_queued, HomeTestCase
+
+
+class TestJobJournal(HomeTestCase):
+
+    home_files = {f'{i}.odt': b'' for i in range(6)}
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.files = list(self.home_files)
+        self.path = self.tmp / 'journal.sqlite'
+        self.journal = JobJournal(self.path)
+
+    def tearDown(self) -> None:
+        self.journal.close()
+        super().tearDown()
+
+    def test_flush(self):
+        file_info = FileInfo(self.home, Path('a.odt'))
+        self.journal.record(file_info, JobJournal.PENDING)
+        self.journal.record(file_info, JobJournal.IN_FLIGHT)
+        self.journal.file_done(file_info, Path('/dest/a.html'), None)
+        self.journal.file_failed(FileInfo(self.home, Path('b.odt')), 'error', None)
+        self.journal.set_walk_done(self.home)
+        self.assertListEqual([], self.journal.get_files(self.home, (JobJournal.DONE, )))
+
+        self.journal.flush()
+        self.assertEqual(1, self.journal.commits)
+        self.assertListEqual(['a.odt'], self.journal.get_files(self.home, (JobJournal.DONE, )))
+        self.assertListEqual(['b.odt'], self.journal.get_files(self.home, (JobJournal.FAILED, )))
+        self.assertTrue(self.journal.is_walk_done(self.home))
+
+        self.journal.reset(self.home)
+        self.assertListEqual([], self.journal.get_files(self.home, (JobJournal.DONE, JobJournal.FAILED)))
+        self.assertFalse(self.journal.is_walk_done(self.home))
+
+    async def test_flush_failure(self):
+        self.journal.flush_interval = 0.02
+        file_info = FileInfo(self.home, Path('a.odt'))
+        self.journal.file_done(file_info, Path('/dest/a.html'), None)
+        self.journal.start()
+        locked = sqlite3.OperationalError('database is locked')
+        with mock.patch.object(self.journal, '_connect', side_effect=locked):
+            await asyncio.sleep(0.1)
+            # the newer record is kept, the failed one is not lost
+            self.journal.file_failed(FileInfo(self.home, Path('b.odt')), 'error', None)
+            await asyncio.sleep(0.1)
+            self.assertFalse(self.journal._flusher.done())
+            self.assertEqual(0, self.journal.commits)
+
+        await asyncio.sleep(0.1)
+        self.assertListEqual(['a.odt'], self.journal.get_files(self.home, (JobJournal.DONE, )))
+        self.assertListEqual(['b.odt'], self.journal.get_files(self.home, (JobJournal.FAILED, )))
+
+        # stop() does not raise, not flushed changes stay in buffer
+        self.journal.record(file_info, JobJournal.FAILED)
+        with mock.patch.object(self.journal, '_connect', side_effect=locked):
+            await self.journal.stop()
+        self.journal.flush()
+        self.assertListEqual(['a.odt', 'b.odt'], sorted(self.journal.get_files(self.home, (JobJournal.FAILED, ))))
+
+    async def run_once(self, provider, journal: JobJournal, skip=(), stop_after: int = None) -> list[str]:
+        """
+            It "crashes" after stop_after files (look at convert_queued)
+        """
+        provider = JournalFileProvider(provider, journal, self.home, skip)
+        converted = await convert_queued(
+            provider, lambda file_info: journal.file_done(file_info, Path('/dest'), None), stop_after=stop_after
+        )
+        journal.flush()
+        return converted
+
+    async def test_resume(self):
+        walker = self.get_walker()
+        converted = await self.run_once(walker, self.journal, stop_after=2)
+        self.journal.close()
+
+        # crash during walk, files are walked again, finished ones are skipped
+        journal = JobJournal(self.path)
+        self.assertFalse(journal.is_walk_done(self.home))
+        done = journal.get_files(self.home, (JobJournal.DONE, ))
+        self.assertListEqual(converted, done)
+        converted += await self.run_once(walker, journal, skip=done, stop_after=2)
+        self.assertEqual(4, len(set(converted)))
+        # file that was in queue when run is crashed
+        self.assertEqual(1, len(journal.get_files(self.home, (JobJournal.IN_FLIGHT, ))))
+
+        converted += await self.run_once(walker, journal, skip=journal.get_files(self.home, (JobJournal.DONE, )))
+        self.assertListEqual(sorted(self.files), sorted(converted))
+        self.assertTrue(journal.is_walk_done(self.home))
+
+        # crash after walk is finished, not finished files are taken from journal
+        journal.record(FileInfo(self.home, Path('5.odt')), JobJournal.IN_FLIGHT)
+        journal.flush()
+        replay = JournalReplayProvider(journal, self.home)
+        self.assertListEqual(['5.odt'], await self.run_once(replay, journal))
+        journal.close()
@@ -0,0 +1,46 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 11:40 PM
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from definitions import FileInfo
+from run_summary import RunSummary, shard_path
+
+
+class TestRunSummary(TestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / 'summary.json'
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_shard_path(self):
+        self.assertEqual(self.path, shard_path(self.path, None))
+        self.assertEqual(self.path.with_name('summary.shard-1-of-4.json'), shard_path(self.path, (1, 4)))
+
+    def test_merge(self):
+        paths = []
+        for i in (0, 2):
+            summary = RunSummary(shard_path(self.path, (i, 3)), (i, 3))
+            summary.start(home='/home')
+            summary.file_done(FileInfo(Path('/home'), Path(f'{i}.odt')), Path(f'/dest/{i}.html'), None)
+            summary.file_failed(FileInfo(Path('/home'), Path(f'bad{i}.odt')), 'timeout', None)
+            summary.save(fresh=10)
+            paths.append(summary.path)
+
+        report = RunSummary.merge_files(paths, Path(self.tmpdir.name) / 'report.json')
+        self.assertEqual(['0/3', '2/3'], report['shards'])
+        self.assertEqual(['1/3'], report['missing_shards'])
+        self.assertEqual(2, report['done'])
+        self.assertEqual(20, report['fresh'])
+        self.assertEqual('/home', report['home'])
+        self.assertListEqual(['bad0.odt', 'bad2.odt'], [failed['file'] for failed in report['failed']])
+        self.assertGreaterEqual(report['elapsed'], 0)
+        self.assertTrue((Path(self.tmpdir.name) / 'report.json').exists())
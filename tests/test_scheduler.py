@@ -0,0 +1,87 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 10:45 PM
+import asyncio
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+from definitions import FileInfo, QUEUE_END
+from scheduler import LongestJobFirstProvider, CostEstimator, read_odf_statistic
+from tests.helpers import convert_queued, HomeTestCase
+
+META_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<office:document-meta xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ xmlns:meta="urn:oasis:names:tc:opendocument:xmlns:meta:1.0" office:version="1.3"><office:meta>
+<meta:document-statistic meta:page-count="{pages}" meta:word-count="{words}" meta:image-count="0"/>
+</office:meta></office:document-meta>'''
+
+
+class ListProvider:
+
+    def __init__(self, home: Path, files: list[str]) -> None:
+        self.home = home
+        self.files = files
+
+    async def process(self, queue: asyncio.Queue):
+        for file in self.files:
+            await queue.put(FileInfo(self.home, Path(file)))
+        await queue.put(QUEUE_END)
+
+
+class PairsProvider(ListProvider):
+    """
+        Files come by pairs with pause between them
+    """
+
+    async def process(self, queue: asyncio.Queue):
+        for i, file in enumerate(self.files):
+            if i and i % 2 == 0:
+                await asyncio.sleep(0.05)
+            await queue.put(FileInfo(self.home, Path(file)))
+        await queue.put(QUEUE_END)
+
+
+class TestScheduler(HomeTestCase):
+
+    # not ODF, 100 KB is about 2 pages
+    home_files = {'plain.doc': b'0' * 100_000}
+
+    def setUp(self) -> None:
+        super().setUp()
+        for name, pages in (('small.odt', 1), ('manual.odt', 400), ('medium.odt', 20)):
+            with zipfile.ZipFile(self.home / name, 'w') as zf:
+                zf.writestr('mimetype', 'application/vnd.oasis.opendocument.text')
+                zf.writestr('meta.xml', META_XML.format(pages=pages, words=pages * 300))
+
+    def test_read_odf_statistic(self):
+        self.assertDictEqual(
+            {'page-count': 400, 'word-count': 120000, 'image-count': 0}, read_odf_statistic(self.home / 'manual.odt')
+        )
+        self.assertIsNone(read_odf_statistic(self.home / 'plain.doc'))
+
+        estimator = CostEstimator()
+        self.assertAlmostEqual(2.0, estimator.estimate(self.home / 'plain.doc'))
+        self.assertGreater(estimator.estimate(self.home / 'manual.odt'), estimator.estimate(self.home / 'medium.odt'))
+
+    async def run_provider(self, window: int) -> list[str]:
+        files = ['small.odt', 'plain.doc', 'manual.odt', 'medium.odt']
+        provider = LongestJobFirstProvider(ListProvider(self.home, files), window)
+        return await convert_queued(provider, lambda file_info: None)
+
+    async def test_process(self):
+        self.assertListEqual(['manual.odt', 'medium.odt', 'plain.doc', 'small.odt'], await self.run_provider(16))
+        # without lookahead order is not changed
+        self.assertListEqual(['small.odt', 'plain.doc', 'manual.odt', 'medium.odt'], await self.run_provider(1))
+
+    async def test_process_pauses(self):
+        files = ['small.odt', 'plain.doc', 'manual.odt', 'medium.odt']
+        provider = LongestJobFirstProvider(PairsProvider(self.home, files), 16)
+        with mock.patch.object(provider, '_estimate', wraps=provider._estimate) as estimate:
+            result = await convert_queued(provider, lambda file_info: None)
+        self.assertListEqual(['plain.doc', 'small.odt', 'manual.odt', 'medium.odt'], result)
+        # window waits for the next files without estimating of empty batches
+        self.assertNotIn([], [call.args[0] for call in estimate.call_args_list])
@@ -0,0 +1,143 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 11:58 PM
+import asyncio
+import socket
+import tempfile
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from soffice_endpoints import RemoteSofficeServer, EndpointRegistry, parse_endpoint
+from soffice_pool import SofficeServerPool
+import soffice_server
+
+
+class HTTPServerPool(SofficeServerPool):
+    server_class = soffice_server.TestHTTPAsyncServer
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestParseEndpoint(TestCase):
+
+    def test_parse(self):
+        endpoint = parse_endpoint('10.0.0.5:2002')
+        self.assertEqual({'interface': '10.0.0.5', 'port': 2002}, endpoint.connection)
+        self.assertEqual(1, endpoint.slots)
+        self.assertFalse(endpoint.shared_filesystem)
+
+        endpoint = parse_endpoint(' [fd00::5]:2002:4 ')
+        self.assertEqual({'interface': 'fd00::5', 'port': 2002}, endpoint.connection)
+        self.assertEqual(4, endpoint.slots)
+        self.assertEqual('[fd00::5]:2002', endpoint.address)
+
+        endpoint = parse_endpoint('pipe:shared_soffice:2')
+        self.assertEqual({'pipe_name': 'shared_soffice'}, endpoint.connection)
+        self.assertEqual(2, endpoint.slots)
+
+        for spec in ('10.0.0.5', 'host:port', 'pipe:', 'host:2002:0'):
+            with self.assertRaises(ValueError, msg=spec):
+                parse_endpoint(spec)
+
+    def test_from_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'endpoints.txt'
+            path.write_text('# remote servers\n10.0.0.5:2002:8\n\nhost-b:2003  # second\n')
+            registry = EndpointRegistry.from_file(path)
+        self.assertListEqual(['10.0.0.5:2002', 'host-b:2003'], [ep.address for ep in registry.endpoints])
+        self.assertEqual(9, registry.capacity)
+
+        with self.assertRaises(ValueError):
+            EndpointRegistry()
+
+
+class TestEndpointRegistry(IsolatedAsyncioTestCase):
+    """
+        Remote soffice is stood in by loopback TCP servers (only connections are accepted)
+    """
+
+    async def asyncSetUp(self) -> None:
+        self.stand_ins = [
+            await asyncio.start_server(lambda reader, writer: writer.close(), '127.0.0.1', 0) for i in range(2)
+        ]
+        self.ports = [stand_in.sockets[0].getsockname()[1] for stand_in in self.stand_ins]
+        self.registry = None
+
+    async def asyncTearDown(self) -> None:
+        if self.registry is not None:
+            await self.registry.stop()
+        for stand_in in self.stand_ins:
+            stand_in.close()
+            await stand_in.wait_closed()
+
+    async def test_probe(self):
+        self.assertTrue(await RemoteSofficeServer('127.0.0.1', self.ports[0]).probe())
+        self.assertFalse(await RemoteSofficeServer('127.0.0.1', get_free_port()).probe(1))
+        self.assertFalse(await RemoteSofficeServer(pipe_name='no_such_soffice_pipe').probe(1))
+
+    async def test_spreading(self):
+        self.registry = EndpointRegistry([f'127.0.0.1:{self.ports[0]}:2', f'127.0.0.1:{self.ports[1]}'])
+        first, second = self.registry.endpoints
+        await self.registry.start()
+        self.assertEqual(3, self.registry.idle_number)
+
+        # the least loaded endpoint, tie - endpoint with more slots
+        leased = [await self.registry.acquire() for i in range(3)]
+        self.assertListEqual([first, second, first], leased)
+        self.assertEqual(0, self.registry.idle_number)
+
+        # all slots are busy, acquire() waits for release
+        waiter = asyncio.create_task(self.registry.acquire())
+        await asyncio.sleep(0.05)
+        self.assertFalse(waiter.done())
+        self.registry.release(second)
+        self.assertIs(second, await asyncio.wait_for(waiter, 1))
+
+    async def test_unhealthy_and_suspend(self):
+        EndpointRegistry.failure_cooldown, cooldown = 0.05, EndpointRegistry.failure_cooldown
+        self.addCleanup(setattr, EndpointRegistry, 'failure_cooldown', cooldown)
+
+        self.registry = EndpointRegistry([f'127.0.0.1:{get_free_port()}:4', f'127.0.0.1:{self.ports[0]}'])
+        dead, alive = self.registry.endpoints
+        await self.registry.start()
+        self.assertFalse(dead.healthy)
+        self.assertTrue(alive.healthy)
+
+        # failed conversion suspends endpoint until it passes probe after cooldown
+        async with self.registry.lease() as server:
+            self.assertIs(alive, server)
+        with self.assertRaises(RuntimeError):
+            async with self.registry.lease() as server:
+                raise RuntimeError('conversion failed')
+        self.assertFalse(alive.healthy)
+        self.assertEqual(1, alive.failures)
+        self.assertIs(alive, await asyncio.wait_for(self.registry.acquire(), 1))
+        self.assertTrue(alive.healthy)
+
+    async def test_local_pool(self):
+        local_pool = HTTPServerPool(1, start_delay=0, server_kwargs={'port': '0'})
+        self.registry = EndpointRegistry([f'127.0.0.1:{self.ports[0]}:2'], local_pool=local_pool)
+        remote, = self.registry.endpoints
+        await self.registry.start()
+        self.assertEqual(3, self.registry.capacity)
+
+        # local pool wins a tie, then the least loaded source
+        leased = [await self.registry.acquire() for i in range(3)]
+        self.assertIs(local_pool.servers[0], leased[0])
+        self.assertListEqual([remote, remote], leased[1:])
+        self.assertTrue(leased[0].shared_filesystem)
+
+        self.registry.release(leased[0])
+        self.assertEqual(1, local_pool.idle_number)
+
+        await self.registry.stop()
+        self.assertListEqual([], local_pool.servers)
+        with self.assertRaises(RuntimeError):
+            await self.registry.acquire()
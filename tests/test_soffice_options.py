@@ -4,6 +4,7 @@
 # File: ${FILE_NAME}
 # Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
 # Created by ox23 at 2022-08-16 (y-m-d) 4:42 PM
+import os
 from pathlib import Path
 from unittest import TestCase
 from urllib import request
@@ -74,6 +75,10 @@ class Test(TestCase):
         opt = sopt.NorestoreSOCmdOption()
         self.assertTupleEqual(opt.args(), ('--norestore', ))
 
+    def test_terminate_after_init_socmd_option(self):
+        opt = sopt.TerminateAfterInitSOCmdOption()
+        self.assertTupleEqual(opt.args(), ('--terminate_after_init', ))
+
     def test_user_profile_dir_socmd_option(self):
         opt = sopt.UserProfileDirSOCmdOption()
         self.assertTupleEqual(tuple(), opt.args())
@@ -156,6 +161,21 @@ class Test(TestCase):
         opt.port = 34556
         self.assertTupleEqual((res % ('192.168.23.23', f'port={opt.port},'),), opt.args())
 
+    def test_accept_pipe_socmd_option(self):
+        opt = sopt.AcceptSOCmdOption(port=34556)
+        self.assertListEqual([], opt.pipe_paths())
+
+        with self.assertRaises(ValueError) as exc:
+            opt.pipe_name = 'a;b'
+
+        opt.pipe_name = 'aio_soffice_1'
+        self.assertTupleEqual(('--accept=pipe,name=aio_soffice_1;urp;StarOffice.ComponentContext', ), opt.args())
+        self.assertEqual('OSL_PIPE_%s_aio_soffice_1' % os.getuid(), opt.pipe_paths()[0].name)
+
+        opt.pipe_name = None
+        self.assertEqual('--accept=socket,host=127.0.0.1,port=34556,tcpNoDelay=1;urp;StarOffice.ComponentContext',
+                         opt.args()[0])
+
     def test_cmd_options(self):
         opts = sopt.cmdopt.CmdOptions()
         self.assertListEqual([], opts.args())
@@ -0,0 +1,60 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 11:40 AM
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from soffice_pool import SofficeServerPool
+import soffice_server
+
+
+class HTTPServerPool(SofficeServerPool):
+    server_class = soffice_server.TestHTTPAsyncServer
+
+
+class TestSofficeServerPool(IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        # port 0 - each server gets own port from system
+        self.pool = HTTPServerPool(2, start_concurrency=1, start_delay=0.05, server_kwargs={'port': '0'})
+
+    async def asyncTearDown(self) -> None:
+        await self.pool.stop()
+
+    async def test_start(self):
+        await self.pool.start()
+        await self.pool.start()  # servers are started only once
+        self.assertEqual(2, len(self.pool.servers))
+        self.assertEqual(2, self.pool.idle_number)
+        self.assertTrue(all(server.effective_port for server in self.pool.servers))
+
+    async def test_lease(self):
+        async with self.pool.lease() as server:
+            self.assertEqual(1, self.pool.idle_number)
+        self.assertEqual(2, self.pool.idle_number)
+
+        # the longest idle server is handed out first
+        other = await self.pool.acquire()
+        self.assertIsNot(server, other)
+        self.pool.release(other)
+
+    async def test_release_discard(self):
+        server = await self.pool.acquire()
+        self.pool.release(server, discard=True)
+        for i in range(100):
+            if self.pool.idle_number == 2:
+                break
+            await asyncio.sleep(0.05)
+
+        self.assertEqual(2, self.pool.idle_number)
+        self.assertNotIn(server, self.pool.servers)
+
+    async def test_stop(self):
+        await self.pool.start()
+        await self.pool.stop()
+        self.assertListEqual([], self.pool.servers)
+        with self.assertRaises(RuntimeError):
+            await self.pool.acquire()
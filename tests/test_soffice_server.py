@@ -0,0 +1,120 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 12:15 PM
+import asyncio
+import socket
+import tempfile
+from pathlib import Path
+from unittest import TestCase, IsolatedAsyncioTestCase
+
+from soffice_server import ServerStats, RecyclePolicy, UserProfileTemplate, BaseAsyncServer, SofficeAsyncServer
+
+
+class TestRecyclePolicy(TestCase):
+
+    def setUp(self) -> None:
+        self.policy = RecyclePolicy(max_conversions=100, max_rss_growth=1000, max_latency_drift=2, latency_window=5)
+        self.stats = ServerStats(self.policy.latency_window)
+
+    def test_max_conversions(self):
+        for i in range(99):
+            self.stats.add_latency(1)
+        self.assertIsNone(self.policy.check(self.stats))
+        self.stats.add_latency(1)
+        self.assertEqual('conversions [100] >= [100]', self.policy.check(self.stats))
+
+    def test_max_rss_growth(self):
+        self.stats.add_rss(5000)
+        self.stats.add_rss(5999)
+        self.assertIsNone(self.policy.check(self.stats))
+        self.stats.add_rss(6000)
+        self.assertEqual('RSS growth [1000] >= [1000]', self.policy.check(self.stats))
+
+    def test_max_latency_drift(self):
+        for i in range(5):
+            self.stats.add_latency(1)
+        self.assertEqual(1, self.stats.baseline_latency)
+        self.stats.add_latency(3)
+        self.assertIsNone(self.stats.latency_drift)  # window still contains baseline conversions
+
+        for i in range(4):
+            self.stats.add_latency(1.5)
+        self.assertEqual(1.5, self.stats.latency_drift)
+        self.assertIsNone(self.policy.check(self.stats))
+
+        for i in range(3):
+            self.stats.add_latency(2.5)
+        self.assertEqual('latency drift [2.50] >= [2]', self.policy.check(self.stats))
+
+    def test_disabled(self):
+        policy = RecyclePolicy(max_conversions=None, max_rss_growth=None, max_latency_drift=None)
+        for i in range(10000):
+            self.stats.add_latency(i)
+        self.stats.add_rss(0)
+        self.stats.add_rss(10 ** 12)
+        self.assertIsNone(policy.check(self.stats))
+
+
+class TestUserProfileTemplate(TestCase):
+
+    def test_clone(self):
+        with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as dest:
+            template = UserProfileTemplate(src)
+            self.assertFalse(template.is_built())
+
+            (Path(src) / 'user' / 'config').mkdir(parents=True)
+            (Path(src) / 'user' / 'registrymodifications.xcu').write_text('<xml/>')
+            self.assertTrue(template.is_built())
+            asyncio.run(template.build())  # built already, soffice is not started
+
+            template.clone(dest)
+            self.assertEqual('<xml/>', (Path(dest) / 'user' / 'registrymodifications.xcu').read_text())
+            self.assertTrue((Path(dest) / 'user' / 'config').is_dir())
+
+    def test_cleanup(self):
+        template = UserProfileTemplate()
+        path = template.path
+        self.assertTrue(path.is_dir())
+        template.cleanup()
+        self.assertFalse(path.exists())
+
+
+class TestCheckPort(IsolatedAsyncioTestCase):
+
+    async def test_busy(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            sock.listen()
+            port = sock.getsockname()[1]
+
+            with self.assertRaisesRegex(RuntimeError, f'Port \\[{port}\\] is busy'):
+                BaseAsyncServer('127.0.0.1', port)._check_port()
+
+        BaseAsyncServer('127.0.0.1', port)._check_port()
+
+
+class TestPipeTransport(IsolatedAsyncioTestCase):
+
+    async def test_pipe(self):
+        server = SofficeAsyncServer(use_pipe=True)
+        self.assertTrue(server.pipe_name.startswith('aio_soffice_'))
+        self.assertNotEqual(server.pipe_name, SofficeAsyncServer(use_pipe=True).pipe_name)
+        self.assertEqual({'pipe_name': server.pipe_name}, server.connection)
+        self.assertIn(f'--accept=pipe,name={server.pipe_name};urp;StarOffice.ComponentContext', server.options.args())
+
+        self.assertIsNone(server._probe_pipe())
+        path = server.options['accept'].pipe_paths()[0]
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.bind(str(path))
+            try:
+                self.assertEqual(server.pipe_name, server._probe_pipe())
+            finally:
+                path.unlink()
+
+    async def test_tcp(self):
+        server = SofficeAsyncServer()
+        self.assertIsNone(server.pipe_name)
+        self.assertEqual({'interface': '127.0.0.1', 'port': None}, server.connection)
@@ -6,10 +6,15 @@
 # Created by ox23 at 2022-08-15 (y-m-d) 4:25 AM
 
 import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
 
-from unittest import TestCase
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
 
-from soffice_process import SofficeHeadlessSubprocessConverter, PopenResult
+from definitions import FileInfo, QUEUE_END
+from soffice_process import SofficeHeadlessSubprocessConverter, PopenResult, AsyncSOSubprocessConverter
 
 
 class TestSofficeHeadlessSubprocessConverter(TestCase):
@@ -79,3 +84,101 @@ class TestSofficeHeadlessSubprocessConverter(TestCase):
             self.assertTrue(hasattr(result, key))
             self.assertEqual(getattr(result, key), val)
 
+
+# it writes <outdir>/<stem>.<extension of --convert-to> for each file except "bad*"
+# and logs each invocation into calls.log
+# "overlap" file is created if it runs simultaneously with another invocation
+FAKE_SOFFICE = f"""#!{sys.executable}
+import sys
+import time
+from pathlib import Path
+running = Path(__file__).parent / 'running'
+if running.exists():
+    (Path(__file__).parent / 'overlap').touch()
+running.touch()
+time.sleep(0.05)
+running.unlink()
+args = sys.argv[1:]
+outdir = Path(args[args.index('--outdir') + 1])
+ext = args[args.index('--convert-to') + 1].split(':')[0]
+files = [arg for arg in args[args.index('--outdir') + 2:]]
+with open(Path(__file__).parent / 'calls.log', 'a') as fd:
+    fd.write(' '.join(Path(file).name for file in files) + '\\n')
+for file in files:
+    if not Path(file).name.startswith('bad'):
+        (outdir / (Path(file).stem + '.' + ext)).write_text(ext)
+"""
+
+
+class TestAsyncSOSubprocessConverter(IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmpdir.name)
+        self.bin = self.tmp / 'bin'
+        self.bin.mkdir()
+        (self.bin / 'soffice').write_text(FAKE_SOFFICE)
+        (self.bin / 'soffice').chmod(0o755)
+        self.home = self.tmp / 'home'
+        for name in ('a/1.odt', 'a/2.odt', 'a/bad.odt', 'b/3.odt', 'a/4.odt'):
+            (self.home / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.home / name).write_text('odt')
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    async def test_process(self):
+        queue = asyncio.Queue()
+        for name in ('a/1.odt', 'b/3.odt', 'a/2.odt', 'a/bad.odt', 'a/4.odt'):
+            queue.put_nowait(FileInfo(self.home, Path(name)))
+        queue.put_nowait(QUEUE_END)
+
+        converter = AsyncSOSubprocessConverter(self.tmp / 'dest')
+        converter.batch_max_files = 3
+        with mock.patch.dict(os.environ, {'PATH': f'{self.bin}{os.pathsep}{os.environ["PATH"]}'}):
+            await converter.process(queue, None)
+
+        calls = (self.bin / 'calls.log').read_text().splitlines()
+        self.assertListEqual(['1.odt 2.odt bad.odt', 'bad.odt', '4.odt', '3.odt'], calls)
+        for name in ('a/1.html', 'a/2.html', 'b/3.html', 'a/4.html'):
+            self.assertTrue((self.tmp / 'dest' / name).is_file())
+        self.assertListEqual([Path('a/bad.odt')], [file_info.file for file_info, reason in converter.failed])
+        self.assertEqual(2, converter.failed[0][0].attempts)
+
+    async def test_process_semaphore(self):
+        queue = asyncio.Queue()
+        for name in ('a/1.odt', 'b/3.odt', 'a/2.odt', 'a/4.odt'):
+            queue.put_nowait(FileInfo(self.home, Path(name)))
+        queue.put_nowait(QUEUE_END)
+
+        semaphore = asyncio.Semaphore(1)
+        converters = [AsyncSOSubprocessConverter(self.tmp / 'dest', process_semaphore=semaphore) for i in range(3)]
+        for converter in converters:
+            converter.batch_max_files = 1
+        with mock.patch.dict(os.environ, {'PATH': f'{self.bin}{os.pathsep}{os.environ["PATH"]}'}):
+            await asyncio.gather(*[converter.process(queue, None) for converter in converters])
+
+        self.assertEqual(4, len((self.bin / 'calls.log').read_text().splitlines()))
+        self.assertFalse((self.bin / 'overlap').exists())
+        self.assertIs(QUEUE_END, queue.get_nowait())
+
+    async def test_process_targets(self):
+        queue = asyncio.Queue()
+        for name in ('a/1.odt', 'a/bad.odt'):
+            queue.put_nowait(FileInfo(self.home, Path(name)))
+        queue.put_nowait(QUEUE_END)
+
+        converter = AsyncSOSubprocessConverter(self.tmp / 'dest', convert_to=['html', 'txt:Text (encoded):UTF8'])
+        with mock.patch.dict(os.environ, {'PATH': f'{self.bin}{os.pathsep}{os.environ["PATH"]}'}):
+            await converter.process(queue, None)
+
+        # one invocation per target, failed files of batch are converted again one by one
+        calls = (self.bin / 'calls.log').read_text().splitlines()
+        self.assertListEqual(['1.odt bad.odt', '1.odt bad.odt', 'bad.odt', 'bad.odt'], calls)
+        self.assertEqual('html', (self.tmp / 'dest' / 'a/1.html').read_text())
+        self.assertEqual('txt', (self.tmp / 'dest' / 'a/1.txt').read_text())
+        self.assertListEqual([Path('a/bad.odt')], [file_info.file for file_info, reason in converter.failed])
+
+    def test_filter_options(self):
+        with self.assertRaises(ValueError):
+            AsyncSOSubprocessConverter(self.tmp / 'dest', convert_to=['html', ('pdf', ['SelectPdfVersion=1'])])
@@ -0,0 +1,74 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-16 (y-m-d) 3:40 PM
+import asyncio
+import os
+import signal
+import socket
+import unittest
+from unittest import TestCase, IsolatedAsyncioTestCase
+
+import psutil
+
+import sysproc_tools as sysproc
+
+
+@unittest.skipUnless(sysproc.PROC_NET_SUPPORTED, '/proc/<pid>/net is not supported')
+class TestGetListeningPorts(TestCase):
+
+    def test_listening_only(self):
+        with socket.socket() as listener, socket.socket() as bound:
+            listener.bind(('127.0.0.1', 0))
+            listener.listen()
+            bound.bind(('127.0.0.1', 0))
+
+            port = listener.getsockname()[1]
+            ports = sysproc.get_listening_ports(os.getpid())
+            self.assertIn(port, ports)
+            self.assertNotIn(bound.getsockname()[1], ports)
+
+        self.assertNotIn(port, sysproc.get_listening_ports(os.getpid()))
+
+
+@unittest.skipUnless(hasattr(os, 'killpg'), 'process groups are not supported')
+class TestProcessGroup(IsolatedAsyncioTestCase):
+
+    async def _start(self, script: str) -> asyncio.subprocess.Process:
+        proc = await asyncio.create_subprocess_exec(
+            'sh', '-c', script, stdout=asyncio.subprocess.PIPE, start_new_session=True
+        )
+        sysproc.reaper.register(proc.pid)
+        await asyncio.sleep(0.1)
+        return proc
+
+    @staticmethod
+    def _is_running(pid: int) -> bool:
+        # orphan child is reparented, it can stay zombie (not reaped) for a while
+        try:
+            return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess as exc:
+            return False
+
+    async def test_terminate_process_group(self):
+        # leader ignores SIGTERM, its child does not
+        proc = await self._start('trap "" TERM; sleep 30 & echo $!; wait; wait')
+        child_pid = int(await proc.stdout.readline())
+        self.assertTrue(sysproc.is_process_group_alive(proc.pid))
+        self.assertTrue(self._is_running(child_pid))
+
+        self.assertEqual(-signal.SIGKILL, await sysproc.terminate_process_group(proc, 0.2))
+        self.assertFalse(self._is_running(child_pid))
+        self.assertNotIn(proc.pid, sysproc.reaper.pgids)
+
+    async def test_reap(self):
+        proc = await self._start('sleep 30')
+        reaper = sysproc.ProcessGroupReaper()
+        reaper.register(proc.pid)
+        reaper.register(proc.pid + 1000000)  # does not exist
+
+        self.assertListEqual([proc.pid], reaper.reap())
+        self.assertEqual(-signal.SIGKILL, await proc.wait())
+        sysproc.reaper.unregister(proc.pid)
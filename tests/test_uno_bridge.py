@@ -0,0 +1,61 @@
+# IDE: PyCharm
+# Project: aio_post_tools
+# Path: ${DIR_PATH}
+# File: ${FILE_NAME}
+# Contact: Semyon Mamonov <semyon.mamonov@gmail.com>
+# Created by ox23 at 2026-10-17 (y-m-d) 12:55 AM
+import unittest
+from unittest import TestCase, mock
+
+try:
+    from uno_bridge import UnoBridgeConverter
+    UNO_SUPPORTED = True
+except ImportError:
+    UNO_SUPPORTED = False
+
+
+@unittest.skipUnless(UNO_SUPPORTED, 'uno (LibreOffice python) is not installed')
+class TestUnoBridgeConverter(TestCase):
+
+    def test_connection(self):
+        # everything but URL is made by UnoConverter.__init__
+        with mock.patch('uno.getComponentContext') as get_context:
+            converter = UnoBridgeConverter(pipe_name='soffice_1')
+        resolver = get_context.return_value.ServiceManager.createInstanceWithContext.return_value
+        resolver.resolve.assert_called_once_with('uno:pipe,name=soffice_1;urp;StarOffice.ComponentContext')
+        self.assertIs(resolver.resolve.return_value, converter.context)
+
+        with mock.patch('uno.getComponentContext') as get_context:
+            UnoBridgeConverter('10.0.0.5', 2003)
+        resolver = get_context.return_value.ServiceManager.createInstanceWithContext.return_value
+        url = resolver.resolve.call_args.args[0]
+        self.assertTrue(url.startswith('uno:socket,host=10.0.0.5,port=2003'), url)
+
+    def test_make_filter_props(self):
+        props = UnoBridgeConverter.make_filter_props(['EmbedImages', 'Quality=90', 'ReduceImageResolution=true'])
+        self.assertListEqual(['FilterOptions', 'FilterData'], [prop.Name for prop in props])
+        self.assertEqual('EmbedImages', props[0].Value)
+        filter_data = props[1].Value.value
+        self.assertListEqual(
+            [('Quality', 90), ('ReduceImageResolution', True)], [(prop.Name, prop.Value) for prop in filter_data]
+        )
+
+        self.assertTupleEqual((), UnoBridgeConverter.make_filter_props([]))
+
+    def test_make_store_props(self):
+        # props are made without connection to soffice
+        converter = UnoBridgeConverter.__new__(UnoBridgeConverter)
+        with mock.patch.object(converter, 'find_export_filter', return_value='writer_pdf_Export') as find:
+            props = converter.make_store_props(None, 'pdf', ['Quality=90'])
+            find.assert_called_once_with(None, 'pdf')
+        self.assertListEqual(['FilterName', 'FilterData'], [prop.Name for prop in props])
+        self.assertEqual('writer_pdf_Export', props[0].Value)
+
+        # filter and its options are set by convert_to, filter is not looked up
+        with mock.patch.object(converter, 'find_export_filter') as find:
+            props = converter.make_store_props(None, 'html:XHTML Writer File:UTF8', ['EmbedImages'])
+            find.assert_not_called()
+        self.assertListEqual(
+            [('FilterName', 'XHTML Writer File'), ('FilterOptions', 'UTF8'), ('FilterOptions', 'EmbedImages')],
+            [(prop.Name, prop.Value) for prop in props]
+        )